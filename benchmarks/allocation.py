@@ -0,0 +1,82 @@
+"""
+Time the investor allocation optimizer over growing batches of sessions.
+
+Random sessions (prices, available shares and budgets) are allocated in
+one vectorized pass per chunk, in-process and then with a process pool
+for each --workers count; every result is checked against the budget
+and supply constraints:
+
+    python -m benchmarks.allocation
+    python -m benchmarks.allocation --sessions 10000,1000000 --workers 4 --investors 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from game2.allocation import allocate_batch
+
+console = Console()
+
+
+def _counts(text):
+    try:
+        return [int(count) for count in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a count or comma-separated counts")
+
+
+def random_sessions(sessions, investors, companies, seed=0):
+    """(prices, shares, budgets) arrays for random sessions"""
+    rng = np.random.default_rng(seed)
+    prices = rng.uniform(5.0, 200.0, (sessions, companies)).round(2)
+    shares = rng.integers(1_000, 100_000, (sessions, companies)).astype(np.float64)
+    budgets = rng.uniform(10_000.0, 1_000_000.0, (sessions, investors)).round(2)
+    return prices, shares, budgets
+
+
+def feasible(shares, allocation):
+    """Whether no budget is overspent and no company oversold"""
+    return bool((allocation.cash >= -1e-6).all() and (allocation.shares.sum(axis=-2) <= shares).all())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=_counts, default=[1_000, 100_000, 1_000_000],
+                        help="batch sizes, comma-separated")
+    parser.add_argument("--investors", type=int, default=3)
+    parser.add_argument("--companies", type=int, default=3)
+    parser.add_argument("--workers", type=int, action="append",
+                        help="process pool size to compare (repeatable; default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=50_000, help="sessions per vectorized pass")
+    args = parser.parse_args(argv)
+    pools = [1] + [w for w in (args.workers or [os.cpu_count() or 1]) if w > 1]
+
+    table = Table(title=f"Allocation ({args.investors} investors x {args.companies} companies)")
+    table.add_column("Sessions", justify="right", style="cyan")
+    table.add_column("Workers", justify="right")
+    table.add_column("Seconds", justify="right")
+    table.add_column("Sessions/s", justify="right")
+    table.add_column("Feasible")
+
+    failed = False
+    for sessions in args.sessions:
+        prices, shares, budgets = random_sessions(sessions, args.investors, args.companies)
+        for workers in pools:
+            start = time.perf_counter()
+            allocation = allocate_batch(prices, shares, budgets, workers=workers, chunk_size=args.chunk_size)
+            elapsed = time.perf_counter() - start
+            ok = feasible(shares, allocation)
+            failed = failed or not ok
+            table.add_row(f"{sessions:,}", str(workers), f"{elapsed:.3f}", f"{sessions / elapsed:,.0f}",
+                          "[green]yes" if ok else "[red]no")
+    console.print(table)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
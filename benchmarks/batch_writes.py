@@ -0,0 +1,88 @@
+"""
+Compare per-term updates with TermBatch for one Game 2 company form.
+
+Runs against the database configured through the PG_* variables and
+overwrites its game2_terms values, so point it at a throwaway database:
+
+    PG_DATABASE=simulation_bench python -m benchmarks.batch_writes
+"""
+import argparse
+import time
+
+import psycopg2
+from psycopg2.extensions import connection as pg_connection
+from rich.console import Console
+from rich.table import Table
+
+from database.database import TermBatch, connection_params, update_game2_term
+
+console = Console()
+
+FORM = [
+    (f"{kind}_company{i}", i, value)
+    for i in range(1, 4)
+    for kind, value in (("price", 10.0 * i), ("shares", 1000 * i))
+]
+
+
+class CountingConnection(pg_connection):
+    """psycopg2 connection that counts its commits"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commits = 0
+
+    def commit(self):
+        self.commits += 1
+        super().commit()
+
+
+def per_term(conn):
+    for term, company, value in FORM:
+        update_game2_term(conn, term, 1, company, value)
+
+
+def batched(conn):
+    with TermBatch(conn) as batch:
+        for term, company, value in FORM:
+            batch.update_game2_term(term, 1, company, value)
+
+
+def run(conn, save, iterations):
+    conn.commits = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        save(conn)
+    elapsed = time.perf_counter() - start
+    return elapsed, conn.commits
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(connection_factory=CountingConnection, **connection_params())
+    try:
+        table = Table(title=f"Game 2 form saves x{args.iterations}")
+        table.add_column("Mode", style="cyan")
+        table.add_column("Commits", justify="right")
+        table.add_column("Total (s)", justify="right")
+        table.add_column("Per save (ms)", justify="right")
+
+        for name, save in (("per-term", per_term), ("TermBatch", batched)):
+            elapsed, commits = run(conn, save, args.iterations)
+            table.add_row(
+                name,
+                f"{commits:,}",
+                f"{elapsed:.3f}",
+                f"{elapsed / args.iterations * 1000:.3f}"
+            )
+
+        console.print(table)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
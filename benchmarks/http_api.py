@@ -0,0 +1,80 @@
+"""
+Measure JSON API throughput with keep-alive clients polling outputs.
+
+Serves the API in-process on the backend selected by SIMULATION_BACKEND
+(memory works without a database) and reports requests per second for
+full responses and for If-None-Match polls answered with 304:
+
+    SIMULATION_BACKEND=memory python -m benchmarks.http_api --clients 50
+"""
+import argparse
+import asyncio
+import time
+
+from aiohttp import ClientSession, TCPConnector
+from aiohttp.test_utils import TestServer
+from rich.console import Console
+from rich.table import Table
+
+from server.app import create_app
+
+console = Console()
+
+SESSION = "bench"
+FORM = [
+    {"term": f"{kind}_company{i}", "company": i, "value": value}
+    for i in range(1, 4)
+    for kind, value in (("price", 10.0 * i), ("shares", 1000 * i))
+]
+
+
+async def poll(http, url, requests, conditional):
+    etag = None
+    for _ in range(requests):
+        headers = {"If-None-Match": etag} if conditional and etag else {}
+        async with http.get(url, headers=headers) as response:
+            await response.read()
+            etag = response.headers.get("ETag", etag)
+
+
+async def run(clients, requests):
+    server = TestServer(create_app())
+    await server.start_server()
+    try:
+        connector = TCPConnector(limit=clients)
+        async with ClientSession(str(server.make_url("")), connector=connector) as http:
+            await (await http.post(f"/sessions/{SESSION}")).read()
+            await (await http.patch(f"/sessions/{SESSION}/game2/terms",
+                                    json={"team": 1, "updates": FORM})).read()
+
+            results = {}
+            for name, conditional in (("Full response", False), ("304 poll", True)):
+                start = time.perf_counter()
+                await asyncio.gather(*(
+                    poll(http, f"/sessions/{SESSION}/game2/outputs", requests, conditional)
+                    for _ in range(clients)
+                ))
+                results[name] = clients * requests / (time.perf_counter() - start)
+            return results
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.clients, args.requests))
+
+    table = Table(title=f"GET game2/outputs, {args.clients} keep-alive clients")
+    table.add_column("Mode", style="cyan")
+    table.add_column("Requests/s", justify="right", style="green")
+    for name, rate in results.items():
+        table.add_row(name, f"{rate:,.0f}")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Check module import times against their startup budgets.
+
+Each module is imported in a fresh interpreter under -X importtime and
+its cumulative time (the median of --runs) is compared with its budget.
+Exits with status 1 when any module is over, listing the imports that
+cost it most:
+
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --budget game1.team1=80 --runs 9
+"""
+import argparse
+import subprocess
+import sys
+
+from rich.console import Console
+from rich.table import Table
+
+console = Console()
+
+# module -> budget in milliseconds. The CLI and the database layer must
+# stay light; game modules also pay for rich (and Game 2 for numpy)
+BUDGETS = {
+    'simulation.cli': 30,
+    'database.database': 40,
+    'database.cache': 45,
+    'game1.team1': 150,
+    'game1.team2': 150,
+    'game2.team1': 130,
+    'game2.team2': 300,
+}
+
+
+def import_times(module):
+    """{imported name: (self us, cumulative us)} from one fresh interpreter"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def measure(module, runs):
+    """(median cumulative ms, heaviest imports of the median run)"""
+    samples = sorted((import_times(module) for _ in range(runs)), key=lambda times: times[module][1])
+    times = samples[len(samples) // 2]
+    heaviest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:5]
+    return times[module][1] / 1000, [(name, self_us / 1000) for name, (self_us, _) in heaviest]
+
+
+def _budget(text):
+    module, _, ms = text.partition('=')
+    if not ms:
+        raise argparse.ArgumentTypeError("expected module=milliseconds")
+    return module, float(ms)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--budget", type=_budget, action="append", default=[],
+                        help="override or add a budget, as module=milliseconds")
+    parser.add_argument("--only", action="append", help="check only this module (repeatable)")
+    args = parser.parse_args(argv)
+
+    budgets = {**BUDGETS, **dict(args.budget)}
+    if args.only:
+        budgets = {module: budgets[module] for module in args.only}
+
+    table = Table(title=f"Import time (median of {args.runs})")
+    table.add_column("Module", style="cyan")
+    table.add_column("ms", justify="right")
+    table.add_column("Budget", justify="right")
+    table.add_column("Heaviest imports (self ms)")
+
+    over = []
+    for module, budget in budgets.items():
+        ms, heaviest = measure(module, args.runs)
+        if ms > budget:
+            over.append(module)
+        table.add_row(
+            module,
+            f"[red]{ms:.1f}" if ms > budget else f"[green]{ms:.1f}",
+            f"{budget:g}",
+            ", ".join(f"{name} {self_ms:.1f}" for name, self_ms in heaviest)
+        )
+    console.print(table)
+
+    if over:
+        console.print(f"[red]✗ Over budget: {', '.join(over)}")
+        return 1
+    console.print("[green]✓ Every module within its import budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Compare hot-query latency with and without prepared statements.
+
+Runs against the database configured through the PG_* variables and
+overwrites the default session's EBITDA and price_company1 values, so point
+it at a throwaway database:
+
+    PG_DATABASE=simulation_bench python -m benchmarks.prepared_statements
+"""
+import argparse
+import statistics
+import time
+
+import psycopg2
+from rich.console import Console
+from rich.table import Table
+
+from database import prepared
+from database.database import (
+    connection_params, get_game1_terms, get_game2_company_data, update_game1_term,
+    update_game2_term
+)
+
+console = Console()
+
+QUERIES = {
+    "get_game1_terms": lambda conn: get_game1_terms(conn),
+    "update_game1_term": lambda conn: update_game1_term(conn, "EBITDA", 1, 100.0),
+    "update_game2_term": lambda conn: update_game2_term(conn, "price_company1", 1, 1, 10.0),
+    "get_game2_company_data": lambda conn: get_game2_company_data(conn),
+}
+
+
+def time_query(conn, query, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        query(conn)
+        samples.append(time.perf_counter() - start)
+    conn.rollback()
+    samples.sort()
+    return statistics.fmean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    plain = psycopg2.connect(**connection_params())
+    named = psycopg2.connect(**connection_params())
+    prepared.prepare_statements(named)
+    try:
+        table = Table(title=f"Hot queries x{args.iterations} (microseconds)")
+        table.add_column("Query", style="cyan")
+        table.add_column("Plain p50", justify="right")
+        table.add_column("Prepared p50", justify="right")
+        table.add_column("Plain p99", justify="right")
+        table.add_column("Prepared p99", justify="right")
+        table.add_column("Mean speedup", justify="right", style="green")
+
+        for name, query in QUERIES.items():
+            plain_mean, plain_p50, plain_p99 = time_query(plain, query, args.iterations)
+            named_mean, named_p50, named_p99 = time_query(named, query, args.iterations)
+            table.add_row(
+                name,
+                f"{plain_p50 * 1e6:,.0f}",
+                f"{named_p50 * 1e6:,.0f}",
+                f"{plain_p99 * 1e6:,.0f}",
+                f"{named_p99 * 1e6:,.0f}",
+                f"{plain_mean / named_mean:.2f}x"
+            )
+
+        console.print(table)
+    finally:
+        plain.close()
+        named.close()
+
+
+if __name__ == "__main__":
+    main()
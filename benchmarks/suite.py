@@ -0,0 +1,242 @@
+"""
+Benchmark every hot path and compare against a stored baseline.
+
+Runs in-process on the memory backend by default; --backend postgres
+targets the database configured through the PG_* variables (use a
+throwaway one: the cases overwrite the default session's terms and
+re-run the migration check). Exits with status 1 when a case's p50
+regresses past --threshold:
+
+    python -m benchmarks                       # compare with the baseline
+    python -m benchmarks --save                # record a new baseline
+    python -m benchmarks --backend sqlite --only update_game1_term
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from rich.console import Console
+from rich.markup import escape
+from rich.table import Table
+
+console = Console()
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+GAME2_FORM = [
+    (f"{kind}_company{i}", i, value)
+    for i in range(1, 4)
+    for kind, value in (("price", 10.0 * i), ("shares", 1000 * i))
+]
+
+
+def build_cases(backend):
+    """name -> zero-argument callable, each timed per call"""
+    # Imported here so SIMULATION_BACKEND is set before the singleton exists
+    import game1.shared
+    import game2.shared
+    from game2.formulas import game2_graph
+    from database.backends import create_backend
+    from database.cache import term_cache
+    from database.database import (
+        Database, TermBatch, update_game1_term, update_game1_terms, update_game2_term
+    )
+    from ui.live import LiveView
+
+    # Rendering goes to a real terminal-width console that discards output
+    sink = Console(file=io.StringIO(), force_terminal=True, width=120)
+    game1.shared.console = game2.shared.console = sink
+
+    db = Database()
+    conn_cm = db.get_conn(caller="benchmarks")
+    conn = conn_cm.__enter__()
+    update_game1_terms(conn, 1, {"EBITDA": 100.0, "Multiple": 8.0, "Factor Score": 1.1})
+    update_game1_terms(conn, 2, {"EBITDA": True, "Multiple": True, "Factor Score": True})
+    with TermBatch(conn) as batch:
+        for term, company, value in GAME2_FORM:
+            batch.update_game2_term(term, 1, company, value)
+
+    game1_outputs = game1.shared.calculate_game1_outputs(conn)
+    game2_outputs = game2.shared.calculate_game2_outputs(conn)
+
+    def cold(calculate):
+        def run():
+            term_cache.invalidate()
+            calculate(conn)
+        return run
+
+    # Alternate two outputs so every live frame redraws the changed cells
+    live = LiveView(game2.shared.game2_layout, sink)
+    frames = itertools.cycle([game2_outputs, {**game2_outputs, "price_company1": game2_outputs["price_company1"] + 1}])
+
+    # One changed price per call: only the metrics downstream of it rerun
+    company_rows = itertools.cycle([(10.0, 20.0, 30.0, 1000, 2000, 3000), (10.0, 21.0, 30.0, 1000, 2000, 3000)])
+    evaluation = game2_graph().evaluation()
+
+    def checkout():
+        with db.get_conn(caller="benchmarks.checkout"):
+            pass
+
+    def initialize():
+        if backend == "postgres":
+            from database import setup_db
+            setup_db.console = sink
+            setup_db.initialize_tables()
+        else:
+            create_backend(backend).close()
+
+    cases = {
+        "calculate_game1_outputs": lambda: game1.shared.calculate_game1_outputs(conn),
+        "calculate_game1_outputs[cold]": cold(game1.shared.calculate_game1_outputs),
+        "calculate_game2_outputs": lambda: game2.shared.calculate_game2_outputs(conn),
+        "calculate_game2_outputs[cold]": cold(game2.shared.calculate_game2_outputs),
+        "update_game2_metrics": lambda: game2.shared.update_game2_metrics(evaluation, next(company_rows)),
+        "display_game1_outputs": lambda: game1.shared.display_game1_outputs(game1_outputs),
+        "display_game2_outputs": lambda: game2.shared.display_game2_outputs(game2_outputs),
+        "display_game2_outputs[live]": lambda: live.show(next(frames)),
+        "update_game1_term": lambda: update_game1_term(conn, "EBITDA", 1, 100.0),
+        "update_game2_term": lambda: update_game2_term(conn, "price_company1", 1, 1, 10.0),
+        "Database.get_conn": checkout,
+        "setup_db.initialize": initialize,
+    }
+    def close():
+        live.close()
+        conn_cm.__exit__(None, None, None)
+
+    return cases, close
+
+
+def measure(run, min_iterations, min_time, warmup):
+    """Per-call latencies in seconds: at least min_iterations and min_time"""
+    for _ in range(warmup):
+        run()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < min_iterations or time.perf_counter() - started < min_time:
+        start = time.perf_counter_ns()
+        run()
+        samples.append((time.perf_counter_ns() - start) / 1e9)
+    return samples
+
+
+def summarise(samples):
+    ordered = sorted(samples)
+    return {
+        "iterations": len(samples),
+        "ops_per_sec": len(samples) / sum(samples),
+        "mean": statistics.fmean(samples),
+        "p50": ordered[len(ordered) // 2],
+        "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))],
+    }
+
+
+def load_baseline(path):
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def save_baseline(path, backend, results):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({
+        "backend": backend,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }, indent=2) + "\n")
+
+
+def report(results, baseline, threshold):
+    """Print the results table; returns names of regressed cases"""
+    table = Table(title="Benchmarks (microseconds)")
+    table.add_column("Case", style="cyan", no_wrap=True, min_width=29)
+    table.add_column("Ops/s", justify="right")
+    table.add_column("p50", justify="right")
+    table.add_column("p99", justify="right", no_wrap=True)
+    table.add_column("Baseline p50", justify="right")
+    table.add_column("Change", justify="right")
+
+    regressions = []
+    for name, result in results.items():
+        base = (baseline or {}).get("results", {}).get(name)
+        if base:
+            change = result["p50"] / base["p50"] - 1 if base["p50"] else 0.0
+            regressed = change > threshold
+            if regressed:
+                regressions.append(name)
+            style = "red" if regressed else "green" if change < -threshold else ""
+            baseline_cells = (f"{base['p50'] * 1e6:,.1f}", f"[{style}]{change:+.1%}" if style else f"{change:+.1%}")
+        else:
+            baseline_cells = ("-", "-")
+        table.add_row(
+            escape(name),
+            f"{result['ops_per_sec']:,.0f}",
+            f"{result['p50'] * 1e6:,.1f}",
+            f"{result['p99'] * 1e6:,.1f}",
+            *baseline_cells
+        )
+    console.print(table)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=("memory", "sqlite", "postgres"), default="memory")
+    parser.add_argument("--only", action="append", help="run only this case (repeatable)")
+    parser.add_argument("--iterations", type=int, default=200, help="minimum timed calls per case")
+    parser.add_argument("--min-time", type=float, default=0.5, help="minimum seconds per case")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed p50 slowdown before a case counts as regressed")
+    parser.add_argument("--baseline", type=Path, help="baseline file (default: baselines/<backend>.json)")
+    parser.add_argument("--save", action="store_true", help="store these results as the baseline")
+    args = parser.parse_args(argv)
+
+    os.environ["SIMULATION_BACKEND"] = args.backend
+    if args.backend == "sqlite":
+        os.environ.setdefault("SQLITE_PATH", ":memory:")
+    baseline_path = args.baseline or BASELINE_DIR / f"{args.backend}.json"
+
+    cases, close = build_cases(args.backend)
+    unknown = set(args.only or ()) - set(cases)
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+    try:
+        results = {}
+        for name, run in cases.items():
+            if args.only and name not in args.only:
+                continue
+            # Initialization is far slower than the rest; a few calls suffice
+            iterations = 5 if name == "setup_db.initialize" else args.iterations
+            results[name] = summarise(measure(run, iterations, args.min_time, min(args.warmup, iterations)))
+    finally:
+        close()
+
+    if args.save:
+        save_baseline(baseline_path, args.backend, results)
+        report(results, None, args.threshold)
+        console.print(f"[green]✓ Baseline saved to {baseline_path}")
+        return 0
+
+    baseline = load_baseline(baseline_path)
+    regressions = report(results, baseline, args.threshold)
+    if baseline is None:
+        console.print(f"[yellow]No baseline at {baseline_path}; run with --save to record one")
+    elif regressions:
+        console.print(f"[red]✗ {len(regressions)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    else:
+        console.print(f"[green]✓ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
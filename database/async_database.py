@@ -0,0 +1,187 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+from database.backends.base import (
+    DEFAULT_SESSION, GAME1_COLUMNS, GAME1_DEFAULT_TERMS, GAME2_COLUMNS, GAME2_COMPANY_DATA_QUERY,
+    GAME2_DEFAULT_TERMS, game1_column, game2_column, term_write
+)
+from database.database import connection_params
+from database.history import record_game2_results
+from database.prepared import STATEMENTS
+from game2.shared import add_allocation, compute_game2_metrics
+
+
+class AsyncDatabase:
+    """
+    asyncio counterpart of Database, backed by a shared asyncpg pool
+
+    The pool and its lock belong to the event loop that created them; a
+    later loop (another asyncio.run()) gets a pool of its own.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.pool = None
+            cls._instance._loop = None
+            cls._instance._pool_lock = None
+        return cls._instance
+
+    def _bind_loop(self):
+        """Drop a pool and lock left behind by a previous event loop"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self.pool = None
+            self._pool_lock = asyncio.Lock()
+
+    async def _init_pool(self):
+        self._bind_loop()
+        async with self._pool_lock:
+            if self.pool is None:
+                self.pool = await asyncpg.create_pool(
+                    min_size=int(os.getenv('PG_ASYNC_POOL_MIN', '1')),
+                    max_size=int(os.getenv('PG_ASYNC_POOL_MAX', '10')),
+                    init=_init_connection,
+                    **connection_params()
+                )
+        return self.pool
+
+    @asynccontextmanager
+    async def get_conn(self):
+        pool = self.pool if self._loop is asyncio.get_running_loop() else None
+        pool = pool or await self._init_pool()
+        async with pool.acquire() as conn:
+            yield conn
+
+    async def close_all(self):
+        if self.pool is not None and self._loop is asyncio.get_running_loop():
+            await self.pool.close()
+        self.pool = None
+        self._loop = None
+
+
+async def _init_connection(conn):
+    """Decode NUMERIC as float, matching the psycopg2 backend, instead of Decimal"""
+    await conn.set_type_codec(
+        'numeric', encoder=str, decoder=float, schema='pg_catalog', format='text'
+    )
+
+
+# Session operations
+async def create_session(conn, session_id):
+    """Seed the default Game 1 and Game 2 terms for a new session"""
+    async with conn.transaction():
+        await conn.executemany(
+            """INSERT INTO game1_terms (session_id, term, description) VALUES ($1, $2, $3)
+               ON CONFLICT (session_id, term) DO UPDATE SET description = EXCLUDED.description""",
+            [(session_id, term, description) for term, description in GAME1_DEFAULT_TERMS]
+        )
+        await conn.executemany(
+            "INSERT INTO game2_terms (session_id, term) VALUES ($1, $2) ON CONFLICT (session_id, term) DO NOTHING",
+            [(session_id, term) for term in GAME2_DEFAULT_TERMS]
+        )
+
+
+# Game 1 operations
+async def get_game1_terms(conn, session_id=DEFAULT_SESSION):
+    return await conn.fetch(
+        f"SELECT {GAME1_COLUMNS} FROM game1_terms WHERE session_id = $1 ORDER BY id",
+        session_id
+    )
+
+
+async def update_game1_term(conn, term, team, value, session_id=DEFAULT_SESSION, expected_version=None):
+    """Compare-and-swap write of one term, as database.update_game1_term; returns a TermWrite"""
+    row = await conn.fetchrow(
+        STATEMENTS[f"game1_update_{game1_column(team)}"][1], value, session_id, term, expected_version
+    )
+    if row and not row[0]:
+        current = (await _current_game1_rows(conn, session_id, [term])).get(term)
+        return term_write(False, current)
+    return term_write(row[0], tuple(row)[1:]) if row else term_write(False, None)
+
+
+async def update_game1_terms(conn, team, values, session_id=DEFAULT_SESSION, expected_versions=None):
+    """Write {term: value} for one team in a single statement; returns {term: TermWrite}"""
+    expected_versions = expected_versions or {}
+    terms = list(values)
+    rows = await conn.fetch(
+        STATEMENTS[f"game1_update_many_{game1_column(team)}"][1], session_id, terms,
+        [values[term] for term in terms], [expected_versions.get(term) for term in terms]
+    )
+    conflicts = [row[2] for row in rows if not row[0]]
+    current = await _current_game1_rows(conn, session_id, conflicts) if conflicts else {}
+    results = {term: term_write(False, None) for term in terms}
+    results.update((row[2], term_write(row[0], tuple(row)[1:])) for row in rows)
+    results.update((term, term_write(False, row)) for term, row in current.items())
+    return results
+
+
+async def _current_game1_rows(conn, session_id, terms):
+    """{term: row} as last committed, for terms whose compare-and-swap lost"""
+    rows = await conn.fetch(STATEMENTS['game1_current'][1], session_id, terms)
+    return {row[1]: tuple(row) for row in rows}
+
+
+# Game 2 operations
+async def get_game2_terms(conn, session_id=DEFAULT_SESSION):
+    return await conn.fetch(
+        f"SELECT {GAME2_COLUMNS} FROM game2_terms WHERE session_id = $1 ORDER BY id",
+        session_id
+    )
+
+
+async def update_game2_term(conn, term, team, company, value, session_id=DEFAULT_SESSION):
+    await conn.execute(
+        f"UPDATE game2_terms SET {game2_column(team, company)} = $1, last_updated = NOW() "
+        f"WHERE session_id = $2 AND term = $3",
+        value, session_id, term
+    )
+
+
+async def update_game2_terms(conn, team, updates, session_id=DEFAULT_SESSION):
+    """Write many (term, company, value) updates for one team in a single statement"""
+    rows = {}
+    for term, company, value in updates:
+        rows.setdefault(term, [term, None, None, None])[int(company)] = value
+    if not rows:
+        return
+    terms, company1, company2, company3 = zip(*rows.values())
+    await conn.execute(
+        f"""UPDATE game2_terms AS t SET
+                {game2_column(team, 1)} = COALESCE(v.company1, t.{game2_column(team, 1)}),
+                {game2_column(team, 2)} = COALESCE(v.company2, t.{game2_column(team, 2)}),
+                {game2_column(team, 3)} = COALESCE(v.company3, t.{game2_column(team, 3)}),
+                last_updated = NOW()
+            FROM unnest($2::text[], $3::numeric[], $4::numeric[], $5::numeric[])
+                AS v(term, company1, company2, company3)
+            WHERE t.session_id = $1 AND t.term = v.term""",
+        session_id, list(terms), list(company1), list(company2), list(company3)
+    )
+
+
+async def get_game2_company_data(conn, session_id=DEFAULT_SESSION):
+    """(price1, price2, price3, shares1, shares2, shares3) entered by Team 1"""
+    return tuple(await conn.fetchrow(GAME2_COMPANY_DATA_QUERY.replace('%s', '$1'), session_id))
+
+
+async def calculate_game2_outputs(conn, session_id=DEFAULT_SESSION):
+    """Async version of game2.shared.calculate_game2_outputs, recording the same history"""
+    prices = await get_game2_company_data(conn, session_id)
+    results = compute_game2_metrics(prices)
+    record_game2_results(session_id, results)
+    return add_allocation(results, prices, await get_game2_terms(conn, session_id))
+
+
+async def get_terms_version(conn, table, session_id=DEFAULT_SESSION):
+    """Counter bumped on every write to a session's rows in table"""
+    version = await conn.fetchval(
+        "SELECT version FROM term_versions WHERE table_name = $1 AND session_id = $2",
+        table, session_id
+    )
+    return version or 0
@@ -0,0 +1,34 @@
+import os
+from importlib import import_module
+
+from .base import DEFAULT_SESSION
+
+# name -> (module, class); a backend's driver is only imported once it is used
+BACKENDS = {
+    'postgres': ('database.backends.postgres', 'PostgresBackend'),
+    'sqlite': ('database.backends.sqlite', 'SQLiteBackend'),
+    'memory': ('database.backends.memory', 'MemoryBackend'),
+}
+
+
+def backend_name():
+    return os.getenv('SIMULATION_BACKEND', 'postgres')
+
+
+def backend_class(name):
+    module, cls = BACKENDS[name]
+    return getattr(import_module(module), cls)
+
+
+def create_backend(name=None):
+    """Build the storage backend selected by SIMULATION_BACKEND"""
+    name = name or backend_name()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    if name == 'postgres':
+        return backend_class(name)()
+
+    # Stand-alone engines come with the default session ready to play,
+    # publishing their changes in process
+    from database.notifications import memory_bus
+    return backend_class(name)(bus=memory_bus, session_id=DEFAULT_SESSION)
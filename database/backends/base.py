@@ -0,0 +1,242 @@
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+DEFAULT_SESSION = 'default'
+
+GAME1_DEFAULT_TERMS = [
+    ('EBITDA', 'Earnings Before Interest, Taxes, Depreciation, and Amortization'),
+    ('Multiple', 'Industry-standard valuation multiplier'),
+    ('Factor Score', 'Company-specific adjustment factor (0.5 - 1.5)')
+]
+
+GAME2_DEFAULT_TERMS = [
+    'price_company1', 'price_company2', 'price_company3',
+    'shares_company1', 'shares_company2', 'shares_company3',
+    'investor1_budget', 'investor2_budget', 'investor3_budget'
+]
+
+GAME2_REQUIRED_INPUTS = GAME2_DEFAULT_TERMS[:6]
+# Team 2's investor budgets, entered in their rows' team2_company1 column
+GAME2_BUDGET_TERMS = GAME2_DEFAULT_TERMS[6:]
+
+# Explicit column lists keep row tuples stable whatever the physical layout
+GAME1_COLUMNS = "id, term, team1_value, team2_approval, description, last_updated, version"
+GAME2_COLUMNS = (
+    "id, term, team1_company1, team1_company2, team1_company3, "
+    "team2_company1, team2_company2, team2_company3, last_updated"
+)
+
+# Outcome of a Game 1 term write. version counts the writes to a term
+# row; a write given an expected version only lands while the row is still
+# at it (compare-and-swap). On a conflict applied is False and row is the
+# row as it stands, to retry from; both are None for an unknown term.
+TermWrite = namedtuple('TermWrite', ['applied', 'version', 'row'])
+GAME1_VERSION = 6
+
+# Positions in the GAME1_COLUMNS / GAME2_COLUMNS row layout
+LAST_UPDATED_GAME1 = 5
+LAST_UPDATED_GAME2 = 8
+
+# Columns carried by change events, as the Postgres NOTIFY payload has them
+GAME1_PUBLISHED = {
+    'team1_value': 2, 'team2_approval': 3, 'last_updated': LAST_UPDATED_GAME1, 'version': GAME1_VERSION
+}
+GAME2_PUBLISHED = {
+    **{f"team{team}_company{company}": 2 + (team - 1) * 3 + (company - 1)
+       for team in (1, 2) for company in (1, 2, 3)},
+    'last_updated': LAST_UPDATED_GAME2
+}
+
+
+def term_write(applied, row):
+    """TermWrite from an applied flag and a GAME1_COLUMNS row (or None)"""
+    if row is None:
+        return TermWrite(False, None, None)
+    return TermWrite(applied, row[GAME1_VERSION], row)
+
+
+GAME2_COMPANY_DATA_QUERY = """
+    SELECT
+        MAX(CASE WHEN term = 'price_company1' THEN team1_company1 END) as price1,
+        MAX(CASE WHEN term = 'price_company2' THEN team1_company2 END) as price2,
+        MAX(CASE WHEN term = 'price_company3' THEN team1_company3 END) as price3,
+        MAX(CASE WHEN term = 'shares_company1' THEN team1_company1 END) as shares1,
+        MAX(CASE WHEN term = 'shares_company2' THEN team1_company2 END) as shares2,
+        MAX(CASE WHEN term = 'shares_company3' THEN team1_company3 END) as shares3
+    FROM game2_terms
+    WHERE session_id = %s
+"""
+
+# Append-only calculation history: table -> row layout. Each row is folded
+# into (width, bucket, session) rollups of its measured column on write.
+HISTORY_COLUMNS = {
+    'game1_valuations': (
+        'session_id', 'calculation_time', 'ebitda', 'multiple', 'factor_score', 'valuation'
+    ),
+    'game2_results': (
+        'session_id', 'calculation_time', 'total_market_value',
+        'company1_weight', 'company2_weight', 'company3_weight'
+    ),
+}
+HISTORY_MEASURES = {'game1_valuations': 'valuation', 'game2_results': 'total_market_value'}
+ROLLUP_WIDTHS = ('minute', 'hour')
+
+
+def rollup_table(table):
+    return f"{table}_rollup"
+
+
+def rollup_rows(table, rows):
+    """
+    Aggregate history rows per (width, bucket, session_id) into
+    [samples, total, minimum, maximum]
+    """
+    measure = HISTORY_COLUMNS[table].index(HISTORY_MEASURES[table])
+    rollups = {}
+    for row in rows:
+        value = row[measure]
+        if value is None:
+            continue
+        at = row[1]
+        for width, bucket in (('minute', at.replace(second=0, microsecond=0)),
+                              ('hour', at.replace(minute=0, second=0, microsecond=0))):
+            entry = rollups.get((width, bucket, row[0]))
+            if entry is None:
+                rollups[(width, bucket, row[0])] = [1, value, value, value]
+            else:
+                entry[0] += 1
+                entry[1] += value
+                entry[2] = min(entry[2], value)
+                entry[3] = max(entry[3], value)
+    return rollups
+
+# Game 1 term event log, written for every team1_value / team2_approval
+# update: (id, session_id, term, kind, value, occurred_at)
+GAME1_EVENT_COLUMNS = "id, session_id, term, kind, value, occurred_at"
+EDIT = 'edit'
+APPROVE = 'approve'
+REJECT = 'reject'
+
+
+def game1_column(team):
+    return 'team1_value' if team == 1 else 'team2_approval'
+
+
+def game2_column(team, company):
+    return f"team{int(team)}_company{int(company)}"
+
+
+class StorageBackend(ABC):
+    """
+    Storage engine behind the database.database functions
+
+    Every operation takes the connection handle yielded by connect(), so
+    callers keep the existing get_conn()/conn calling convention.
+    Rows use the GAME1_COLUMNS / GAME2_COLUMNS tuple layout.
+    """
+    name = None
+    # Whether calls can block on I/O; async callers run blocking backends
+    # in a thread pool
+    blocking = True
+
+    @abstractmethod
+    def connect(self, caller=None):
+        """
+        Context manager yielding a connection handle; caller labels the
+        checkout in pool metrics
+        """
+
+    def close(self):
+        pass
+
+    def pool_metrics(self):
+        """Connection pool gauges and timings, for backends that pool"""
+        return {}
+
+    # Session operations
+    @abstractmethod
+    def create_session(self, conn, session_id):
+        pass
+
+    # Game 1 operations
+    @abstractmethod
+    def get_game1_terms(self, conn, session_id):
+        pass
+
+    @abstractmethod
+    def update_game1_term(self, conn, term, team, value, session_id, expected_version=None):
+        """
+        Set one team's column of a term and return a TermWrite; a Team 1
+        value that differs from the current one also clears the approval
+        """
+
+    @abstractmethod
+    def update_game1_terms(self, conn, team, values, session_id, expected_versions=None):
+        """
+        update_game1_term for every {term: value} in one transaction,
+        returning {term: TermWrite}; each term is checked against its own
+        expected version, so some can land while others conflict
+        """
+
+    # Game 2 operations
+    @abstractmethod
+    def get_game2_terms(self, conn, session_id):
+        pass
+
+    @abstractmethod
+    def update_game2_term(self, conn, term, team, company, value, session_id):
+        pass
+
+    def update_game2_terms(self, conn, team, updates, session_id):
+        self.write_batch(conn, {}, {team: [(session_id, *update) for update in updates]})
+
+    @abstractmethod
+    def get_game2_company_data(self, conn, session_id):
+        """(price1, price2, price3, shares1, shares2, shares3) entered by Team 1"""
+
+    def get_missing_game2_inputs(self, conn, session_id):
+        """Required Game 2 terms Team 1 has not filled in"""
+        company_data = self.get_game2_company_data(conn, session_id)
+        return [term for term, value in zip(GAME2_REQUIRED_INPUTS, company_data) if value is None]
+
+    @abstractmethod
+    def get_terms_version(self, conn, table, session_id):
+        """Counter bumped on every write to a session's rows in table"""
+
+    # Calculation history
+    @abstractmethod
+    def write_history(self, conn, history):
+        """
+        Append {table: [row]} history rows (HISTORY_COLUMNS layout) and
+        fold them into the rollups in one transaction
+        """
+
+    @abstractmethod
+    def get_history_trend(self, conn, table, session_id, width, since):
+        """(bucket, samples, mean, minimum, maximum) rollup rows, oldest first"""
+
+    # Game 1 event log
+    @abstractmethod
+    def iter_game1_events(self, conn, session_id, after_id, batch_size):
+        """
+        Lists of at most batch_size event rows (GAME1_EVENT_COLUMNS) with
+        id > after_id in id order, for one session or all (None)
+        """
+
+    @abstractmethod
+    def get_game1_snapshot(self, conn, session_id):
+        """(last_event_id, {term: [value, approved]}) of the latest snapshot, or None"""
+
+    @abstractmethod
+    def write_game1_snapshot(self, conn, session_id, last_event_id, state):
+        pass
+
+    @abstractmethod
+    def write_batch(self, conn, game1, game2):
+        """
+        Apply TermBatch contents in one transaction
+
+        game1 maps team -> [(session_id, term, value)], game2 maps
+        team -> [(session_id, term, company, value)]. Game 1 writes are
+        unconditional, but still advance versions and clear approvals.
+        """
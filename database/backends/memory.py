@@ -0,0 +1,216 @@
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from .base import (
+    APPROVE, EDIT, GAME1_DEFAULT_TERMS, GAME1_PUBLISHED, GAME1_VERSION, GAME2_DEFAULT_TERMS,
+    GAME2_PUBLISHED, HISTORY_COLUMNS, LAST_UPDATED_GAME1, LAST_UPDATED_GAME2, REJECT,
+    StorageBackend, rollup_rows, term_write
+)
+
+
+def game1_index(team):
+    return 2 if team == 1 else 3
+
+
+def game2_index(team, company):
+    return 2 + (int(team) - 1) * 3 + (int(company) - 1)
+
+
+class MemoryConnection:
+    """Connection handle for MemoryBackend; there is nothing to open"""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Pure in-process engine for bots, CI and benchmarks
+
+    Terms live in per-session dicts of mutable rows keyed by term, so reads
+    and updates are a dict lookup under one lock. Updates are published on
+    the given change bus the way the Postgres triggers NOTIFY.
+    """
+    name = 'memory'
+    blocking = False
+
+    def __init__(self, bus=None, session_id=None):
+        self.bus = bus
+        self._lock = threading.RLock()
+        self._game1 = {}
+        self._game2 = {}
+        self._next_id = {'game1_terms': 0, 'game2_terms': 0}
+        self._versions = {}
+        self._history = {table: [] for table in HISTORY_COLUMNS}
+        self._rollups = {table: {} for table in HISTORY_COLUMNS}
+        self._events = []
+        self._snapshots = {}
+        self._conn = MemoryConnection(self)
+        if session_id:
+            self.create_session(self._conn, session_id)
+
+    @contextmanager
+    def connect(self, caller=None):
+        yield self._conn
+
+    def _new_id(self, table):
+        self._next_id[table] += 1
+        return self._next_id[table]
+
+    def _bump(self, table, session_id):
+        key = (table, session_id)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def _publish(self, table, session_id, row, columns):
+        """columns maps each published column to its row position"""
+        self._bump(table, session_id)
+        if self.bus is not None:
+            self.bus.publish(table, session_id, row[1], {column: row[i] for column, i in columns.items()})
+
+    # Session operations
+    def create_session(self, conn, session_id):
+        now = datetime.now()
+        with self._lock:
+            game1 = self._game1.setdefault(session_id, {})
+            for term, description in GAME1_DEFAULT_TERMS:
+                if term in game1:
+                    game1[term][4] = description
+                else:
+                    game1[term] = [self._new_id('game1_terms'), term, None, False, description, now, 0]
+            game2 = self._game2.setdefault(session_id, {})
+            for term in GAME2_DEFAULT_TERMS:
+                if term not in game2:
+                    game2[term] = [self._new_id('game2_terms'), term, None, None, None, None, None, None, now]
+            self._bump('game1_terms', session_id)
+            self._bump('game2_terms', session_id)
+
+    # Game 1 operations
+    def get_game1_terms(self, conn, session_id):
+        with self._lock:
+            return [tuple(row) for row in self._game1.get(session_id, {}).values()]
+
+    def update_game1_term(self, conn, term, team, value, session_id, expected_version=None):
+        with self._lock:
+            return self._set_game1(session_id, term, team, value, datetime.now(), expected_version)
+
+    def update_game1_terms(self, conn, team, values, session_id, expected_versions=None):
+        expected_versions = expected_versions or {}
+        now = datetime.now()
+        with self._lock:
+            return {
+                term: self._set_game1(session_id, term, team, value, now, expected_versions.get(term))
+                for term, value in values.items()
+            }
+
+    def _set_game1(self, session_id, term, team, value, now, expected_version=None):
+        row = self._game1.get(session_id, {}).get(term)
+        if row is None:
+            return term_write(False, None)
+        if expected_version is not None and row[GAME1_VERSION] != expected_version:
+            return term_write(False, tuple(row))
+        if team == 1 and row[2] != value:
+            # An approval only ever covers the value Team 2 saw
+            row[3] = False
+        row[game1_index(team)] = value
+        row[LAST_UPDATED_GAME1] = now
+        row[GAME1_VERSION] += 1
+        # Same rows the game1_terms event triggers insert
+        if team == 1:
+            self._events.append((len(self._events) + 1, session_id, term, EDIT, value, now))
+        else:
+            self._events.append((len(self._events) + 1, session_id, term, APPROVE if value else REJECT, None, now))
+        self._publish('game1_terms', session_id, row, GAME1_PUBLISHED)
+        return term_write(True, tuple(row))
+
+    # Game 2 operations
+    def get_game2_terms(self, conn, session_id):
+        with self._lock:
+            return [tuple(row) for row in self._game2.get(session_id, {}).values()]
+
+    def update_game2_term(self, conn, term, team, company, value, session_id):
+        with self._lock:
+            self._set_game2(session_id, term, team, company, value, datetime.now())
+
+    def _set_game2(self, session_id, term, team, company, value, now):
+        row = self._game2.get(session_id, {}).get(term)
+        if row is None:
+            return
+        row[game2_index(team, company)] = value
+        row[LAST_UPDATED_GAME2] = now
+        self._publish('game2_terms', session_id, row, GAME2_PUBLISHED)
+
+    def get_game2_company_data(self, conn, session_id):
+        with self._lock:
+            terms = self._game2.get(session_id, {})
+            return tuple(
+                terms[f"{kind}_company{i}"][game2_index(1, i)] if f"{kind}_company{i}" in terms else None
+                for kind in ('price', 'shares')
+                for i in range(1, 4)
+            )
+
+    def get_terms_version(self, conn, table, session_id):
+        return self._versions.get((table, session_id), 0)
+
+    def write_history(self, conn, history):
+        with self._lock:
+            for table, rows in history.items():
+                self._history[table].extend(rows)
+                rollups = self._rollups[table]
+                for key, (samples, total, minimum, maximum) in rollup_rows(table, rows).items():
+                    entry = rollups.get(key)
+                    if entry is None:
+                        rollups[key] = [samples, total, minimum, maximum]
+                    else:
+                        entry[0] += samples
+                        entry[1] += total
+                        entry[2] = min(entry[2], minimum)
+                        entry[3] = max(entry[3], maximum)
+
+    def get_history_trend(self, conn, table, session_id, width, since):
+        with self._lock:
+            return sorted(
+                (bucket, samples, total / samples, minimum, maximum)
+                for (w, bucket, s), (samples, total, minimum, maximum) in self._rollups[table].items()
+                if w == width and s == session_id and (since is None or bucket >= since)
+            )
+
+    def iter_game1_events(self, conn, session_id, after_id, batch_size):
+        # Ids are list positions + 1, so after_id is also the start index
+        position = after_id
+        while True:
+            with self._lock:
+                chunk = self._events[position:position + batch_size]
+            if not chunk:
+                return
+            position += len(chunk)
+            rows = [event for event in chunk if session_id in (None, event[1])]
+            if rows:
+                yield rows
+
+    def get_game1_snapshot(self, conn, session_id):
+        with self._lock:
+            snapshot = self._snapshots.get(session_id)
+            return (snapshot[0], {term: list(entry) for term, entry in snapshot[1].items()}) if snapshot else None
+
+    def write_game1_snapshot(self, conn, session_id, last_event_id, state):
+        with self._lock:
+            current = self._snapshots.get(session_id)
+            if current is None or current[0] < last_event_id:
+                self._snapshots[session_id] = (last_event_id, {term: list(entry) for term, entry in state.items()})
+
+    def write_batch(self, conn, game1, game2):
+        now = datetime.now()
+        with self._lock:
+            for team, rows in game1.items():
+                for session_id, term, value in rows:
+                    self._set_game1(session_id, term, team, value, now)
+            for team, updates in game2.items():
+                for session_id, term, company, value in updates:
+                    self._set_game2(session_id, term, team, company, value, now)
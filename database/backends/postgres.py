@@ -0,0 +1,285 @@
+import io
+import os
+import threading
+from contextlib import contextmanager
+
+from psycopg2.extensions import DECIMAL, new_type, register_type
+from psycopg2.extras import Json, execute_values
+
+from database import prepared
+from database.numeric import decode_numeric
+from database.pool import ConnectionPool
+from .base import (
+    GAME1_DEFAULT_TERMS, GAME1_EVENT_COLUMNS, GAME2_DEFAULT_TERMS, HISTORY_COLUMNS, StorageBackend,
+    game1_column, game2_column, rollup_rows, rollup_table, term_write
+)
+
+
+# NUMERIC columns decoded straight to float; psycopg2 would otherwise build
+# a Decimal per value that every calculation then converts again
+NUMERIC_FLOAT = new_type(DECIMAL.values, 'NUMERIC_FLOAT', decode_numeric)
+
+
+def connection_params():
+    """Connection settings shared by every pool and dedicated connection"""
+    return {
+        'user': os.getenv('PG_USER', 'postgres'),
+        'password': os.getenv('PG_PASSWORD', 'root-1234567890'),
+        'host': os.getenv('PG_HOST', 'localhost'),
+        'port': os.getenv('PG_PORT', '5432'),
+        'database': os.getenv('PG_DATABASE', 'simulation_games')
+    }
+
+
+class PostgresBackend(StorageBackend):
+    """psycopg2 backend over a ConnectionPool, created on first use"""
+    name = 'postgres'
+
+    def __init__(self):
+        self.connection_pool = None
+        self._lock = threading.Lock()
+
+    def _init_pool(self):
+        with self._lock:
+            if self.connection_pool is None:
+                self.connection_pool = ConnectionPool.from_env(**connection_params())
+        return self.connection_pool
+
+    @contextmanager
+    def connect(self, caller=None):
+        connection_pool = self.connection_pool or self._init_pool()
+        conn = connection_pool.getconn(caller=caller)
+        try:
+            register_type(NUMERIC_FLOAT, conn)
+            if prepared.enabled():
+                prepared.prepare_statements(conn)
+            yield conn
+        finally:
+            connection_pool.putconn(conn)
+
+    def close(self):
+        if self.connection_pool is not None:
+            self.connection_pool.closeall()
+            self.connection_pool = None
+
+    def pool_metrics(self):
+        return self.connection_pool.metrics() if self.connection_pool else {}
+
+    # Session operations
+    def create_session(self, conn, session_id):
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                """INSERT INTO game1_terms (session_id, term, description) VALUES %s
+                   ON CONFLICT (session_id, term) DO UPDATE SET description = EXCLUDED.description""",
+                [(session_id, term, description) for term, description in GAME1_DEFAULT_TERMS]
+            )
+            execute_values(
+                cur,
+                "INSERT INTO game2_terms (session_id, term) VALUES %s ON CONFLICT (session_id, term) DO NOTHING",
+                [(session_id, term) for term in GAME2_DEFAULT_TERMS]
+            )
+        conn.commit()
+
+    # Game 1 operations
+    def get_game1_terms(self, conn, session_id):
+        with conn.cursor() as cur:
+            prepared.execute(cur, 'game1_select', (session_id,))
+            return cur.fetchall()
+
+    def update_game1_term(self, conn, term, team, value, session_id, expected_version=None):
+        with conn.cursor() as cur:
+            prepared.execute(
+                cur, f"game1_update_{game1_column(team)}", (value, session_id, term, expected_version)
+            )
+            row = cur.fetchone()
+            if row and not row[0]:
+                current = _current_game1_rows(cur, session_id, [term]).get(term)
+                row = (False, *current) if current else None
+            conn.commit()
+        return term_write(row[0], row[1:]) if row else term_write(False, None)
+
+    def update_game1_terms(self, conn, team, values, session_id, expected_versions=None):
+        expected_versions = expected_versions or {}
+        terms = list(values)
+        with conn.cursor() as cur:
+            prepared.execute(cur, f"game1_update_many_{game1_column(team)}", (
+                session_id, terms, [values[term] for term in terms],
+                [expected_versions.get(term) for term in terms]
+            ))
+            rows = cur.fetchall()
+            conflicts = [row[2] for row in rows if not row[0]]
+            current = _current_game1_rows(cur, session_id, conflicts) if conflicts else {}
+            conn.commit()
+        results = {term: term_write(False, None) for term in terms}
+        results.update((row[2], term_write(row[0], row[1:])) for row in rows)
+        results.update((term, term_write(False, row)) for term, row in current.items())
+        return results
+
+    # Game 2 operations
+    def get_game2_terms(self, conn, session_id):
+        with conn.cursor() as cur:
+            prepared.execute(cur, 'game2_select', (session_id,))
+            return cur.fetchall()
+
+    def update_game2_term(self, conn, term, team, company, value, session_id):
+        with conn.cursor() as cur:
+            prepared.execute(cur, f"game2_update_{game2_column(team, company)}", (value, session_id, term))
+            conn.commit()
+
+    def get_game2_company_data(self, conn, session_id):
+        with conn.cursor() as cur:
+            prepared.execute(cur, 'game2_company_data', (session_id,))
+            return cur.fetchone()
+
+    def get_terms_version(self, conn, table, session_id):
+        with conn.cursor() as cur:
+            prepared.execute(cur, 'terms_version', (table, session_id))
+            row = cur.fetchone()
+            return row[0] if row else 0
+
+    def write_history(self, conn, history):
+        try:
+            with conn.cursor() as cur:
+                for table, rows in history.items():
+                    if rows:
+                        _copy_history(cur, table, rows)
+                        _upsert_rollups(cur, table, rollup_rows(table, rows))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def get_history_trend(self, conn, table, session_id, width, since):
+        with conn.cursor() as cur:
+            cur.execute(
+                f"""SELECT bucket, samples, total / samples, minimum, maximum FROM {rollup_table(table)}
+                    WHERE width = %s AND session_id = %s AND bucket >= COALESCE(%s::timestamp, '-infinity')
+                    ORDER BY bucket""",
+                (width, session_id, since)
+            )
+            return cur.fetchall()
+
+    def iter_game1_events(self, conn, session_id, after_id, batch_size):
+        # A named (server-side) cursor streams the log without loading it
+        # all; it needs its own transaction, closed once the log is read
+        with conn.cursor(name='game1_events') as cur:
+            cur.itersize = batch_size
+            cur.execute(
+                f"""SELECT {GAME1_EVENT_COLUMNS} FROM game1_term_events
+                    WHERE id > %s AND (%s::text IS NULL OR session_id = %s) ORDER BY id""",
+                (after_id, session_id, session_id)
+            )
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        conn.commit()
+
+    def get_game1_snapshot(self, conn, session_id):
+        with conn.cursor() as cur:
+            cur.execute(
+                """SELECT last_event_id, state FROM game1_snapshots
+                   WHERE session_id = %s ORDER BY last_event_id DESC LIMIT 1""",
+                (session_id,)
+            )
+            return cur.fetchone()
+
+    def write_game1_snapshot(self, conn, session_id, last_event_id, state):
+        with conn.cursor() as cur:
+            cur.execute(
+                """INSERT INTO game1_snapshots (session_id, last_event_id, state) VALUES (%s, %s, %s)
+                   ON CONFLICT (session_id, last_event_id) DO NOTHING""",
+                (session_id, last_event_id, Json(state))
+            )
+        conn.commit()
+
+    def write_batch(self, conn, game1, game2):
+        try:
+            with conn.cursor() as cur:
+                for team, rows in game1.items():
+                    _write_game1_terms(cur, team, rows)
+                for team, updates in game2.items():
+                    _write_game2_terms(cur, team, updates)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def _current_game1_rows(cur, session_id, terms):
+    """
+    {term: row} as last committed, for terms whose compare-and-swap lost;
+    a statement of its own, so it sees the write the swap conflicted with
+    """
+    prepared.execute(cur, 'game1_current', (session_id, terms))
+    return {row[1]: row for row in cur.fetchall()}
+
+
+def _write_game1_terms(cur, team, rows):
+    cast = 'numeric' if team == 1 else 'boolean'
+    # The last write to a term wins, as it would with one UPDATE per term
+    rows = {(session_id, term): (session_id, term, value) for session_id, term, value in rows}
+    execute_values(
+        cur,
+        f"""UPDATE game1_terms AS t SET {game1_column(team)} = v.value, last_updated = NOW()
+            FROM (VALUES %s) AS v(session_id, term, value)
+            WHERE t.session_id = v.session_id AND t.term = v.term""",
+        list(rows.values()),
+        template=f"(%s, %s, %s::{cast})"
+    )
+
+
+def _write_game2_terms(cur, team, updates):
+    # Pivot to one VALUES row per term; companies left as NULL keep their value
+    rows = {}
+    for session_id, term, company, value in updates:
+        rows.setdefault((session_id, term), [session_id, term, None, None, None])[company + 1] = value
+    execute_values(
+        cur,
+        f"""UPDATE game2_terms AS t SET
+                {game2_column(team, 1)} = COALESCE(v.company1, t.{game2_column(team, 1)}),
+                {game2_column(team, 2)} = COALESCE(v.company2, t.{game2_column(team, 2)}),
+                {game2_column(team, 3)} = COALESCE(v.company3, t.{game2_column(team, 3)}),
+                last_updated = NOW()
+            FROM (VALUES %s) AS v(session_id, term, company1, company2, company3)
+            WHERE t.session_id = v.session_id AND t.term = v.term""",
+        list(rows.values()),
+        template="(%s, %s, %s::numeric, %s::numeric, %s::numeric)"
+    )
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+    return repr(float(value))
+
+
+def _copy_history(cur, table, rows):
+    """Append rows with COPY, the fastest bulk path into Postgres"""
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(map(_copy_value, row)))
+        buffer.write('\n')
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(HISTORY_COLUMNS[table])}) FROM STDIN", buffer)
+
+
+def _upsert_rollups(cur, table, rollups):
+    execute_values(
+        cur,
+        f"""INSERT INTO {rollup_table(table)} AS r
+                (width, bucket, session_id, samples, total, minimum, maximum)
+            VALUES %s
+            ON CONFLICT (width, session_id, bucket) DO UPDATE SET
+                samples = r.samples + EXCLUDED.samples,
+                total = r.total + EXCLUDED.total,
+                minimum = LEAST(r.minimum, EXCLUDED.minimum),
+                maximum = GREATEST(r.maximum, EXCLUDED.maximum)""",
+        [(width, bucket, session_id, *values) for (width, bucket, session_id), values in rollups.items()]
+    )
@@ -0,0 +1,384 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from .base import (
+    GAME1_COLUMNS, GAME1_DEFAULT_TERMS, GAME1_EVENT_COLUMNS, GAME1_PUBLISHED, GAME2_COLUMNS,
+    GAME2_COMPANY_DATA_QUERY, GAME2_DEFAULT_TERMS, GAME2_PUBLISHED, HISTORY_COLUMNS, StorageBackend,
+    game1_column, game2_column, rollup_rows, rollup_table, term_write
+)
+
+# Default database file: in the project's data/ directory, whatever the
+# working directory; SQLITE_PATH overrides it
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'data', 'simulation_games.db'
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS game1_terms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    term VARCHAR(50) NOT NULL,
+    team1_value NUMERIC,
+    team2_approval BOOLEAN DEFAULT FALSE,
+    description TEXT,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    session_id VARCHAR(64) NOT NULL DEFAULT 'default',
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS game1_terms_session_term_idx ON game1_terms (session_id, term);
+
+CREATE TABLE IF NOT EXISTS game2_terms (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    term VARCHAR(50) NOT NULL,
+    team1_company1 NUMERIC,
+    team1_company2 NUMERIC,
+    team1_company3 NUMERIC,
+    team2_company1 NUMERIC,
+    team2_company2 NUMERIC,
+    team2_company3 NUMERIC,
+    last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    session_id VARCHAR(64) NOT NULL DEFAULT 'default'
+);
+CREATE UNIQUE INDEX IF NOT EXISTS game2_terms_session_term_idx ON game2_terms (session_id, term);
+
+CREATE TABLE IF NOT EXISTS term_versions (
+    table_name VARCHAR(32) NOT NULL,
+    session_id VARCHAR(64) NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, session_id)
+);
+
+CREATE TABLE IF NOT EXISTS game1_term_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id VARCHAR(64) NOT NULL,
+    term VARCHAR(50) NOT NULL,
+    kind VARCHAR(8) NOT NULL,
+    value NUMERIC,
+    occurred_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS game1_term_events_session_idx ON game1_term_events (session_id, id);
+
+CREATE TRIGGER IF NOT EXISTS game1_terms_edit_event AFTER UPDATE OF team1_value ON game1_terms
+BEGIN
+    INSERT INTO game1_term_events (session_id, term, kind, value)
+    VALUES (NEW.session_id, NEW.term, 'edit', NEW.team1_value);
+END;
+
+-- Every term write advances version; the approval reset below does not,
+-- which keeps it out of the log: replay derives it from the edit
+DROP TRIGGER IF EXISTS game1_terms_approval_event;
+CREATE TRIGGER game1_terms_approval_event AFTER UPDATE OF team2_approval ON game1_terms
+WHEN NEW.version IS NOT OLD.version
+BEGIN
+    INSERT INTO game1_term_events (session_id, term, kind)
+    VALUES (NEW.session_id, NEW.term, CASE WHEN NEW.team2_approval THEN 'approve' ELSE 'reject' END);
+END;
+
+CREATE TRIGGER IF NOT EXISTS game1_terms_reset_approval AFTER UPDATE OF team1_value ON game1_terms
+WHEN NEW.team1_value IS NOT OLD.team1_value AND NEW.team2_approval
+BEGIN
+    UPDATE game1_terms SET team2_approval = FALSE WHERE id = NEW.id;
+END;
+
+CREATE TABLE IF NOT EXISTS game1_snapshots (
+    session_id VARCHAR(64) NOT NULL,
+    last_event_id BIGINT NOT NULL,
+    taken_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    state TEXT NOT NULL,
+    PRIMARY KEY (session_id, last_event_id)
+);
+
+CREATE TABLE IF NOT EXISTS game1_valuations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id VARCHAR(64) NOT NULL,
+    calculation_time TIMESTAMP NOT NULL,
+    ebitda NUMERIC,
+    multiple NUMERIC,
+    factor_score NUMERIC,
+    valuation NUMERIC
+);
+
+CREATE TABLE IF NOT EXISTS game2_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id VARCHAR(64) NOT NULL,
+    calculation_time TIMESTAMP NOT NULL,
+    total_market_value NUMERIC,
+    company1_weight NUMERIC,
+    company2_weight NUMERIC,
+    company3_weight NUMERIC
+);
+""" + "".join(f"""
+CREATE INDEX IF NOT EXISTS {table}_session_time_idx ON {table} (session_id, calculation_time);
+CREATE TABLE IF NOT EXISTS {table}_rollup (
+    width VARCHAR(8) NOT NULL,
+    bucket TIMESTAMP NOT NULL,
+    session_id VARCHAR(64) NOT NULL,
+    samples BIGINT NOT NULL,
+    total NUMERIC NOT NULL,
+    minimum NUMERIC NOT NULL,
+    maximum NUMERIC NOT NULL,
+    PRIMARY KEY (width, session_id, bucket)
+);
+""" for table in HISTORY_COLUMNS) + "".join(f"""
+CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()} AFTER {event} ON {table}
+BEGIN
+    INSERT INTO term_versions (table_name, session_id, version) VALUES ('{table}', NEW.session_id, 1)
+    ON CONFLICT (table_name, session_id) DO UPDATE SET version = version + 1;
+END;
+""" for table in ('game1_terms', 'game2_terms') for event in ('INSERT', 'UPDATE'))
+
+
+class SQLiteConnection(sqlite3.Connection):
+    """sqlite3 connection that knows which backend opened it"""
+    backend = None
+
+
+class SQLiteBackend(StorageBackend):
+    """
+    Single-file backend for running the games without a Postgres server
+
+    Each thread gets its own connection; ':memory:' databases are opened
+    in shared-cache mode so those connections see the same data. Committed
+    updates are published on the given change bus the way the Postgres
+    triggers NOTIFY; writers in other processes are not seen by it.
+    """
+    name = 'sqlite'
+
+    def __init__(self, path=None, bus=None, session_id=None):
+        self.path = path or os.getenv('SQLITE_PATH', DEFAULT_PATH)
+        if self.path == DEFAULT_PATH:
+            os.makedirs(os.path.dirname(DEFAULT_PATH), exist_ok=True)
+        self.bus = bus
+        self._local = threading.local()
+        # (owning thread, connection); ones whose thread has ended are
+        # closed as new connections open
+        self._connections = []
+        self._lock = threading.Lock()
+        self._keepalive = None
+        with self.connect() as conn:
+            _add_version_column(conn)
+            conn.executescript(SCHEMA)
+            # Keep shared in-memory databases alive between connections
+            self._keepalive = conn
+            if session_id:
+                self.create_session(conn, session_id)
+
+    def _open(self):
+        if self.path == ':memory:':
+            conn = sqlite3.connect(
+                f"file:simulation_{id(self)}?mode=memory&cache=shared",
+                uri=True, factory=SQLiteConnection, check_same_thread=False
+            )
+        else:
+            conn = sqlite3.connect(self.path, factory=SQLiteConnection, check_same_thread=False)
+        conn.backend = self
+        with self._lock:
+            live = []
+            for thread, other in self._connections:
+                if thread.is_alive() or other is self._keepalive:
+                    live.append((thread, other))
+                else:
+                    other.close()
+            live.append((threading.current_thread(), conn))
+            self._connections = live
+        return conn
+
+    @contextmanager
+    def connect(self, caller=None):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+        yield conn
+
+    def close(self):
+        with self._lock:
+            for _, conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def _publish(self, table, rows):
+        """Publish committed GAME1_COLUMNS / GAME2_COLUMNS rows of one session each"""
+        if self.bus is None:
+            return
+        published = GAME1_PUBLISHED if table == 'game1_terms' else GAME2_PUBLISHED
+        for session_id, row in rows:
+            values = {column: row[i] for column, i in published.items()}
+            if 'team2_approval' in values:
+                values['team2_approval'] = bool(values['team2_approval'])
+            self.bus.publish(table, session_id, row[1], values)
+
+    def _select_rows(self, conn, table, keys):
+        """(session_id, row) for each distinct (session_id, term) in keys"""
+        columns = GAME1_COLUMNS if table == 'game1_terms' else GAME2_COLUMNS
+        rows = []
+        for session_id, term in dict.fromkeys(keys):
+            row = conn.execute(
+                f"SELECT {columns} FROM {table} WHERE session_id = ? AND term = ?", (session_id, term)
+            ).fetchone()
+            if row is not None:
+                rows.append((session_id, row))
+        return rows
+
+    # Session operations
+    def create_session(self, conn, session_id):
+        with conn:
+            conn.executemany(
+                """INSERT INTO game1_terms (session_id, term, description) VALUES (?, ?, ?)
+                   ON CONFLICT (session_id, term) DO UPDATE SET description = excluded.description""",
+                [(session_id, term, description) for term, description in GAME1_DEFAULT_TERMS]
+            )
+            conn.executemany(
+                "INSERT INTO game2_terms (session_id, term) VALUES (?, ?) ON CONFLICT (session_id, term) DO NOTHING",
+                [(session_id, term) for term in GAME2_DEFAULT_TERMS]
+            )
+
+    # Game 1 operations
+    def get_game1_terms(self, conn, session_id):
+        return conn.execute(
+            f"SELECT {GAME1_COLUMNS} FROM game1_terms WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+
+    def update_game1_term(self, conn, term, team, value, session_id, expected_version=None):
+        return self.update_game1_terms(conn, team, {term: value}, session_id, {term: expected_version})[term]
+
+    def update_game1_terms(self, conn, team, values, session_id, expected_versions=None):
+        expected_versions = expected_versions or {}
+        results = {}
+        with conn:
+            for term, value in values.items():
+                applied = _update_game1(conn, team, [(session_id, term, value)], expected_versions.get(term))
+                row = conn.execute(
+                    f"SELECT {GAME1_COLUMNS} FROM game1_terms WHERE session_id = ? AND term = ?",
+                    (session_id, term)
+                ).fetchone()
+                results[term] = term_write(applied, row)
+        self._publish('game1_terms', [(session_id, write.row) for write in results.values() if write.applied])
+        return results
+
+    # Game 2 operations
+    def get_game2_terms(self, conn, session_id):
+        return conn.execute(
+            f"SELECT {GAME2_COLUMNS} FROM game2_terms WHERE session_id = ? ORDER BY id",
+            (session_id,)
+        ).fetchall()
+
+    def update_game2_term(self, conn, term, team, company, value, session_id):
+        with conn:
+            _update_game2(conn, team, [(session_id, term, company, value)])
+        if self.bus is not None:
+            self._publish('game2_terms', self._select_rows(conn, 'game2_terms', [(session_id, term)]))
+
+    def get_game2_company_data(self, conn, session_id):
+        return conn.execute(GAME2_COMPANY_DATA_QUERY.replace('%s', '?'), (session_id,)).fetchone()
+
+    def get_terms_version(self, conn, table, session_id):
+        row = conn.execute(
+            "SELECT version FROM term_versions WHERE table_name = ? AND session_id = ?",
+            (table, session_id)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def write_history(self, conn, history):
+        with conn:
+            for table, rows in history.items():
+                if not rows:
+                    continue
+                columns = HISTORY_COLUMNS[table]
+                conn.executemany(
+                    f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    [(row[0], row[1].isoformat(sep=' '), *row[2:]) for row in rows]
+                )
+                conn.executemany(
+                    f"""INSERT INTO {rollup_table(table)}
+                            (width, bucket, session_id, samples, total, minimum, maximum)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (width, session_id, bucket) DO UPDATE SET
+                            samples = samples + excluded.samples,
+                            total = total + excluded.total,
+                            minimum = MIN(minimum, excluded.minimum),
+                            maximum = MAX(maximum, excluded.maximum)""",
+                    [(width, bucket.isoformat(sep=' '), session_id, *values)
+                     for (width, bucket, session_id), values in rollup_rows(table, rows).items()]
+                )
+
+    def get_history_trend(self, conn, table, session_id, width, since):
+        rows = conn.execute(
+            f"""SELECT bucket, samples, total * 1.0 / samples, minimum, maximum FROM {rollup_table(table)}
+                WHERE width = ? AND session_id = ? AND bucket >= ? ORDER BY bucket""",
+            (width, session_id, since.isoformat(sep=' ') if since else '')
+        ).fetchall()
+        return [(datetime.fromisoformat(row[0]), *row[1:]) for row in rows]
+
+    def iter_game1_events(self, conn, session_id, after_id, batch_size):
+        cur = conn.execute(
+            f"""SELECT {GAME1_EVENT_COLUMNS} FROM game1_term_events
+                WHERE id > ? AND (? IS NULL OR session_id = ?) ORDER BY id""",
+            (after_id, session_id, session_id)
+        )
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+    def get_game1_snapshot(self, conn, session_id):
+        row = conn.execute(
+            """SELECT last_event_id, state FROM game1_snapshots
+               WHERE session_id = ? ORDER BY last_event_id DESC LIMIT 1""",
+            (session_id,)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def write_game1_snapshot(self, conn, session_id, last_event_id, state):
+        with conn:
+            conn.execute(
+                """INSERT INTO game1_snapshots (session_id, last_event_id, state) VALUES (?, ?, ?)
+                   ON CONFLICT (session_id, last_event_id) DO NOTHING""",
+                (session_id, last_event_id, json.dumps(state))
+            )
+
+    def write_batch(self, conn, game1, game2):
+        # One transaction; sqlite has no round trips to save on the statements
+        with conn:
+            for team, rows in game1.items():
+                _update_game1(conn, team, rows)
+            for team, updates in game2.items():
+                _update_game2(conn, team, updates)
+        if self.bus is not None:
+            game1_keys = [(session_id, term) for rows in game1.values() for session_id, term, _ in rows]
+            game2_keys = [(update[0], update[1]) for updates in game2.values() for update in updates]
+            self._publish('game1_terms', self._select_rows(conn, 'game1_terms', game1_keys))
+            self._publish('game2_terms', self._select_rows(conn, 'game2_terms', game2_keys))
+
+
+def _add_version_column(conn):
+    """Upgrade a game1_terms table created before terms were versioned"""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(game1_terms)")}
+    if columns and 'version' not in columns:
+        conn.execute("ALTER TABLE game1_terms ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.commit()
+
+
+def _update_game1(conn, team, rows, expected_version=None):
+    """True if every row was written; expected_version makes the write a compare-and-swap"""
+    cur = conn.executemany(
+        f"UPDATE game1_terms SET {game1_column(team)} = ?, version = version + 1, "
+        f"last_updated = CURRENT_TIMESTAMP "
+        f"WHERE session_id = ? AND term = ? AND (? IS NULL OR version = ?)",
+        [(value, session_id, term, expected_version, expected_version) for session_id, term, value in rows]
+    )
+    return cur.rowcount == len(rows)
+
+
+def _update_game2(conn, team, updates):
+    for session_id, term, company, value in updates:
+        conn.execute(
+            f"UPDATE game2_terms SET {game2_column(team, company)} = ?, last_updated = CURRENT_TIMESTAMP "
+            f"WHERE session_id = ? AND term = ?",
+            (value, session_id, term)
+        )
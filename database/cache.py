@@ -0,0 +1,80 @@
+import os
+import threading
+from collections import OrderedDict
+
+from database.database import (
+    DEFAULT_SESSION, backend_for, get_game1_terms, get_game2_company_data,
+    get_game2_terms, get_terms_version
+)
+
+
+class TermCache:
+    """
+    Read-through LRU cache for term reads, keyed on (read, session)
+
+    Each lookup first asks the backend for the session's version counter,
+    a single-row read, and only reruns the full query when it moved.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, conn, name, table, session_id, loader):
+        """Return loader(conn, session_id), reusing it while table's version holds"""
+        key = (backend_for(conn), name, session_id)
+        # Read the version before the rows: a write landing in between only
+        # costs an extra refetch next time, never a stale hit
+        version = get_terms_version(conn, table, session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = loader(conn, session_id)
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self, session_id=None):
+        """Drop cached reads for one session, or everything"""
+        with self._lock:
+            for key in [k for k in self._entries if session_id in (None, k[2])]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+term_cache = TermCache(maxsize=int(os.getenv('SIMULATION_CACHE_SIZE', '1024')))
+
+
+def cached_game1_terms(conn, session_id=DEFAULT_SESSION):
+    return term_cache.get(conn, 'game1_terms', 'game1_terms', session_id, get_game1_terms)
+
+
+def cached_game2_terms(conn, session_id=DEFAULT_SESSION):
+    return term_cache.get(conn, 'game2_terms', 'game2_terms', session_id, get_game2_terms)
+
+
+def cached_game2_company_data(conn, session_id=DEFAULT_SESSION):
+    return term_cache.get(conn, 'game2_company_data', 'game2_terms', session_id, get_game2_company_data)
@@ -1,73 +1,248 @@
-import psycopg2
-from psycopg2 import pool
 from contextlib import contextmanager
 import os
-from dotenv import load_dotenv
+import sys
+import threading
 
-load_dotenv()
+
+def _load_dotenv():
+    """load_dotenv() for the nearest .env above this package, importing dotenv only if one exists"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, '.env')
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
+
+
+# Before the imports below: they read SIMULATION_* settings at import time
+_load_dotenv()
+
+from database.backends import backend_class, create_backend  # noqa: E402
+from database.backends.base import DEFAULT_SESSION, HISTORY_COLUMNS, ROLLUP_WIDTHS  # noqa: E402
+from database.metrics import instrument, query  # noqa: E402
+
+# Raw psycopg2 connections (setup_db, benchmarks) carry no backend handle
+_postgres = None
+
+
+def connection_params():
+    """PG_* connection settings shared by every pool and dedicated connection"""
+    from database.backends.postgres import connection_params
+    return connection_params()
+
+
+def current_session():
+    """Game session the CLIs play in, from SIMULATION_SESSION"""
+    return os.getenv('SIMULATION_SESSION', DEFAULT_SESSION)
+
+
+def backend_for(conn):
+    """Storage backend that owns a connection handle"""
+    backend = getattr(conn, 'backend', None)
+    if backend is not None:
+        return backend
+    global _postgres
+    if _postgres is None:
+        _postgres = backend_class('postgres')()
+    return _postgres
 
 
 class Database:
+    """
+    Process-wide handle on the storage backend
+
+    Constructing it is free: the backend, and with it the driver import
+    and connection pool, is only created by the first get_conn().
+    """
     _instance = None
+    _lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance._init_pool()
+            cls._instance._backend = None
         return cls._instance
 
-    def _init_pool(self):
-        self.connection_pool = psycopg2.pool.ThreadedConnectionPool(
-            minconn=1,
-            maxconn=10,
-            user=os.getenv('PG_USER', 'postgres'),
-            password=os.getenv('PG_PASSWORD', 'root-1234567890'),
-            host=os.getenv('PG_HOST', 'localhost'),
-            port=os.getenv('PG_PORT', '5432'),
-            database=os.getenv('PG_DATABASE', 'simulation_games')
-        )
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = create_backend()
+        return self._backend
 
     @contextmanager
-    def get_conn(self):
-        conn = self.connection_pool.getconn()
-        try:
+    def get_conn(self, caller=None):
+        """
+        Check out a connection; the hold time is recorded in pool metrics
+        under caller, by default the calling module and function
+        """
+        if caller is None:
+            frame = sys._getframe(2)
+            caller = f"{frame.f_globals.get('__name__')}.{frame.f_code.co_name}"
+        with self.backend.connect(caller) as conn:
             yield conn
-        finally:
-            self.connection_pool.putconn(conn)
+
+    def pool_metrics(self):
+        return self._backend.pool_metrics() if self._backend is not None else {}
 
     def close_all(self):
-        self.connection_pool.closeall()
+        if self._backend is not None:
+            self._backend.close()
+
+
+# Session operations
+@query
+def create_session(conn, session_id):
+    """Seed the default Game 1 and Game 2 terms for a new session"""
+    backend_for(conn).create_session(conn, session_id)
 
 
 # Game 1 operations
-def get_game1_terms(conn):
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM game1_terms ORDER BY id")
-        return cur.fetchall()
+@query
+def get_game1_terms(conn, session_id=DEFAULT_SESSION):
+    return backend_for(conn).get_game1_terms(conn, session_id)
+
+
+@query
+def update_game1_term(conn, term, team, value, session_id=DEFAULT_SESSION, expected_version=None):
+    """
+    Write one team's column of a term and return a TermWrite
+
+    With expected_version the write only lands if the term is still at
+    that version; otherwise applied is False and row holds the current
+    term to decide on and retry from. A changed Team 1 value clears the
+    approval in the same statement.
+    """
+    return backend_for(conn).update_game1_term(conn, term, team, value, session_id, expected_version)
 
 
-def update_game1_term(conn, term, team, value):
-    with conn.cursor() as cur:
-        column = 'team1_value' if team == 1 else 'team2_approval'
-        cur.execute(
-            f"UPDATE game1_terms SET {column} = %s, last_updated = NOW() WHERE term = %s",
-            (value, term)
-        )
-        conn.commit()
+@query(rows_from='values')
+def update_game1_terms(conn, team, values, session_id=DEFAULT_SESSION, expected_versions=None):
+    """
+    Write {term: value} for one team in a single statement and commit;
+    returns {term: TermWrite}, each term checked against expected_versions
+    """
+    return backend_for(conn).update_game1_terms(conn, team, values, session_id, expected_versions)
 
 
 # Game 2 operations
-def get_game2_terms(conn):
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM game2_terms ORDER BY id")
-        return cur.fetchall()
-
-
-def update_game2_term(conn, term, team, company, value):
-    with conn.cursor() as cur:
-        column = f"team{team}_company{company}"
-        cur.execute(
-            f"UPDATE game2_terms SET {column} = %s, last_updated = NOW() WHERE term = %s",
-            (value, term)
-        )
-        conn.commit()
\ No newline at end of file
+@query
+def get_game2_terms(conn, session_id=DEFAULT_SESSION):
+    return backend_for(conn).get_game2_terms(conn, session_id)
+
+
+@query
+def update_game2_term(conn, term, team, company, value, session_id=DEFAULT_SESSION):
+    backend_for(conn).update_game2_term(conn, term, team, company, value, session_id)
+
+
+@query(rows_from='updates')
+def update_game2_terms(conn, team, updates, session_id=DEFAULT_SESSION):
+    """
+    Write many (term, company, value) updates for one team in a single
+    statement and commit
+    """
+    backend_for(conn).update_game2_terms(conn, team, updates, session_id)
+
+
+@query
+def get_game2_company_data(conn, session_id=DEFAULT_SESSION):
+    """(price1, price2, price3, shares1, shares2, shares3) entered by Team 1"""
+    return backend_for(conn).get_game2_company_data(conn, session_id)
+
+
+@query
+def get_missing_game2_inputs(conn, session_id=DEFAULT_SESSION):
+    """Required Game 2 terms Team 1 has not filled in"""
+    return backend_for(conn).get_missing_game2_inputs(conn, session_id)
+
+
+@query
+def get_terms_version(conn, table, session_id=DEFAULT_SESSION):
+    """Counter bumped on every write to a session's rows in table"""
+    return backend_for(conn).get_terms_version(conn, table, session_id)
+
+
+# Calculation history
+def _history_rows(history):
+    return sum(map(len, history.values()))
+
+
+@query(rows_from='history', row_count=_history_rows)
+def write_history(conn, history):
+    """Append {table: [row]} history rows and update their rollups in one transaction"""
+    backend_for(conn).write_history(conn, history)
+
+
+@query
+def get_history_trend(conn, table, session_id=DEFAULT_SESSION, width='minute', since=None):
+    """
+    (bucket, samples, mean, minimum, maximum) per minute or hour bucket of
+    a history table's measure, read from its rollup
+    """
+    if table not in HISTORY_COLUMNS:
+        raise ValueError(f"Unknown history table {table!r}")
+    if width not in ROLLUP_WIDTHS:
+        raise ValueError(f"Unknown rollup width {width!r}; expected one of {', '.join(ROLLUP_WIDTHS)}")
+    return backend_for(conn).get_history_trend(conn, table, session_id, width, since)
+
+
+# Game 1 event log
+@query
+def iter_game1_events(conn, session_id=None, after_id=0, batch_size=50_000):
+    """Event rows after after_id in id order, in lists of up to batch_size"""
+    return backend_for(conn).iter_game1_events(conn, session_id, after_id, batch_size)
+
+
+@query
+def get_game1_snapshot(conn, session_id=DEFAULT_SESSION):
+    """(last_event_id, {term: [value, approved]}) of the latest snapshot, or None"""
+    return backend_for(conn).get_game1_snapshot(conn, session_id)
+
+
+@query
+def write_game1_snapshot(conn, session_id, last_event_id, state):
+    backend_for(conn).write_game1_snapshot(conn, session_id, last_event_id, state)
+
+
+class TermBatch:
+    """
+    Unit of work collecting term updates for both games and writing them
+    as multi-row statements in one transaction
+    """
+
+    def __init__(self, conn, session_id=DEFAULT_SESSION):
+        self.conn = conn
+        self.session_id = session_id
+        self.game1 = {}
+        self.game2 = {}
+
+    def update_game1_term(self, term, team, value, session_id=None):
+        self.game1.setdefault(team, []).append((session_id or self.session_id, term, value))
+
+    def update_game2_term(self, term, team, company, value, session_id=None):
+        self.game2.setdefault(team, []).append((session_id or self.session_id, term, company, value))
+
+    @instrument('query', name='write_batch')
+    def flush(self):
+        if not self.game1 and not self.game2:
+            return
+        try:
+            backend_for(self.conn).write_batch(self.conn, self.game1, self.game2)
+        finally:
+            self.game1, self.game2 = {}, {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.game1, self.game2 = {}, {}
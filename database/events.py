@@ -0,0 +1,61 @@
+import os
+
+from database.backends.base import APPROVE, EDIT, GAME1_DEFAULT_TERMS, REJECT
+from database.database import (
+    DEFAULT_SESSION, get_game1_snapshot, iter_game1_events, write_game1_snapshot
+)
+
+# A rebuild that had to replay at least this many events leaves a fresh
+# snapshot behind, so the next one replays fewer
+SNAPSHOT_EVERY = int(os.getenv('SIMULATION_SNAPSHOT_EVERY', '500'))
+
+
+def initial_state():
+    """{term: [value, approved]} of a newly created session"""
+    return {term: [None, False] for term, _ in GAME1_DEFAULT_TERMS}
+
+
+def fold_events(states, rows, last_ids=None):
+    """
+    Apply event rows (GAME1_EVENT_COLUMNS) to per-session states in place
+
+    states maps session_id -> {term: [value, approved]}; sessions seen for
+    the first time start from initial_state(). last_ids, if given, gets
+    the last applied event id per session.
+    """
+    for event_id, session_id, term, kind, value, _ in rows:
+        state = states.get(session_id)
+        if state is None:
+            state = states[session_id] = initial_state()
+        entry = state.get(term)
+        if entry is None:
+            entry = state[term] = [None, False]
+        if kind == EDIT:
+            value = None if value is None else float(value)
+            if value != entry[0]:
+                # A changed value clears the approval without an event of its own
+                entry[1] = False
+            entry[0] = value
+        elif kind == APPROVE:
+            entry[1] = True
+        elif kind == REJECT:
+            entry[1] = False
+        if last_ids is not None:
+            last_ids[session_id] = event_id
+
+
+def rebuild_game1_state(conn, session_id=DEFAULT_SESSION, snapshot_every=SNAPSHOT_EVERY):
+    """
+    Session's {term: [value, approved]} from its latest snapshot plus the
+    events logged after it
+    """
+    snapshot = get_game1_snapshot(conn, session_id)
+    last_id, state = snapshot if snapshot else (0, initial_state())
+    states, last_ids = {session_id: state}, {session_id: last_id}
+    replayed = 0
+    for rows in iter_game1_events(conn, session_id, last_id):
+        fold_events(states, rows, last_ids)
+        replayed += len(rows)
+    if snapshot_every and replayed >= snapshot_every:
+        write_game1_snapshot(conn, session_id, last_ids[session_id], state)
+    return state
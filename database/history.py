@@ -0,0 +1,160 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from database.database import Database, write_history
+
+
+class HistoryWriter:
+    """
+    Buffered, append-only writer for calculation results
+
+    record() only appends to an in-memory batch. A background thread
+    flushes it every interval seconds, or as soon as batch_size rows are
+    waiting, in one write_history call (COPY on Postgres). Callers only
+    block once max_pending rows have piled up, which flushes inline.
+    """
+
+    def __init__(self, batch_size=1000, interval=1.0, max_pending=100_000, db=None):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.db = db
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self._pending = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._thread = None
+
+    def record(self, table, row):
+        with self._lock:
+            self._pending.setdefault(table, []).append(row)
+            self._count += 1
+            count = self._count
+            if self._thread is None:
+                self._start()
+        if count >= self.max_pending:
+            self.flush()
+        elif count >= self.batch_size:
+            self._wake.set()
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as exc:
+                # Keep the writer alive; the failed batch was requeued
+                self.errors += 1
+                self.last_error = exc
+
+    def flush(self):
+        """Write every pending row now"""
+        with self._flush_lock:
+            with self._lock:
+                batch, count = self._pending, self._count
+                self._pending, self._count = {}, 0
+            if not count:
+                return
+            try:
+                with (self.db or Database()).get_conn(caller='database.history.flush') as conn:
+                    write_history(conn, batch)
+            except Exception:
+                self._requeue(batch, count)
+                raise
+            self.written += count
+
+    def _requeue(self, batch, count):
+        with self._lock:
+            if self._count + count > self.max_pending:
+                self.dropped += count
+                return
+            for table, rows in batch.items():
+                self._pending[table] = rows + self._pending.get(table, [])
+            self._count += count
+
+    def close(self):
+        self._closed.set()
+        self._wake.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        try:
+            self.flush()
+        except Exception as exc:
+            # Runs at exit, where there is nobody left to raise to
+            self.errors += 1
+            self.last_error = exc
+
+    def stats(self):
+        with self._lock:
+            pending = self._count
+        return {
+            'pending': pending,
+            'written': self.written,
+            'dropped': self.dropped,
+            'errors': self.errors,
+        }
+
+
+def enabled():
+    return os.getenv('SIMULATION_HISTORY', '1') != '0'
+
+
+history_writer = HistoryWriter(
+    batch_size=int(os.getenv('SIMULATION_HISTORY_BATCH', '1000')),
+    interval=float(os.getenv('SIMULATION_HISTORY_INTERVAL', '1.0')),
+)
+
+
+# Term version each session's valuation was last recorded at, so an agreed
+# session refreshed over and over is recorded once; oldest sessions go first
+_valuation_versions = OrderedDict()
+_valuation_lock = threading.Lock()
+VALUATION_VERSIONS_MAX = 10_000
+
+
+def _new_valuation_version(session_id, version):
+    """False if session_id's valuation was already recorded at version"""
+    with _valuation_lock:
+        if _valuation_versions.get(session_id) == version:
+            return False
+        _valuation_versions[session_id] = version
+        _valuation_versions.move_to_end(session_id)
+        while len(_valuation_versions) > VALUATION_VERSIONS_MAX:
+            _valuation_versions.popitem(last=False)
+        return True
+
+
+def record_game1_valuation(session_id, term_values, valuation, at=None, version=None):
+    """
+    Queue an agreed Game 1 valuation for game1_valuations; given the
+    version of the terms it was agreed at, only the first time per version
+    """
+    if enabled() and (version is None or _new_valuation_version(session_id, version)):
+        history_writer.record('game1_valuations', (
+            session_id, at or datetime.now(), term_values['EBITDA'], term_values['Multiple'],
+            term_values['Factor Score'], valuation
+        ))
+
+
+def record_game2_results(session_id, results, at=None):
+    """Queue a Game 2 calculation for game2_results"""
+    if enabled():
+        history_writer.record('game2_results', (
+            session_id, at or datetime.now(), results['total_market_value'],
+            results['weight_company1'], results['weight_company2'], results['weight_company3']
+        ))
@@ -0,0 +1,349 @@
+"""
+Timing hooks for queries, calculations and rendering, exported as
+Prometheus text.
+
+Set SIMULATION_METRICS=1 to enable them. When it is unset the decorators
+return the function unchanged, so a disabled hook costs nothing per call.
+SIMULATION_PROFILE_RATE (0-1) additionally runs that fraction of
+instrumented calls under cProfile and dumps each profile to
+SIMULATION_PROFILE_DIR. SIMULATION_METRICS_FILE makes a CLI process write
+its metrics there at exit, for a textfile collector to pick up; the API
+server serves them on GET /metrics.
+"""
+import atexit
+import functools
+import os
+import random
+import threading
+import time
+from collections import deque
+from types import GeneratorType
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+QUANTILES = (50, 90, 99)
+
+
+class LatencyStats:
+    """Count/total/max plus a bounded sample window for percentiles"""
+
+    def __init__(self, window=2048):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._samples.append(seconds)
+
+    def copy(self):
+        """Independent snapshot, to summarise outside the owner's lock"""
+        other = LatencyStats(self._samples.maxlen)
+        other.count, other.total, other.max = self.count, self.total, self.max
+        other._samples.extend(self._samples)
+        return other
+
+    def percentile(self, pct):
+        if not self._samples:
+            return 0.0
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p99': self.percentile(99),
+            'max': self.max
+        }
+
+
+def enabled():
+    return os.getenv('SIMULATION_METRICS', '0') != '0'
+
+
+class Registry:
+    """Latency, row and error counts per (kind, name) of instrumented call"""
+
+    def __init__(self):
+        self.latency = {}
+        self.rows = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds, rows=None, failed=False):
+        with self._lock:
+            stats = self.latency.get(key)
+            if stats is None:
+                stats = self.latency[key] = LatencyStats(window=1024)
+            stats.record(seconds)
+            if rows is not None:
+                self.rows[key] = self.rows.get(key, 0) + rows
+            if failed:
+                self.errors[key] = self.errors.get(key, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.latency, self.rows, self.errors = {}, {}, {}
+
+
+registry = Registry()
+
+
+class Profiler:
+    """Runs a sampled fraction of calls under cProfile, one at a time"""
+
+    def __init__(self, rate=0.0, directory='profiles'):
+        self.rate = rate
+        self.directory = directory
+        self.dumped = 0
+        # cProfile cannot nest, so calls made while a profile runs go unsampled
+        self._active = threading.Lock()
+
+    def sample(self):
+        return self.rate > 0 and random.random() < self.rate and self._active.acquire(blocking=False)
+
+    def run(self, key, func, args, kwargs):
+        """func(*args, **kwargs) under a profiler; call only after sample() returned True"""
+        import cProfile
+
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                stamp = time.strftime('%Y%m%d-%H%M%S')
+                name = f"{key[0]}-{key[1]}-{stamp}-{os.getpid()}-{self.dumped}.prof"
+                profile.dump_stats(os.path.join(self.directory, name))
+                self.dumped += 1
+            finally:
+                self._active.release()
+
+
+profiler = Profiler(
+    rate=float(os.getenv('SIMULATION_PROFILE_RATE', '0')),
+    directory=os.getenv('SIMULATION_PROFILE_DIR', 'profiles'),
+)
+
+
+def _result_rows(result):
+    """Rows in a query result: a list of rows, one row tuple, a scalar or None"""
+    if result is None:
+        return 0
+    if isinstance(result, list):
+        return len(result)
+    return 1
+
+
+def _counted(key, batches, start):
+    """Re-yield a generator of row batches, recording once it is exhausted or closed"""
+    rows, failed = 0, False
+    try:
+        for batch in batches:
+            rows += len(batch)
+            yield batch
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        registry.record(key, time.perf_counter() - start, rows, failed)
+
+
+def instrument(kind, name=None, rows_from=None, count_rows=False, row_count=len):
+    """
+    Decorator recording each call's latency under (kind, name)
+
+    count_rows also counts the rows a query returned, or for writes
+    row_count (default: len) of its rows_from argument; a generator of row
+    batches is timed and counted until it is exhausted. Returns func
+    itself while metrics are disabled.
+    """
+    def decorate(func):
+        if not enabled():
+            return func
+        key = (kind, name or func.__name__)
+        position = func.__code__.co_varnames.index(rows_from) if rows_from else None
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                if profiler.sample():
+                    result = profiler.run(key, func, args, kwargs)
+                else:
+                    result = func(*args, **kwargs)
+            except BaseException:
+                registry.record(key, time.perf_counter() - start, failed=True)
+                raise
+            if count_rows and isinstance(result, GeneratorType):
+                return _counted(key, result, start)
+            rows = None
+            if count_rows:
+                if position is None:
+                    rows = _result_rows(result)
+                else:
+                    rows = row_count(args[position] if len(args) > position else kwargs[rows_from])
+            registry.record(key, time.perf_counter() - start, rows)
+            return result
+        return wrapper
+    return decorate
+
+
+def query(func=None, *, rows_from=None, row_count=len):
+    """instrument() for a database operation, counting its rows"""
+    decorate = instrument('query', rows_from=rows_from, count_rows=True, row_count=row_count)
+    return decorate(func) if func is not None else decorate
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class _Exposition:
+    """Prometheus text format writer; HELP and TYPE are emitted once per family"""
+
+    def __init__(self):
+        self.lines = []
+        self._families = set()
+
+    def family(self, metric, kind, help_text):
+        if metric not in self._families:
+            self._families.add(metric)
+            self.lines.append(f'# HELP {metric} {help_text}')
+            self.lines.append(f'# TYPE {metric} {kind}')
+
+    def sample(self, metric, value, **labels):
+        self.lines.append(f'{metric}{_labels(**labels)} {float(value)!r}')
+
+    def summary(self, metric, help_text, summary, **labels):
+        """One summary from a {quantiles, total, count} dict"""
+        self.family(metric, 'summary', help_text)
+        for quantile, value in summary['quantiles'].items():
+            self.sample(metric, value, **labels, quantile=quantile)
+        self.sample(f'{metric}_sum', summary['total'], **labels)
+        self.sample(f'{metric}_count', summary['count'], **labels)
+
+    def text(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+def _summary(stats):
+    return {
+        'quantiles': {f'{pct / 100:g}': stats.percentile(pct) for pct in QUANTILES},
+        'total': stats.total,
+        'count': stats.count,
+    }
+
+
+def _pool_summary(summary):
+    # Pool metrics only keep mean and two percentiles, not the raw window
+    return {
+        'quantiles': {'0.5': summary['p50'], '0.99': summary['p99']},
+        'total': summary['mean'] * summary['count'],
+        'count': summary['count'],
+    }
+
+
+POOL_GAUGES = ('size', 'in_use', 'idle', 'waiting', 'maxconn')
+POOL_COUNTERS = ('exhaustions', 'timeouts', 'health_check_failures', 'recycled')
+HISTORY_COUNTERS = {
+    'written': 'History rows written',
+    'dropped': 'History rows dropped after failed writes',
+    'errors': 'History flushes that failed',
+}
+
+
+def _export_calls(out):
+    with registry._lock:
+        latency, rows, errors = (
+            {key: _summary(stats) for key, stats in registry.latency.items()},
+            dict(registry.rows), dict(registry.errors)
+        )
+    for (kind, name), summary in sorted(latency.items()):
+        out.summary(f'simulation_{kind}_seconds', f'Latency of instrumented {kind} calls', summary, name=name)
+    for (kind, name), count in sorted(rows.items()):
+        out.family(f'simulation_{kind}_rows_total', 'counter', f'Rows read or written by {kind} calls')
+        out.sample(f'simulation_{kind}_rows_total', count, name=name)
+    for (kind, name), count in sorted(errors.items()):
+        out.family(f'simulation_{kind}_errors_total', 'counter', f'{kind.capitalize()} calls that raised')
+        out.sample(f'simulation_{kind}_errors_total', count, name=name)
+    if profiler.dumped:
+        out.family('simulation_profiles_dumped_total', 'counter', 'Sampled cProfile dumps written')
+        out.sample('simulation_profiles_dumped_total', profiler.dumped)
+
+
+def _export_pool(out):
+    # Imported here: database.database imports this module for its hooks
+    from database.database import Database
+
+    # Never open a pool just to report on it
+    if Database._instance is None:
+        return
+    pool = Database._instance.pool_metrics()
+    if not pool:
+        return
+    out.family('simulation_pool_connections', 'gauge', 'Connection pool size by state')
+    for gauge in POOL_GAUGES:
+        out.sample('simulation_pool_connections', pool[gauge], state=gauge)
+    for counter in POOL_COUNTERS:
+        out.family(f'simulation_pool_{counter}_total', 'counter', f'Connection pool {counter.replace("_", " ")}')
+        out.sample(f'simulation_pool_{counter}_total', pool[counter])
+    out.summary('simulation_pool_wait_seconds', 'Time spent waiting for a connection',
+                _pool_summary(pool['wait_time']))
+    out.summary('simulation_pool_hold_seconds', 'Time a connection was checked out',
+                _pool_summary(pool['hold_time']))
+    for caller, summary in sorted(pool['hold_time_by_caller'].items()):
+        out.summary('simulation_pool_hold_by_caller_seconds', 'Connection hold time per caller',
+                    _pool_summary(summary), caller=caller)
+
+
+def _export_caches(out):
+    from database.cache import term_cache
+    from database.history import history_writer
+
+    cache = term_cache.stats()
+    for counter in ('hits', 'misses', 'evictions'):
+        out.family(f'simulation_term_cache_{counter}_total', 'counter', f'Term cache {counter}')
+        out.sample(f'simulation_term_cache_{counter}_total', cache[counter])
+    out.family('simulation_term_cache_entries', 'gauge', 'Cached term reads')
+    out.sample('simulation_term_cache_entries', cache['size'])
+
+    history = history_writer.stats()
+    out.family('simulation_history_pending_rows', 'gauge', 'History rows waiting to be written')
+    out.sample('simulation_history_pending_rows', history['pending'])
+    for counter, help_text in HISTORY_COUNTERS.items():
+        out.family(f'simulation_history_{counter}_total', 'counter', help_text)
+        out.sample(f'simulation_history_{counter}_total', history[counter])
+
+
+def render_prometheus():
+    """Every metric in Prometheus text exposition format"""
+    out = _Exposition()
+    _export_calls(out)
+    _export_pool(out)
+    _export_caches(out)
+    return out.text()
+
+
+def write_metrics_file(path):
+    """Write render_prometheus() atomically, as textfile collectors expect"""
+    directory, name = os.path.split(path)
+    tmp = os.path.join(directory, f'.{name}.{os.getpid()}.tmp')
+    with open(tmp, 'w') as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+
+
+if enabled() and os.getenv('SIMULATION_METRICS_FILE'):
+    atexit.register(write_metrics_file, os.environ['SIMULATION_METRICS_FILE'])
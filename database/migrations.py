@@ -0,0 +1,312 @@
+"""
+The Postgres schema as numbered migrations.
+
+migrate() applies the ones a database has not seen yet, in order, each in
+its own transaction together with its row in schema_version, so a failed
+migration leaves nothing behind and the next run picks up where it
+stopped. Every migration is written idempotently (IF NOT EXISTS, CREATE
+OR REPLACE), which lets databases built before schema_version existed
+adopt it by replaying them all.
+
+Append new migrations at the end; never edit one that has shipped.
+"""
+import os
+import time
+
+from database.backends.base import DEFAULT_SESSION, HISTORY_COLUMNS, rollup_table
+
+# Arbitrary key for the advisory lock that keeps concurrent runs apart
+LOCK_KEY = 7_020_523
+
+
+def create_terms_table(cur, table, columns, partitions=0):
+    """Create a per-session terms table keyed on (session_id, term)"""
+    if partitions:
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id SERIAL,
+            {columns},
+            session_id VARCHAR(64) NOT NULL DEFAULT '{DEFAULT_SESSION}',
+            PRIMARY KEY (session_id, id)
+        ) PARTITION BY HASH (session_id)""")
+        for remainder in range(partitions):
+            cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table}_p{remainder} PARTITION OF {table}
+            FOR VALUES WITH (MODULUS {partitions}, REMAINDER {remainder})""")
+    else:
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+            id SERIAL PRIMARY KEY,
+            {columns},
+            session_id VARCHAR(64) NOT NULL DEFAULT '{DEFAULT_SESSION}'
+        )""")
+
+    # Upgrade single-game tables created before sessions existed
+    cur.execute(f"""
+    ALTER TABLE {table}
+    ADD COLUMN IF NOT EXISTS session_id VARCHAR(64) NOT NULL DEFAULT '{DEFAULT_SESSION}'""")
+    cur.execute(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {table}_term_key")
+    cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_session_term_idx ON {table} (session_id, term)")
+
+
+def terms_tables(cur):
+    # Optional hash partitioning by session keeps each partition (and
+    # its indexes) small when thousands of games share the database.
+    # Only read when the tables are first created.
+    partitions = int(os.getenv('PG_TERM_PARTITIONS', '0'))
+
+    create_terms_table(cur, 'game1_terms', """
+        term VARCHAR(50) NOT NULL,
+        team1_value NUMERIC,
+        team2_approval BOOLEAN DEFAULT FALSE,
+        description TEXT,
+        last_updated TIMESTAMP DEFAULT NOW()""", partitions)
+    create_terms_table(cur, 'game2_terms', """
+        term VARCHAR(50) NOT NULL,
+        team1_company1 NUMERIC,
+        team1_company2 NUMERIC,
+        team1_company3 NUMERIC,
+        team2_company1 NUMERIC,
+        team2_company2 NUMERIC,
+        team2_company3 NUMERIC,
+        last_updated TIMESTAMP DEFAULT NOW()""", partitions)
+
+
+def game1_event_log(cur):
+    # Every write to a Team 1 value or Team 2 approval is appended here
+    # by triggers, so the negotiation can be replayed; snapshots bound
+    # how much of the log a rebuild has to read
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS game1_term_events (
+        id BIGSERIAL PRIMARY KEY,
+        session_id VARCHAR(64) NOT NULL,
+        term VARCHAR(50) NOT NULL,
+        kind VARCHAR(8) NOT NULL,
+        value NUMERIC,
+        occurred_at TIMESTAMP NOT NULL DEFAULT NOW()
+    )""")
+    cur.execute("""
+    CREATE INDEX IF NOT EXISTS game1_term_events_session_idx ON game1_term_events (session_id, id)""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS game1_snapshots (
+        session_id VARCHAR(64) NOT NULL,
+        last_event_id BIGINT NOT NULL,
+        taken_at TIMESTAMP NOT NULL DEFAULT NOW(),
+        state JSONB NOT NULL,
+        PRIMARY KEY (session_id, last_event_id)
+    )""")
+    cur.execute("""
+    CREATE OR REPLACE FUNCTION log_game1_edit() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO game1_term_events (session_id, term, kind, value)
+        VALUES (NEW.session_id, NEW.term, 'edit', NEW.team1_value);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql""")
+    cur.execute("""
+    CREATE OR REPLACE FUNCTION log_game1_approval() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO game1_term_events (session_id, term, kind)
+        VALUES (NEW.session_id, NEW.term, CASE WHEN NEW.team2_approval THEN 'approve' ELSE 'reject' END);
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql""")
+    # UPDATE OF fires whenever the column is assigned, so a repeated
+    # rejection is logged even though the value does not change
+    for trigger, column, function in (('game1_terms_edit_event', 'team1_value', 'log_game1_edit'),
+                                      ('game1_terms_approval_event', 'team2_approval', 'log_game1_approval')):
+        cur.execute(f"DROP TRIGGER IF EXISTS {trigger} ON game1_terms")
+        cur.execute(f"""
+        CREATE TRIGGER {trigger}
+        AFTER UPDATE OF {column} ON game1_terms
+        FOR EACH ROW EXECUTE FUNCTION {function}()""")
+
+
+def calculation_history(cur):
+    # Append-only, written in COPY batches by database.history
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS game2_results (
+        id SERIAL PRIMARY KEY,
+        calculation_time TIMESTAMP DEFAULT NOW(),
+        total_market_value NUMERIC,
+        company1_weight NUMERIC,
+        company2_weight NUMERIC,
+        company3_weight NUMERIC
+    )""")
+    cur.execute(f"""
+    ALTER TABLE game2_results
+    ADD COLUMN IF NOT EXISTS session_id VARCHAR(64) NOT NULL DEFAULT '{DEFAULT_SESSION}'""")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS game1_valuations (
+        id BIGSERIAL PRIMARY KEY,
+        session_id VARCHAR(64) NOT NULL,
+        calculation_time TIMESTAMP NOT NULL DEFAULT NOW(),
+        ebitda NUMERIC,
+        multiple NUMERIC,
+        factor_score NUMERIC,
+        valuation NUMERIC
+    )""")
+
+    for table in HISTORY_COLUMNS:
+        # Rows arrive in time order, so a BRIN index stays tiny and
+        # still prunes time-range scans to the matching block ranges
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS {table}_time_brin ON {table}
+        USING BRIN (calculation_time)""")
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS {table}_session_time_idx ON {table} (session_id, calculation_time)""")
+        # Per-minute and per-hour aggregates kept current by each flush,
+        # so trend queries read a few rows instead of the raw history
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {rollup_table(table)} (
+            width VARCHAR(8) NOT NULL,
+            bucket TIMESTAMP NOT NULL,
+            session_id VARCHAR(64) NOT NULL,
+            samples BIGINT NOT NULL,
+            total NUMERIC NOT NULL,
+            minimum NUMERIC NOT NULL,
+            maximum NUMERIC NOT NULL,
+            PRIMARY KEY (width, session_id, bucket)
+        )""")
+
+
+def version_counters(cur):
+    # One counter per (table, session), bumped by every write, so the
+    # read cache can check for changes without refetching the rows
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS term_versions (
+        table_name VARCHAR(32) NOT NULL,
+        session_id VARCHAR(64) NOT NULL,
+        version BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (table_name, session_id)
+    )""")
+    cur.execute("""
+    CREATE OR REPLACE FUNCTION bump_term_version() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO term_versions (table_name, session_id, version)
+        VALUES (TG_TABLE_NAME, NEW.session_id, 1)
+        ON CONFLICT (table_name, session_id) DO UPDATE SET version = term_versions.version + 1;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql""")
+    for table in ('game1_terms', 'game2_terms'):
+        cur.execute(f"DROP TRIGGER IF EXISTS {table}_version ON {table}")
+        cur.execute(f"""
+        CREATE TRIGGER {table}_version
+        AFTER INSERT OR UPDATE ON {table}
+        FOR EACH ROW EXECUTE FUNCTION bump_term_version()""")
+
+
+def change_notifications(cur):
+    # Each changed terms row is pushed on a channel named after its
+    # table, so clients can LISTEN instead of polling
+    cur.execute("""
+    CREATE OR REPLACE FUNCTION notify_term_change() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify(TG_TABLE_NAME, (to_jsonb(NEW) - 'id' - 'description')::text);
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql""")
+    for table in ('game1_terms', 'game2_terms'):
+        cur.execute(f"DROP TRIGGER IF EXISTS {table}_notify ON {table}")
+        cur.execute(f"""
+        CREATE TRIGGER {table}_notify
+        AFTER UPDATE ON {table}
+        FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+        EXECUTE FUNCTION notify_term_change()""")
+
+
+def game1_term_versions(cur):
+    cur.execute("ALTER TABLE game1_terms ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0")
+    # Every write to a value or approval advances the row's version,
+    # which compare-and-swap updates check, and a changed value clears
+    # the approval given to the old one. Done BEFORE the row is stored,
+    # so the reset is part of Team 1's write and logs no approval event.
+    cur.execute("""
+    CREATE OR REPLACE FUNCTION advance_game1_term() RETURNS trigger AS $$
+    BEGIN
+        NEW.version := OLD.version + 1;
+        IF NEW.team1_value IS DISTINCT FROM OLD.team1_value THEN
+            NEW.team2_approval := FALSE;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql""")
+    cur.execute("DROP TRIGGER IF EXISTS game1_terms_advance ON game1_terms")
+    cur.execute("""
+    CREATE TRIGGER game1_terms_advance
+    BEFORE UPDATE OF team1_value, team2_approval ON game1_terms
+    FOR EACH ROW EXECUTE FUNCTION advance_game1_term()""")
+
+
+# (version, description, apply(cursor)), in the order they shipped
+MIGRATIONS = [
+    (1, 'Game 1 and Game 2 terms tables', terms_tables),
+    (2, 'Game 1 event log and snapshots', game1_event_log),
+    (3, 'Calculation history and rollups', calculation_history),
+    (4, 'Per-session version counters', version_counters),
+    (5, 'Change notification triggers', change_notifications),
+    (6, 'Game 1 term versions for compare-and-swap', game1_term_versions),
+]
+
+LATEST = MIGRATIONS[-1][0]
+
+
+def _create_schema_version(conn):
+    with conn, conn.cursor() as cur:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )""")
+
+
+def applied_versions(conn):
+    """{version: applied_at} of the migrations already in the database"""
+    _create_schema_version(conn)
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT version, applied_at FROM schema_version")
+        return dict(cur.fetchall())
+
+
+def pending(conn, target=None):
+    """Migrations not yet applied, up to target (default: all of them)"""
+    applied = applied_versions(conn)
+    return [
+        migration for migration in MIGRATIONS
+        if migration[0] not in applied and (target is None or migration[0] <= target)
+    ]
+
+
+def migrate(conn, target=None, on_applied=None):
+    """
+    Apply every pending migration up to target on a psycopg2 connection;
+    returns the versions applied
+
+    An advisory lock serializes concurrent runs, so the second one finds
+    nothing left to do. on_applied(version, description, seconds) is
+    called after each migration commits.
+    """
+    _create_schema_version(conn)
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+    try:
+        applied = []
+        for version, description, apply in pending(conn, target):
+            start = time.perf_counter()
+            # The with block commits the migration and its schema_version
+            # row together, or rolls both back
+            with conn, conn.cursor() as cur:
+                apply(cur)
+                cur.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                    (version, description)
+                )
+            applied.append(version)
+            if on_applied:
+                on_applied(version, description, time.perf_counter() - start)
+        return applied
+    finally:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
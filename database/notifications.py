@@ -0,0 +1,157 @@
+import json
+import os
+import select
+import threading
+import time
+from collections import deque, namedtuple
+
+from database.backends import backend_name
+from database.database import connection_params
+
+GAME1_CHANNEL = 'game1_terms'
+GAME2_CHANNEL = 'game2_terms'
+
+# One change to a terms row: the NOTIFY channel, the game session, the
+# term name and the new column values (without the static description)
+TermChange = namedtuple('TermChange', ['channel', 'session_id', 'term', 'values'])
+
+
+def parse_notification(channel, payload):
+    """Turn a notify_term_change() JSON payload into a TermChange"""
+    values = json.loads(payload)
+    return TermChange(channel, values.pop('session_id'), values.pop('term'), values)
+
+
+class Subscription:
+    """Queue of TermChange events a team client can wait on"""
+
+    def __init__(self, channels, session_id=None, on_close=None):
+        self.channels = set(channels)
+        self.session_id = session_id
+        self._events = deque()
+        self._cond = threading.Condition()
+        self._on_close = on_close
+
+    def accepts(self, event):
+        """True if the event is for a watched channel and session"""
+        return event.channel in self.channels and self.session_id in (None, event.session_id)
+
+    def _push(self, event):
+        with self._cond:
+            self._events.append(event)
+            self._cond.notify_all()
+
+    def _fill(self, timeout):
+        """Hook for subscriptions that have to pull events from a socket"""
+        with self._cond:
+            if not self._events:
+                self._cond.wait(timeout)
+
+    def wait(self, timeout=None):
+        """Block until at least one change is pending; False on timeout"""
+        if not self._events:
+            self._fill(timeout)
+        return bool(self._events)
+
+    def get(self, timeout=None):
+        """Pop the next change, or None if nothing arrived within timeout"""
+        if self.wait(timeout):
+            return self._events.popleft()
+        return None
+
+    def drain(self):
+        """Return every pending change without blocking"""
+        self.wait(0)
+        events = []
+        while self._events:
+            events.append(self._events.popleft())
+        return events
+
+    def close(self):
+        if self._on_close:
+            self._on_close(self)
+            self._on_close = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InMemoryChangeBus:
+    """In-process stand-in for Postgres LISTEN/NOTIFY"""
+
+    def __init__(self):
+        self._subscriptions = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, *channels, session_id=None):
+        subscription = Subscription(channels, session_id, on_close=self._unsubscribe)
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.remove(subscription)
+
+    def publish(self, channel, session_id, term, values):
+        event = TermChange(channel, session_id, term, dict(values))
+        with self._lock:
+            subscriptions = [s for s in self._subscriptions if s.accepts(event)]
+        for subscription in subscriptions:
+            subscription._push(event)
+
+
+class PostgresSubscription(Subscription):
+    """Subscription fed by LISTEN on a dedicated autocommit connection"""
+
+    def __init__(self, channels, session_id=None):
+        super().__init__(channels, session_id)
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        self.conn = psycopg2.connect(**connection_params())
+        self.conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.conn.cursor() as cur:
+            for channel in self.channels:
+                cur.execute(f'LISTEN "{channel}"')
+
+    def _fill(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._events:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if select.select([self.conn], [], [], remaining) == ([], [], []):
+                return
+            self.conn.poll()
+            while self.conn.notifies:
+                notify = self.conn.notifies.pop(0)
+                event = parse_notification(notify.channel, notify.payload)
+                if self.accepts(event):
+                    self._events.append(event)
+
+    def close(self):
+        if not self.conn.closed:
+            self.conn.close()
+
+
+class PostgresChangeFeed:
+    """Subscriber API over the notify_term_change() triggers"""
+
+    def subscribe(self, *channels, session_id=None):
+        return PostgresSubscription(channels, session_id)
+
+
+memory_bus = InMemoryChangeBus()
+
+
+def change_feed():
+    """
+    Feed selected by SIMULATION_CHANGE_FEED ('postgres' or 'memory');
+    defaults to the one matching the storage backend
+    """
+    default = 'postgres' if backend_name() == 'postgres' else 'memory'
+    if os.getenv('SIMULATION_CHANGE_FEED', default) == 'memory':
+        return memory_bus
+    return PostgresChangeFeed()
@@ -0,0 +1,93 @@
+import os
+from collections import namedtuple
+from fractions import Fraction
+
+import numpy as np
+
+FLOAT64 = 'float64'
+FIXED = 'fixed'
+MONEY_PLACES = 2
+
+# kind: FLOAT64 computes on float64 arrays; FIXED on int64 counts of
+# 10**-scale units, so sums and products are exact until the final rounding
+PrecisionPolicy = namedtuple('PrecisionPolicy', ['kind', 'scale'], defaults=[FLOAT64, 4])
+
+# Largest magnitude a float64 holds as an exact integer; values scaled
+# beyond it cannot be converted to fixed-point without losing digits
+_EXACT_FLOAT = 2 ** 53
+
+
+def precision_policy():
+    """Policy from SIMULATION_NUMERIC (float64|fixed) and SIMULATION_NUMERIC_SCALE"""
+    kind = os.getenv('SIMULATION_NUMERIC', FLOAT64).lower()
+    if kind not in (FLOAT64, FIXED):
+        raise ValueError(f"Unknown SIMULATION_NUMERIC {kind!r}; expected {FLOAT64!r} or {FIXED!r}")
+    return PrecisionPolicy(kind, int(os.getenv('SIMULATION_NUMERIC_SCALE', '4')))
+
+
+def decode_numeric(value, cur=None):
+    """NUMERIC text -> float without building a Decimal; the psycopg2 typecaster signature"""
+    return None if value is None else float(value)
+
+
+def to_float_array(values):
+    """Rows of numbers (NULL -> nan) as one float64 array"""
+    return np.array(values, dtype=np.float64)
+
+
+def to_fixed_array(values, scale):
+    """
+    Rows of numbers as int64 counts of 10**-scale units
+
+    Exact for any NUMERIC with at most 15 significant digits: its float64
+    decoding is within half a unit of the decimal value, so rounding
+    recovers it.
+    """
+    scaled = np.rint(to_float_array(values) * 10 ** scale)
+    if np.isnan(scaled).any():
+        raise ValueError("Fixed-point arrays cannot hold missing (NULL) values")
+    if (np.abs(scaled) >= _EXACT_FLOAT).any():
+        raise OverflowError(f"Values too large for fixed-point at scale {scale}")
+    return scaled.astype(np.int64)
+
+
+def from_fixed(units, scale):
+    return np.asarray(units, dtype=np.int64) / 10 ** scale
+
+
+def ratio(value):
+    """Exact (numerator, denominator) of a decimal constant such as 1.10"""
+    fraction = Fraction(str(value))
+    return fraction.numerator, fraction.denominator
+
+
+def div_round(numerator, denominator):
+    """
+    Integer division rounding half away from zero, as PostgreSQL's
+    round(numeric) does; denominator must be positive
+    """
+    numerator = np.asarray(numerator, dtype=np.int64)
+    quotient = (2 * np.abs(numerator) + denominator) // (2 * denominator)
+    return np.sign(numerator) * quotient
+
+
+def checked_multiply(a, b):
+    """int64 product that raises instead of silently wrapping"""
+    estimate = np.abs(np.asarray(a, dtype=np.float64) * np.asarray(b, dtype=np.float64))
+    if (estimate >= 2 ** 62).any():
+        raise OverflowError("Fixed-point product exceeds int64; use the float64 precision policy")
+    return np.asarray(a, dtype=np.int64) * np.asarray(b, dtype=np.int64)
+
+
+def round_money(values):
+    """
+    float64 amounts rounded to cents, half away from zero
+
+    A relative nudge of 1e-12 keeps binary noise from pulling an exact
+    half-cent down (2.675 is stored as 2.67499999...). Amounts within
+    that margin of a half-cent can still differ from the exact FIXED
+    policy by one cent.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    cents = np.abs(values) * 10 ** MONEY_PLACES
+    return np.sign(values) * np.floor(cents + 0.5 + cents * 1e-12) / 10 ** MONEY_PLACES
@@ -0,0 +1,260 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from psycopg2.pool import PoolError
+
+from database.metrics import LatencyStats
+
+
+class PoolTimeout(PoolError):
+    """No connection became free within the checkout timeout"""
+
+
+class _Entry:
+    __slots__ = ('conn', 'created', 'last_used', 'checked_out', 'caller')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created = self.last_used = time.monotonic()
+        self.checked_out = None
+        self.caller = None
+
+
+class _Waiter:
+    __slots__ = ('event', 'entry', 'may_connect')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry = None
+        self.may_connect = False
+
+
+class ConnectionPool:
+    """
+    Blocking psycopg2 pool with a FIFO wait queue
+
+    A released connection is handed straight to the longest waiting caller,
+    so late arrivals cannot overtake the queue. Connections older than
+    max_lifetime are recycled, ones idle longer than health_check_after are
+    probed before reuse, and idle connections above minconn are closed
+    after idle_timeout.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=30.0, max_lifetime=3600.0,
+                 idle_timeout=300.0, health_check_after=30.0, **params):
+        if maxconn < max(minconn, 1):
+            raise ValueError("maxconn must be at least max(minconn, 1)")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.params = params
+        self.closed = False
+
+        self._lock = threading.Lock()
+        self._idle = deque()
+        self._waiters = deque()
+        self._in_use = {}
+        self._size = 0
+
+        self.wait_time = LatencyStats()
+        self.hold_time = LatencyStats()
+        self.hold_by_caller = {}
+        self.exhaustions = 0
+        self.timeouts = 0
+        self.health_check_failures = 0
+        self.recycled = 0
+
+        for _ in range(minconn):
+            self._size += 1
+            self._idle.append(self._connect())
+
+    @classmethod
+    def from_env(cls, **params):
+        """Pool sized and tuned by the PG_POOL_* environment variables"""
+        return cls(
+            minconn=int(os.getenv('PG_POOL_MIN', '1')),
+            maxconn=int(os.getenv('PG_POOL_MAX', '10')),
+            timeout=float(os.getenv('PG_POOL_TIMEOUT', '30')),
+            max_lifetime=float(os.getenv('PG_POOL_MAX_LIFETIME', '3600')),
+            idle_timeout=float(os.getenv('PG_POOL_IDLE_TIMEOUT', '300')),
+            health_check_after=float(os.getenv('PG_POOL_HEALTH_CHECK_AFTER', '30')),
+            **params
+        )
+
+    def _connect(self):
+        try:
+            return _Entry(psycopg2.connect(**self.params))
+        except Exception:
+            with self._lock:
+                self._release_slot()
+            raise
+
+    def _release_slot(self):
+        """Pass a free slot to the next waiter, or shrink; call with the lock held"""
+        if self._waiters:
+            waiter = self._waiters.popleft()
+            waiter.may_connect = True
+            waiter.event.set()
+        else:
+            self._size -= 1
+
+    def _healthy(self, entry):
+        now = time.monotonic()
+        if entry.conn.closed or now - entry.created > self.max_lifetime:
+            with self._lock:
+                self.recycled += 1
+            return False
+        if now - entry.last_used > self.health_check_after:
+            try:
+                with entry.conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                entry.conn.rollback()
+            except psycopg2.Error:
+                with self._lock:
+                    self.health_check_failures += 1
+                return False
+        return True
+
+    def _discard(self, entry):
+        try:
+            entry.conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _reap_idle(self):
+        """Close surplus connections idle past idle_timeout; call with the lock held"""
+        now = time.monotonic()
+        reaped = []
+        while (self._size > self.minconn and self._idle
+               and now - self._idle[0].last_used > self.idle_timeout):
+            reaped.append(self._idle.popleft())
+            self._size -= 1
+        return reaped
+
+    def getconn(self, timeout=None, caller=None):
+        if self.closed:
+            raise PoolError("connection pool is closed")
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        entry, waiter, may_connect = None, None, False
+
+        with self._lock:
+            reaped = self._reap_idle()
+            if self._idle and not self._waiters:
+                entry = self._idle.pop()
+            elif self._size < self.maxconn:
+                self._size += 1
+                may_connect = True
+            else:
+                waiter = _Waiter()
+                self._waiters.append(waiter)
+                self.exhaustions += 1
+        for stale in reaped:
+            self._discard(stale)
+
+        if waiter is not None:
+            if not waiter.event.wait(timeout):
+                with self._lock:
+                    if waiter.entry is None and not waiter.may_connect:
+                        self._waiters.remove(waiter)
+                        self.timeouts += 1
+                        raise PoolTimeout(f"no connection available within {timeout:.1f}s")
+            entry, may_connect = waiter.entry, waiter.may_connect
+
+        while True:
+            if may_connect:
+                entry = self._connect()
+                break
+            if self._healthy(entry):
+                break
+            # Replace the stale connection, keeping its slot
+            self._discard(entry)
+            may_connect = True
+
+        now = time.monotonic()
+        entry.checked_out = now
+        entry.caller = caller
+        with self._lock:
+            self.wait_time.record(now - start)
+            self._in_use[id(entry.conn)] = entry
+        return entry.conn
+
+    def putconn(self, conn, close=False):
+        with self._lock:
+            entry = self._in_use.pop(id(conn), None)
+        if entry is None:
+            raise PoolError("trying to put unkeyed connection")
+
+        now = time.monotonic()
+        if not (close or self.closed or conn.closed):
+            try:
+                if conn.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+        reuse = not (close or self.closed or conn.closed or now - entry.created > self.max_lifetime)
+        if not reuse:
+            self._discard(entry)
+        entry.last_used = now
+
+        held = now - entry.checked_out
+        with self._lock:
+            self.hold_time.record(held)
+            if entry.caller is not None:
+                self.hold_by_caller.setdefault(entry.caller, LatencyStats(window=256)).record(held)
+            if not reuse:
+                self._release_slot()
+            elif self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.entry = entry
+                waiter.event.set()
+            else:
+                self._idle.append(entry)
+
+    @contextmanager
+    def connection(self, timeout=None, caller=None):
+        conn = self.getconn(timeout, caller)
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    def closeall(self):
+        with self._lock:
+            self.closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for entry in idle:
+            self._discard(entry)
+
+    def metrics(self):
+        """Snapshot of pool gauges, counters and latency summaries (seconds)"""
+        # Copy under the lock; the percentiles are sorted outside it
+        with self._lock:
+            snapshot = {
+                'size': self._size,
+                'in_use': len(self._in_use),
+                'idle': len(self._idle),
+                'waiting': len(self._waiters),
+                'maxconn': self.maxconn,
+                'exhaustions': self.exhaustions,
+                'timeouts': self.timeouts,
+                'health_check_failures': self.health_check_failures,
+                'recycled': self.recycled,
+            }
+            wait_time, hold_time = self.wait_time.copy(), self.hold_time.copy()
+            by_caller = {caller: stats.copy() for caller, stats in self.hold_by_caller.items()}
+        return {
+            **snapshot,
+            'wait_time': wait_time.summary(),
+            'hold_time': hold_time.summary(),
+            'hold_time_by_caller': {caller: stats.summary() for caller, stats in by_caller.items()}
+        }
@@ -0,0 +1,116 @@
+import os
+import re
+import weakref
+
+from database.backends.base import (
+    GAME1_COLUMNS, GAME2_COLUMNS, GAME2_COMPANY_DATA_QUERY, game1_column, game2_column
+)
+
+# name -> (parameter types, SQL with $n placeholders). Every whitelisted
+# column gets its own UPDATE so no statement is built at call time.
+STATEMENTS = {
+    'game1_select': (
+        ('text',),
+        f"SELECT {GAME1_COLUMNS} FROM game1_terms WHERE session_id = $1 ORDER BY id"
+    ),
+    'game2_select': (
+        ('text',),
+        f"SELECT {GAME2_COLUMNS} FROM game2_terms WHERE session_id = $1 ORDER BY id"
+    ),
+    'game2_company_data': (
+        ('text',),
+        GAME2_COMPANY_DATA_QUERY.replace('%s', '$1')
+    ),
+    'game1_current': (
+        ('text', 'text[]'),
+        f"SELECT {GAME1_COLUMNS} FROM game1_terms WHERE session_id = $1 AND term = ANY($2) FOR SHARE"
+    ),
+    'terms_version': (
+        ('text', 'text'),
+        "SELECT version FROM term_versions WHERE table_name = $1 AND session_id = $2"
+    ),
+}
+# Game 1 writes are compare-and-swaps: the UPDATE only matches while the
+# row is at version $4 (NULL writes unconditionally), and the row comes
+# back either way, flagged with whether the write landed, in one round
+# trip. The game1_terms_advance trigger bumps version and clears a stale
+# approval. A row that did not update is read from the statement's
+# snapshot, which can predate the write it lost to; game1_current
+# re-reads those rows once they are committed.
+for _team, _type in ((1, 'numeric'), (2, 'boolean')):
+    STATEMENTS[f"game1_update_{game1_column(_team)}"] = (
+        (_type, 'text', 'text', 'bigint'),
+        f"""WITH updated AS (
+               UPDATE game1_terms SET {game1_column(_team)} = $1, last_updated = NOW()
+               WHERE session_id = $2 AND term = $3 AND ($4::bigint IS NULL OR version = $4)
+               RETURNING {GAME1_COLUMNS}
+           )
+           SELECT TRUE, {GAME1_COLUMNS} FROM updated
+           UNION ALL
+           SELECT FALSE, {GAME1_COLUMNS} FROM game1_terms
+           WHERE session_id = $2 AND term = $3 AND NOT EXISTS (SELECT 1 FROM updated)"""
+    )
+# The same for many terms of session $1 at once: arrays of terms, values
+# and expected versions ($2-$4), unnest()ed into one statement
+_RETURNED = ', '.join(f"t.{column.strip()}" for column in GAME1_COLUMNS.split(','))
+for _team, _type in ((1, 'numeric'), (2, 'boolean')):
+    STATEMENTS[f"game1_update_many_{game1_column(_team)}"] = (
+        ('text', 'text[]', f'{_type}[]', 'bigint[]'),
+        f"""WITH v AS (
+               SELECT * FROM unnest($2::text[], $3::{_type}[], $4::bigint[]) AS v(term, value, expected)
+           ), updated AS (
+               UPDATE game1_terms AS t SET {game1_column(_team)} = v.value, last_updated = NOW()
+               FROM v
+               WHERE t.session_id = $1 AND t.term = v.term AND (v.expected IS NULL OR t.version = v.expected)
+               RETURNING {_RETURNED}
+           )
+           SELECT TRUE, {GAME1_COLUMNS} FROM updated
+           UNION ALL
+           SELECT FALSE, {_RETURNED} FROM game1_terms AS t
+           WHERE t.session_id = $1 AND t.term IN (SELECT term FROM v)
+               AND t.term NOT IN (SELECT term FROM updated)"""
+    )
+for _team in (1, 2):
+    for _company in (1, 2, 3):
+        STATEMENTS[f"game2_update_{game2_column(_team, _company)}"] = (
+            ('numeric', 'text', 'text'),
+            f"UPDATE game2_terms SET {game2_column(_team, _company)} = $1, last_updated = NOW() "
+            f"WHERE session_id = $2 AND term = $3"
+        )
+
+# The same statements with psycopg2 placeholders, for unprepared
+# connections; named after the position, since a parameter can repeat
+PLAIN_STATEMENTS = {name: re.sub(r'\$(\d+)', r'%(\1)s', sql) for name, (_, sql) in STATEMENTS.items()}
+
+# Connections that have run prepare_statements(); weak so closed
+# connections drop out with their server-side statements
+_prepared = weakref.WeakKeyDictionary()
+
+
+def enabled():
+    return os.getenv('PG_PREPARED_STATEMENTS', '1') != '0'
+
+
+def prepare_statements(conn):
+    """PREPARE every statement on conn in one round trip"""
+    if conn in _prepared:
+        return
+    with conn.cursor() as cur:
+        cur.execute(";".join(
+            f"PREPARE {name} ({', '.join(types)}) AS {sql}"
+            for name, (types, sql) in STATEMENTS.items()
+        ))
+    conn.commit()
+    _prepared[conn] = True
+
+
+def is_prepared(conn):
+    return conn in _prepared
+
+
+def execute(cur, name, params):
+    """Run a named statement, via EXECUTE when its connection prepared it"""
+    if cur.connection in _prepared:
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+    else:
+        cur.execute(PLAIN_STATEMENTS[name], {str(i): param for i, param in enumerate(params, 1)})
@@ -0,0 +1,83 @@
+"""
+Replay the Game 1 event log in bulk.
+
+Folds every logged event, or one session's, into per-session term state
+in large batches; optionally snapshots each session and checks the result
+against game1_terms:
+
+    python -m database.replay --snapshot --verify
+"""
+import argparse
+import time
+
+from rich.console import Console
+from rich.table import Table
+
+from database.database import (
+    Database, get_game1_terms, iter_game1_events, write_game1_snapshot
+)
+from database.events import fold_events
+
+console = Console()
+
+
+def replay(conn, session_id=None, batch_size=50_000):
+    """(states, last_ids, events) after folding the whole log"""
+    states, last_ids = {}, {}
+    events = 0
+    for rows in iter_game1_events(conn, session_id, 0, batch_size):
+        fold_events(states, rows, last_ids)
+        events += len(rows)
+    return states, last_ids, events
+
+
+def verify(conn, states):
+    """Sessions whose replayed state differs from their game1_terms rows"""
+    mismatched = []
+    for session_id, state in states.items():
+        current = {
+            term[1]: [None if term[2] is None else float(term[2]), bool(term[3])]
+            for term in get_game1_terms(conn, session_id)
+        }
+        if current != state:
+            mismatched.append(session_id)
+    return mismatched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--session", help="replay only this session")
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    parser.add_argument("--snapshot", action="store_true", help="write a snapshot per session")
+    parser.add_argument("--verify", action="store_true", help="compare with game1_terms")
+    args = parser.parse_args()
+
+    db = Database()
+    with db.get_conn() as conn:
+        start = time.perf_counter()
+        states, last_ids, events = replay(conn, args.session, args.batch_size)
+        elapsed = time.perf_counter() - start
+
+        if args.snapshot:
+            for session_id, state in states.items():
+                write_game1_snapshot(conn, session_id, last_ids[session_id], state)
+        mismatched = verify(conn, states) if args.verify else []
+
+    table = Table(title="Game 1 event replay")
+    table.add_column("Metric", style="cyan")
+    table.add_column("Value", justify="right")
+    table.add_row("Sessions", f"{len(states):,}")
+    table.add_row("Events", f"{events:,}")
+    table.add_row("Seconds", f"{elapsed:.2f}")
+    table.add_row("Events/minute", f"{events / elapsed * 60:,.0f}" if elapsed else "-")
+    if args.snapshot:
+        table.add_row("Snapshots written", f"{len(states):,}")
+    if args.verify:
+        table.add_row("Mismatched sessions", f"[{'red' if mismatched else 'green'}]{len(mismatched):,}")
+    console.print(table)
+    for session_id in mismatched[:20]:
+        console.print(f"[red]✗ {session_id}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,187 +1,254 @@
+"""
+Create the Postgres database, bring its schema up to date and seed sessions.
+
+Everything runs over one connection built from the PG_* variables, like
+the pool's. Migrations come from database.migrations and are applied at
+most once each, so running this again is always safe:
+
+    python -m database.setup_db                    # migrate to the latest schema
+    python -m database.setup_db --status           # list applied and pending migrations
+    python -m database.setup_db --seed-sessions 5000 --session-prefix load
+
+Seeded sessions already hold Team 1's Game 1 terms, Game 2 prices and
+share counts, and Team 2's investor budgets, so load tests can start
+straight from the calculations.
+"""
+import argparse
+import io
+import random
+import sys
+import time
+
 import psycopg2
-from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from psycopg2 import sql
 from rich.console import Console
+from rich.table import Table
+
+from database.backends.base import (
+    GAME1_DEFAULT_TERMS, GAME2_BUDGET_TERMS, GAME2_DEFAULT_TERMS, GAME2_REQUIRED_INPUTS
+)
+from database.database import DEFAULT_SESSION, connection_params, create_session
+from database.migrations import LATEST, MIGRATIONS, applied_versions, migrate
 
 console = Console()
 
+# Ranges the seeded inputs are drawn from
+SEED_RANGES = {
+    'EBITDA': (50.0, 500.0), 'Multiple': (4.0, 15.0), 'Factor Score': (0.5, 1.5),
+    'price': (5.0, 200.0), 'shares': (1_000, 100_000), 'budget': (10_000.0, 1_000_000.0),
+}
 
-def create_database():
-    """Create the database if it doesn't exist"""
+
+def create_database(params):
+    """CREATE DATABASE for params['database'], from the maintenance database"""
+    # CREATE DATABASE cannot run in a transaction, nor in the database
+    # being created
+    conn = psycopg2.connect(**{**params, 'database': 'postgres'})
     try:
-        conn = psycopg2.connect(
-            user="postgres",
-            password="root-1234567890",
-            host="localhost",
-            port="5432"
-        )
-        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
-        cur = conn.cursor()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(params['database'])))
+    finally:
+        conn.close()
 
-        cur.execute("SELECT 1 FROM pg_database WHERE datname='simulation_games'")
-        exists = cur.fetchone()
 
-        if not exists:
-            cur.execute("CREATE DATABASE simulation_games")
-            console.print("[green]✓ Database created successfully")
-        else:
-            console.print("[yellow]Database already exists")
+def connect():
+    """The setup connection, creating the database first if it does not exist"""
+    params = connection_params()
+    try:
+        return psycopg2.connect(**params)
+    except psycopg2.OperationalError as e:
+        if 'does not exist' not in str(e):
+            raise
+    create_database(params)
+    console.print(f"[green]✓ Database {params['database']} created")
+    return psycopg2.connect(**params)
+
+
+def _report_migration(version, description, seconds):
+    console.print(f"[green]✓ {version}. {description}[/] ({seconds:.2f}s)")
 
-        cur.close()
-        conn.close()
-    except Exception as e:
-        console.print(f"[red]Error creating database: {e}")
-        raise
+
+def initialize(conn, target=None):
+    """Apply pending migrations, then make sure the default session exists"""
+    applied = migrate(conn, target, on_applied=_report_migration)
+    if not applied:
+        console.print(f"[yellow]Schema already at version {max(applied_versions(conn), default=0)}")
+    if target is None or target >= LATEST:
+        create_session(conn, DEFAULT_SESSION)
+    return applied
 
 
 def initialize_tables():
-    """Initialize all tables with proper schema for both games"""
+    """initialize() on a connection of its own"""
+    conn = connect()
     try:
-        conn = psycopg2.connect(
-            user="postgres",
-            password="root-1234567890",
-            host="localhost",
-            port="5432",
-            database="simulation_games"
-        )
-        conn.autocommit = True
-        cur = conn.cursor()
-
-        # ===== Game 1 Tables =====
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS game1_terms (
-            id SERIAL PRIMARY KEY,
-            term VARCHAR(50) UNIQUE NOT NULL,
-            team1_value NUMERIC,
-            team2_approval BOOLEAN DEFAULT FALSE,
-            description TEXT,
-            last_updated TIMESTAMP DEFAULT NOW()
-        )""")
-
-        # Insert CRITICAL DEFAULT TERMS for Game 1
-        cur.execute("""
-        INSERT INTO game1_terms (term, description)
-        VALUES 
-            ('EBITDA', 'Earnings Before Interest, Taxes, Depreciation, and Amortization'),
-            ('Multiple', 'Industry-standard valuation multiplier'),
-            ('Factor Score', 'Company-specific adjustment factor (0.5 - 1.5)')
-        ON CONFLICT (term) DO UPDATE SET 
-            description = EXCLUDED.description""")
-        console.print("[green]✓ Game 1 terms initialized")
-
-        # ===== Game 2 Tables =====
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS game2_terms (
-            id SERIAL PRIMARY KEY,
-            term VARCHAR(50) NOT NULL,
-            team1_company1 NUMERIC,
-            team1_company2 NUMERIC,
-            team1_company3 NUMERIC,
-            team2_company1 NUMERIC,
-            team2_company2 NUMERIC,
-            team2_company3 NUMERIC,
-            last_updated TIMESTAMP DEFAULT NOW(),
-            UNIQUE(term)
-        )""")
-
-        cur.execute("""
-        INSERT INTO game2_terms (term)
-        VALUES 
-            ('price_company1'), ('price_company2'), ('price_company3'),
-            ('shares_company1'), ('shares_company2'), ('shares_company3'),
-            ('investor1_budget'), ('investor2_budget'), ('investor3_budget')
-        ON CONFLICT (term) DO NOTHING""")
-        console.print("[green]✓ Game 2 terms initialized")
-
-        # Create results tables
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS game2_results (
-            id SERIAL PRIMARY KEY,
-            calculation_time TIMESTAMP DEFAULT NOW(),
-            total_market_value NUMERIC,
-            company1_weight NUMERIC,
-            company2_weight NUMERIC,
-            company3_weight NUMERIC
-        )""")
-
-        cur.close()
+        return initialize(conn)
+    finally:
         conn.close()
-    except Exception as e:
-        console.print(f"[red]Error initializing tables: {e}")
-        raise
-
 
-def verify_setup():
-    """Verify both Game 1 and Game 2 setups"""
-    try:
-        conn = psycopg2.connect(
-            user="postgres",
-            password="root-1234567890",
-            host="localhost",
-            port="5432",
-            database="simulation_games"
-        )
-        cur = conn.cursor()
-        verified = True
 
-        # Verify Game 1
-        cur.execute("SELECT term FROM game1_terms")
+def verify_setup(conn, session_id=DEFAULT_SESSION):
+    """Check that a session holds every Game 1 term and Game 2 input"""
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT term FROM game1_terms WHERE session_id = %s", (session_id,))
         game1_terms = {row[0] for row in cur.fetchall()}
-        required_game1 = {'EBITDA', 'Multiple', 'Factor Score'}
-
-        if not required_game1.issubset(game1_terms):
-            missing = required_game1 - game1_terms
-            console.print(f"[red]Missing Game 1 terms: {', '.join(missing)}")
-            verified = False
-
-        # Verify Game 2
-        cur.execute("""
-        SELECT term FROM game2_terms 
-        WHERE term LIKE 'price_%' OR term LIKE 'shares_%'
-        """)
+        cur.execute("SELECT term FROM game2_terms WHERE session_id = %s", (session_id,))
         game2_terms = {row[0] for row in cur.fetchall()}
-        required_game2 = {
-            'price_company1', 'price_company2', 'price_company3',
-            'shares_company1', 'shares_company2', 'shares_company3'
-        }
-
-        if not required_game2.issubset(game2_terms):
-            missing = required_game2 - game2_terms
-            console.print(f"[red]Missing Game 2 terms: {', '.join(missing)}")
-            verified = False
-
-        if verified:
-            console.print("[green]✓ Both Game 1 and Game 2 verified successfully")
-        return verified
-
-    except Exception as e:
-        console.print(f"[red]Verification failed: {e}")
-        return False
-    finally:
-        if conn:
-            conn.close()
-
 
-if __name__ == "__main__":
-    console.print("[bold cyan]\n=== Database Setup ===")
+    verified = True
+    missing = [term for term, _ in GAME1_DEFAULT_TERMS if term not in game1_terms]
+    if missing:
+        console.print(f"[red]Missing Game 1 terms: {', '.join(missing)}")
+        verified = False
+    missing = [term for term in GAME2_REQUIRED_INPUTS if term not in game2_terms]
+    if missing:
+        console.print(f"[red]Missing Game 2 terms: {', '.join(missing)}")
+        verified = False
+    if verified:
+        console.print("[green]✓ Both Game 1 and Game 2 verified successfully")
+    return verified
+
+
+def show_status(conn):
+    applied = applied_versions(conn)
+    table = Table(title="Schema migrations")
+    table.add_column("Version", justify="right", style="cyan")
+    table.add_column("Description")
+    table.add_column("Applied")
+    for version, description, _ in MIGRATIONS:
+        applied_at = applied.get(version)
+        table.add_row(
+            str(version), description,
+            f"{applied_at:%Y-%m-%d %H:%M:%S}" if applied_at else "[yellow]pending"
+        )
+    console.print(table)
+
+
+def _tsv(rows):
+    """COPY text format for rows of plain values; None becomes NULL"""
+    return io.StringIO(''.join(
+        '\t'.join(r'\N' if value is None else str(value) for value in row) + '\n' for row in rows
+    ))
+
+
+def _seed_rows(session_ids, rng):
+    """(game1 rows, game2 rows) with every input but Team 2's approvals entered"""
+    game1, game2 = [], []
+    for session_id in session_ids:
+        for term, description in GAME1_DEFAULT_TERMS:
+            game1.append((session_id, term, round(rng.uniform(*SEED_RANGES[term]), 2), description))
+        for term in GAME2_DEFAULT_TERMS:
+            # Game 2 inputs sit in the column of the company they describe
+            companies = [None, None, None]
+            budget = None
+            kind, _, company = term.partition('_company')
+            if company:
+                low, high = SEED_RANGES[kind]
+                companies[int(company) - 1] = (
+                    rng.randint(low, high) if kind == 'shares' else round(rng.uniform(low, high), 2)
+                )
+            elif term in GAME2_BUDGET_TERMS:
+                budget = round(rng.uniform(*SEED_RANGES['budget']), 2)
+            game2.append((session_id, term, *companies, budget))
+    return game1, game2
+
+
+def seed_sessions(conn, count, prefix='seed', seed=None, batch_size=2000):
+    """
+    Create sessions {prefix}-0 .. {prefix}-{count - 1} with their inputs
+    entered; returns the rows inserted
+
+    Each batch is COPYed into temporary staging tables and moved over with
+    one INSERT ... SELECT, which skips sessions that already exist, so
+    seeding twice with the same prefix adds nothing. Every Game 1 value
+    inserted is also logged as an edit event, as the update triggers log
+    a Team 1 entry, so replaying the event log rebuilds seeded sessions.
+    """
+    rng = random.Random(seed)
+    inserted = 0
+    for start in range(0, count, batch_size):
+        session_ids = [f"{prefix}-{n}" for n in range(start, min(start + batch_size, count))]
+        game1, game2 = _seed_rows(session_ids, rng)
+        with conn, conn.cursor() as cur:
+            cur.execute("""
+            CREATE TEMP TABLE seed_game1 (
+                session_id VARCHAR(64), term VARCHAR(50), team1_value NUMERIC, description TEXT
+            ) ON COMMIT DROP""")
+            cur.execute("""
+            CREATE TEMP TABLE seed_game2 (
+                session_id VARCHAR(64), term VARCHAR(50),
+                team1_company1 NUMERIC, team1_company2 NUMERIC, team1_company3 NUMERIC,
+                team2_company1 NUMERIC
+            ) ON COMMIT DROP""")
+            cur.copy_expert("COPY seed_game1 FROM STDIN", _tsv(game1))
+            cur.copy_expert("COPY seed_game2 FROM STDIN", _tsv(game2))
+            cur.execute("""
+            WITH inserted AS (
+                INSERT INTO game1_terms (session_id, term, team1_value, description)
+                SELECT session_id, term, team1_value, description FROM seed_game1
+                ON CONFLICT (session_id, term) DO NOTHING
+                RETURNING id, session_id, term, team1_value
+            )
+            INSERT INTO game1_term_events (session_id, term, kind, value)
+            SELECT session_id, term, 'edit', team1_value FROM inserted ORDER BY id""")
+            inserted += cur.rowcount
+            cur.execute("""
+            INSERT INTO game2_terms (session_id, term, team1_company1, team1_company2, team1_company3, team2_company1)
+            SELECT session_id, term, team1_company1, team1_company2, team1_company3, team2_company1 FROM seed_game2
+            ON CONFLICT (session_id, term) DO NOTHING""")
+            inserted += cur.rowcount
+    return inserted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--status", action="store_true", help="list migrations and exit")
+    parser.add_argument("--target", type=int, choices=[version for version, _, _ in MIGRATIONS],
+                        help="migrate up to this version only")
+    parser.add_argument("--seed-sessions", type=int, default=0, metavar="N",
+                        help="create N sessions with their inputs already entered")
+    parser.add_argument("--session-prefix", default="seed", help="seeded sessions are named PREFIX-n")
+    parser.add_argument("--seed", type=int, help="random seed for the seeded values")
+    args = parser.parse_args(argv)
+    if args.seed_sessions < 0:
+        parser.error("--seed-sessions must not be negative")
 
     try:
-        console.print("\n[bold]1. Database Creation")
-        create_database()
+        conn = connect()
+    except psycopg2.Error as e:
+        console.print(f"[bold red]Could not connect to Postgres: {e}")
+        return 1
 
-        console.print("\n[bold]2. Table Initialization")
-        initialize_tables()
+    try:
+        if args.status:
+            show_status(conn)
+            return 0
+
+        console.print("[bold cyan]\n=== Database Setup ===")
+        console.print("\n[bold]1. Migrations")
+        initialize(conn, args.target)
+
+        if args.target is None or args.target >= LATEST:
+            console.print("\n[bold]2. Verification")
+            if not verify_setup(conn):
+                console.print("\n[bold red]! Setup verification failed")
+                return 1
+
+        if args.seed_sessions:
+            console.print(f"\n[bold]3. Seeding {args.seed_sessions:,} sessions")
+            start = time.perf_counter()
+            rows = seed_sessions(conn, args.seed_sessions, args.session_prefix, args.seed)
+            console.print(f"[green]✓ {rows:,} term rows inserted in {time.perf_counter() - start:.2f}s")
+
+        console.print("\n[bold green]✓ Setup completed successfully!")
+        return 0
+    except psycopg2.Error as e:
+        console.print(f"\n[bold red]Fatal error during setup: {e}")
+        return 1
+    finally:
+        conn.close()
 
-        console.print("\n[bold]3. Schema Verification")
-        if verify_setup():
-            console.print("\n[bold green]✓ Setup completed successfully!")
-        else:
-            console.print("\n[bold red]! Setup verification failed")
-            raise RuntimeError("Verification failed")
 
-    except Exception as e:
-        console.print(f"\n[bold red]Fatal error during setup: {e}")
-        console.print("Try resetting the database manually:")
-        console.print("1. psql -U postgres")
-        console.print("2. DROP DATABASE simulation_games;")
-        console.print("3. CREATE DATABASE simulation_games;")
-        exit(1)
\ No newline at end of file
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Declarative formulas compiled to an incremental evaluator.
+
+A FormulaGraph declares named inputs and the formulas derived from them.
+compile() orders it once, rejecting unknown names and cycles, and works
+out which formulas lie downstream of each input. An Evaluation keeps the
+value of every node; when inputs change it re-runs only the formulas
+downstream of the ones that did, in order, and stops wherever a result
+comes out unchanged:
+
+    graph = FormulaGraph()
+    graph.input('price', 'shares')
+    graph.formula('market_cap', operator.mul, 'price', 'shares')
+    evaluation = graph.compile().evaluation({'price': 10.0, 'shares': 5})
+    evaluation.update({'price': 11.0})      # {'price', 'market_cap'}
+
+Formulas are plain functions of their inputs' values, and a formula with
+a missing (None) input is None itself. Written with arithmetic operators
+or numpy ufuncs, the same declarations evaluate whole arrays of sessions
+in one evaluate() pass.
+"""
+from collections import namedtuple
+
+Formula = namedtuple('Formula', ['name', 'function', 'inputs'])
+
+
+class FormulaGraph:
+    """Inputs and formulas by name, in declaration order"""
+
+    def __init__(self):
+        # name -> Formula, or None for an input
+        self.nodes = {}
+
+    def input(self, *names):
+        for name in names:
+            self._declare(name, None)
+
+    def formula(self, name, function, *inputs):
+        """Declare name = function(*values of inputs)"""
+        self._declare(name, Formula(name, function, inputs))
+
+    def _declare(self, name, formula):
+        if name in self.nodes:
+            raise ValueError(f"{name!r} is already declared")
+        self.nodes[name] = formula
+
+    def compile(self):
+        return CompiledGraph(self.nodes)
+
+
+def _evaluation_order(nodes):
+    """Node names with every formula after its inputs; raises ValueError if impossible"""
+    waiting = {}
+    dependents = {name: [] for name in nodes}
+    for name, formula in nodes.items():
+        inputs = set(formula.inputs) if formula else set()
+        for input_name in inputs:
+            if input_name not in nodes:
+                raise ValueError(f"Formula {name!r} reads undeclared {input_name!r}")
+            dependents[input_name].append(name)
+        waiting[name] = len(inputs)
+
+    order = [name for name in nodes if not waiting[name]]
+    for name in order:
+        for dependent in dependents[name]:
+            waiting[dependent] -= 1
+            if not waiting[dependent]:
+                order.append(dependent)
+    if len(order) < len(nodes):
+        cycle = [name for name in nodes if waiting[name]]
+        raise ValueError(f"Formulas depend on each other in a cycle: {', '.join(cycle)}")
+    return order
+
+
+def _apply(function, args):
+    return None if any(arg is None for arg in args) else function(*args)
+
+
+def _same(old, new):
+    """Whether a recomputed value leaves its dependents unaffected"""
+    if old is new:
+        return True
+    try:
+        # NaN never equals itself, yet a NaN that stays NaN is no change
+        return bool(old == new) or (old != old and new != new)
+    except (TypeError, ValueError):
+        # Arrays compare element by element; treat them as changed
+        return False
+
+
+class CompiledGraph:
+    """
+    A FormulaGraph ordered for evaluation
+
+    Each node gets a slot in a flat list of values; formulas become
+    (slot, function, input slots) steps in evaluation order, and each
+    input maps to the steps that depend on it, directly or not.
+    """
+
+    def __init__(self, nodes):
+        order = _evaluation_order(nodes)
+        self.names = tuple(nodes)
+        self.slots = {name: slot for slot, name in enumerate(self.names)}
+        self.inputs = tuple(name for name, formula in nodes.items() if formula is None)
+        self.steps = [
+            (self.slots[name], nodes[name].function, tuple(self.slots[i] for i in nodes[name].inputs))
+            for name in order if nodes[name] is not None
+        ]
+
+        # Steps reachable from each node, gathered from the last step back
+        reachable = {slot: set() for slot in range(len(self.names))}
+        for step in range(len(self.steps) - 1, -1, -1):
+            slot, _, inputs = self.steps[step]
+            for input_slot in inputs:
+                reachable[input_slot].add(step)
+                reachable[input_slot].update(reachable[slot])
+        self.downstream = {self.slots[name]: tuple(sorted(reachable[self.slots[name]])) for name in self.inputs}
+
+    def downstream_of(self, *inputs):
+        """Names of the formulas a change to inputs would re-run, in order"""
+        steps = sorted({step for name in inputs for step in self.downstream[self._input_slot(name)]})
+        return [self.names[self.steps[step][0]] for step in steps]
+
+    def _input_slot(self, name):
+        slot = self.slots.get(name)
+        if slot not in self.downstream:
+            raise KeyError(f"{name!r} is not an input of this graph")
+        return slot
+
+    def _run(self, values, steps):
+        for slot, function, inputs in steps:
+            values[slot] = _apply(function, [values[i] for i in inputs])
+
+    def evaluate(self, inputs):
+        """{name: value} of every node, from scratch; missing inputs are None"""
+        values = [None] * len(self.names)
+        for name, value in inputs.items():
+            values[self._input_slot(name)] = value
+        self._run(values, self.steps)
+        return dict(zip(self.names, values))
+
+    def evaluation(self, inputs=None):
+        return Evaluation(self, inputs or {})
+
+
+class Evaluation:
+    """Node values of one CompiledGraph, kept current as its inputs change"""
+
+    def __init__(self, graph, inputs):
+        self.graph = graph
+        self._values = [None] * len(graph.names)
+        for name, value in inputs.items():
+            self._values[graph._input_slot(name)] = value
+        graph._run(self._values, graph.steps)
+        # Formula runs by update(), to see how much each change cost
+        self.recomputed = 0
+
+    def __getitem__(self, name):
+        return self._values[self.graph.slots[name]]
+
+    def values(self):
+        """{name: value} of every node, in declaration order"""
+        return dict(zip(self.graph.names, self._values))
+
+    def missing(self):
+        """Inputs that are still None"""
+        return [name for name in self.graph.inputs if self[name] is None]
+
+    def update(self, inputs):
+        """Set some inputs and recompute what they affect; returns the names whose value changed"""
+        graph, values = self.graph, self._values
+        changed, steps = set(), set()
+        for name, value in inputs.items():
+            slot = graph._input_slot(name)
+            if not _same(values[slot], value):
+                values[slot] = value
+                changed.add(slot)
+                steps.update(graph.downstream[slot])
+
+        for step in sorted(steps):
+            slot, function, input_slots = graph.steps[step]
+            # Early cutoff: an upstream result came out the same
+            if changed.isdisjoint(input_slots):
+                continue
+            value = _apply(function, [values[i] for i in input_slots])
+            self.recomputed += 1
+            if not _same(values[slot], value):
+                values[slot] = value
+                changed.add(slot)
+        return {graph.names[slot] for slot in changed}
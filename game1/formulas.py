@@ -0,0 +1,25 @@
+"""
+Game 1's valuation as a formula graph.
+
+The negotiated terms are the inputs; add a formula here to derive a new
+output from them.
+"""
+from formulas.graph import FormulaGraph
+
+# Terms multiplied together into the Game 1 valuation
+VALUATION_TERMS = ('EBITDA', 'Multiple', 'Factor Score')
+
+
+def _valuation(ebitda, multiple, factor_score):
+    """Valuation = EBITDA * Multiple * Factor Score"""
+    return ebitda * multiple * factor_score
+
+
+def build_graph():
+    graph = FormulaGraph()
+    graph.input(*VALUATION_TERMS)
+    graph.formula('valuation', _valuation, *VALUATION_TERMS)
+    return graph.compile()
+
+
+GAME1_GRAPH = build_graph()
@@ -0,0 +1,106 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from .formulas import GAME1_GRAPH, VALUATION_TERMS
+
+TornadoBar = namedtuple('TornadoBar', ['term', 'low_value', 'high_value', 'low_valuation', 'high_valuation', 'spread'])
+
+
+def _base_key(base_terms):
+    """Hashable, ordered (term, value) tuple for the cache"""
+    return tuple(float(base_terms[term]) for term in VALUATION_TERMS)
+
+
+def _frozen(array):
+    array.flags.writeable = False
+    return array
+
+
+def valuation_grid(base_terms, axes):
+    """
+    Valuations over a grid of term values in one broadcast pass
+
+    axes maps a term to (low, high, steps); the grid has one dimension per
+    axis, in the given order, and other terms stay at their base value.
+    Returns (valuations, {term: values}). Results are cached per term set
+    and returned read-only.
+    """
+    key = tuple((term, float(lo), float(hi), int(steps)) for term, (lo, hi, steps) in axes.items())
+    return _valuation_grid(_base_key(base_terms), key)
+
+
+@lru_cache(maxsize=256)
+def _valuation_grid(base, axes):
+    factors = dict(zip(VALUATION_TERMS, base))
+    values = {}
+    for axis, (term, lo, hi, steps) in enumerate(axes):
+        if term not in factors:
+            raise KeyError(f"Unknown Game 1 term {term!r}")
+        shape = [1] * len(axes)
+        shape[axis] = steps
+        values[term] = _frozen(np.linspace(lo, hi, steps))
+        factors[term] = values[term].reshape(shape)
+
+    # The graph's formulas broadcast, so one evaluation covers the grid
+    valuations = np.ones([steps for _, _, _, steps in axes]) * GAME1_GRAPH.evaluate(factors)['valuation']
+    return _frozen(valuations), values
+
+
+def tornado(base_terms, swing=0.10):
+    """
+    Valuation swing when each term moves on its own by +/- swing
+
+    swing is a fraction of the base value, or a {term: (low, high)} map
+    of absolute values. Bars are sorted from widest to narrowest.
+    """
+    if isinstance(swing, dict):
+        key = tuple((term, float(low), float(high)) for term, (low, high) in swing.items())
+    else:
+        key = float(swing)
+    return _tornado(_base_key(base_terms), key)
+
+
+@lru_cache(maxsize=256)
+def _tornado(base, swing):
+    base = np.array(base)
+    if isinstance(swing, tuple):
+        bounds = {term: (low, high) for term, low, high in swing}
+        low = np.array([bounds.get(t, (b, b))[0] for t, b in zip(VALUATION_TERMS, base)])
+        high = np.array([bounds.get(t, (b, b))[1] for t, b in zip(VALUATION_TERMS, base)])
+    else:
+        low, high = base * (1 - swing), base * (1 + swing)
+
+    # Row i replaces term i with its low (or high) value; one product per row
+    scenarios = np.tile(base, (2 * len(base), 1))
+    index = np.arange(len(base))
+    scenarios[index, index] = low
+    scenarios[index + len(base), index] = high
+    valuations = GAME1_GRAPH.evaluate(dict(zip(VALUATION_TERMS, scenarios.T)))['valuation'].reshape(2, len(base))
+
+    bars = [
+        TornadoBar(term, float(low[i]), float(high[i]), float(valuations[0, i]),
+                   float(valuations[1, i]), float(abs(valuations[1, i] - valuations[0, i])))
+        for i, term in enumerate(VALUATION_TERMS)
+    ]
+    return tuple(sorted(bars, key=lambda bar: bar.spread, reverse=True))
+
+
+def break_even(base_terms, target, term):
+    """
+    Value of term that makes the valuation hit target, others held at base
+
+    target may be a scalar or an array of targets. Assumes the valuation
+    is proportional to term, as the product in game1.formulas is.
+    """
+    if term not in VALUATION_TERMS:
+        raise KeyError(f"Unknown Game 1 term {term!r}")
+    unit = {t: 1.0 if t == term else float(base_terms[t]) for t in VALUATION_TERMS}
+    others = GAME1_GRAPH.evaluate(unit)['valuation']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.asarray(target, dtype=np.float64) / others
+
+
+def cache_info():
+    return {'grid': _valuation_grid.cache_info(), 'tornado': _tornado.cache_info()}
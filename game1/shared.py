@@ -1,12 +1,40 @@
+from rich.console import Console, Group
+from rich.markup import escape
 from rich.table import Table
-from rich.console import Console
-from database.database import get_game1_terms
+from rich.text import Text
+from database.backends.base import GAME1_VERSION
+from database.cache import cached_game1_terms
+from database.database import DEFAULT_SESSION
+from database.history import record_game1_valuation
+from database.metrics import instrument
+from game1.formulas import GAME1_GRAPH
+from ui.live import Layout
 
 console = Console()
 
 
-def calculate_game1_outputs(conn):
-    terms = get_game1_terms(conn)
+def compute_valuation(term_values):
+    """Valuation from {term: value}, as declared in game1.formulas"""
+    return GAME1_GRAPH.evaluate({term: term_values[term] for term in GAME1_GRAPH.inputs})['valuation']
+
+
+@instrument('calculate')
+def calculate_game1_outputs(conn, session_id=DEFAULT_SESSION):
+    terms = cached_game1_terms(conn, session_id)
+    outputs = game1_outputs(terms)
+    record_agreed_valuation(session_id, terms, outputs)
+    return outputs
+
+
+def record_agreed_valuation(session_id, terms, outputs):
+    """Record an agreed valuation in the history, once per version of its terms"""
+    if outputs['all_approved']:
+        record_game1_valuation(session_id, outputs['team2'], outputs['common']['valuation'],
+                               version=tuple(term[GAME1_VERSION] for term in terms))
+
+
+def game1_outputs(terms):
+    """Approval statuses and valuation from game1_terms rows"""
     outputs = {
         'team1': {},
         'team2': {},
@@ -26,36 +54,47 @@ def calculate_game1_outputs(conn):
         term_values[term[1]] = term[2]
 
     if outputs['all_approved']:
-        outputs['common']['valuation'] = (
-                term_values['EBITDA'] *
-                term_values['Multiple'] *
-                term_values['Factor Score']
-        )
+        outputs['common']['valuation'] = compute_valuation(term_values)
     else:
         outputs['common']['valuation'] = 'Not yet agreed by Team 2'
 
     return outputs
 
 
-def display_game1_outputs(outputs):
-    table = Table(title="Game 1 - Current Outputs")
-    table.add_column("Term", style="cyan")
-    table.add_column("Team 1 Value", style="green")
-    table.add_column("Team 2 Status", style="magenta")
+class Game1Layout(Layout):
+    """Game 1 outputs: one row per term, then the valuation line"""
 
+    def cells(self, outputs):
+        cells = {}
+        for term, status in outputs['team1'].items():
+            cells[('term', term)] = escape(term)
+            cells[('value', term)] = escape(str(outputs['team2'][term]))
+            cells[('status', term)] = f"[green]{status}" if status == "OK" else f"[yellow]{status}"
 
-    for term, status in outputs['team1'].items():
-        table.add_row(
-            term,
-            str(outputs['team2'][term]),
-            f"[green]{status}" if status == "OK" else f"[yellow]{status}"
+        valuation = outputs['common']['valuation']
+        cells[('valuation', None)] = "[b]Valuation:[/b] " + (
+            f"[bold green]${valuation:,.2f}"
+            if isinstance(valuation, (int, float))
+            else f"[yellow]{escape(str(valuation))}"
         )
+        return cells
+
+    def build(self, texts):
+        table = Table(title="Game 1 - Current Outputs")
+        table.add_column("Term", style="cyan")
+        table.add_column("Team 1 Value", style="green")
+        table.add_column("Team 2 Status", style="magenta")
+
+        for kind, term in texts:
+            if kind == 'term':
+                table.add_row(texts[('term', term)], texts[('value', term)], texts[('status', term)])
 
-    console.print(table)
+        return Group(table, Text(), texts[('valuation', None)], Text())
 
-    valuation_text = (
-        f"[bold green]${outputs['common']['valuation']:,.2f}"
-        if isinstance(outputs['common']['valuation'], (int, float))
-        else f"[yellow]{outputs['common']['valuation']}"
-    )
-    console.print(f"\n[b]Valuation:[/b] {valuation_text}\n")
\ No newline at end of file
+
+game1_layout = Game1Layout()
+
+
+@instrument('render')
+def display_game1_outputs(outputs):
+    console.print(game1_layout.render(outputs))
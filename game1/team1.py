@@ -1,64 +1,80 @@
-import questionary
-from rich.console import Console
-from database.database import Database, get_game1_terms, update_game1_term
-from .shared import calculate_game1_outputs, display_game1_outputs
+from database.database import (
+    Database, current_session, get_game1_terms, update_game1_term, update_game1_terms
+)
+from database.notifications import GAME1_CHANNEL, change_feed
+from ui.live import create_view, status_console
+from .shared import calculate_game1_outputs, game1_layout
 
-console = Console()
+console = status_console()
 db = Database()
 
 
-def main():
+def main(session_id=None):
+    # Prompt toolkit is slow to import and only needed once a game is played
+    import questionary
+
+    session_id = session_id or current_session()
     console.print("[bold blue]\n=== Simulation Game 1 - Team 1 ===\n")
 
     # Initial input collection
     with db.get_conn() as conn:
-        terms = get_game1_terms(conn)
+        terms = get_game1_terms(conn, session_id)
+        initial_values = {}
         for term in terms:
             if term[2] is None:
                 value = questionary.text(
                     f"Enter value for {term[1]} ({term[4]}):",
                     validate=lambda x: x.replace('.', '').isdigit()
                 ).ask()
-                update_game1_term(conn, term[1], 1, float(value))
+                initial_values[term[1]] = float(value)
+        if initial_values:
+            update_game1_terms(conn, 1, initial_values, session_id)
 
-        # Main interaction loop
-        while True:
-            outputs = calculate_game1_outputs(conn)
-            display_game1_outputs(outputs)
+        # Main interaction loop. The terms cache only refetches when their
+        # version moved, which also catches writers the feed does not see
+        # (another process on SQLite)
+        with change_feed().subscribe(GAME1_CHANNEL, session_id=session_id) as changes, \
+                create_view(game1_layout, console) as view:
+            while True:
+                changes.drain()
+                outputs = calculate_game1_outputs(conn, session_id)
+                view.show(outputs)
 
-            if outputs['all_approved']:
-                console.print("[bold green]\nAll terms agreed! Simulation complete.")
-                return
+                if outputs['all_approved']:
+                    console.print("[bold green]\nAll terms agreed! Simulation complete.")
+                    return
 
-            action = questionary.select(
-                "What would you like to do?",
-                choices=[
-                    {"name": "Edit a term", "value": "edit"},
-                    {"name": "Exit", "value": "exit"}
-                ]
-            ).ask()
+                with view.paused():
+                    action = questionary.select(
+                        "What would you like to do?",
+                        choices=[
+                            {"name": "Edit a term", "value": "edit"},
+                            {"name": "Exit", "value": "exit"}
+                        ]
+                    ).ask()
 
-            if action == "exit":
-                return
+                if action == "exit":
+                    return
 
-            term_to_edit = questionary.select(
-                "Which term would you like to edit?",
-                choices=[
-                    {
-                        "name": f"{term[1]} (current: {term[2] or 'not set'})",
-                        "value": term[1]
-                    }
-                    for term in terms
-                ]
-            ).ask()
+                with view.paused():
+                    term_to_edit = questionary.select(
+                        "Which term would you like to edit?",
+                        choices=[
+                            {
+                                "name": f"{term[1]} (current: {term[2] or 'not set'})",
+                                "value": term[1]
+                            }
+                            for term in terms
+                        ]
+                    ).ask()
 
-            new_value = questionary.text(
-                f"Enter new value for {term_to_edit}:",
-                validate=lambda x: x.replace('.', '').isdigit()
-            ).ask()
+                    new_value = questionary.text(
+                        f"Enter new value for {term_to_edit}:",
+                        validate=lambda x: x.replace('.', '').isdigit()
+                    ).ask()
 
-            update_game1_term(conn, term_to_edit, 1, float(new_value))
-            console.print(f"[yellow]\n{term_to_edit} updated. Team 2 will need to re-approve this term.")
+                update_game1_term(conn, term_to_edit, 1, float(new_value), session_id)
+                console.print(f"[yellow]\n{term_to_edit} updated. Team 2 will need to re-approve this term.")
 
 
 if __name__ == "__main__":
@@ -1,122 +1,172 @@
-import questionary
-from rich.console import Console
+from rich.markup import escape
 from rich.table import Table
-from database.database import Database, get_game1_terms, update_game1_term
+from rich.console import Group
+from database.backends.base import GAME1_VERSION
+from database.cache import cached_game1_terms
+from database.database import Database, current_session, get_terms_version, update_game1_term
+from .shared import compute_valuation
+from database.notifications import GAME1_CHANNEL, change_feed
+from ui.live import Layout, create_view, status_console
 from time import sleep
-import os
 
-console = Console()
+console = status_console()
 db = Database()
 
+# Seconds between checks of the terms version while waiting for Team 1;
+# the change feed does not see writers in other processes on SQLite
+WAIT_TIMEOUT = 2.0
+
+
+def team2_outputs(terms):
+    """Team 2's view of game1_terms rows: each term's value and approval, and the valuation"""
+    return {
+        'terms': {
+            term[1]: {'description': term[4], 'value': term[2], 'approved': term[3]}
+            for term in terms
+        },
+        'valuation': calculate_valuation(terms)
+    }
+
+
+class TermsLayout(Layout):
+    """Current terms with approval status, then the valuation or pending approvals"""
+
+    def cells(self, outputs):
+        cells = {}
+        for term, row in outputs['terms'].items():
+            cells[('term', term)] = escape(f"{term} ({row['description']})")
+            cells[('value', term)] = escape(str(row['value'])) if row['value'] is not None else "-"
+            cells[('approval', term)] = (
+                "[green]✓" if row['approved'] else
+                "[yellow]PENDING" if row['value'] else
+                "[red]NOT SET"
+            )
+
+        if outputs['valuation'] is not None:
+            summary = f"\n[bold green]VALUATION: ${outputs['valuation']:,.2f}[/]"
+        else:
+            pending_terms = [
+                term for term, row in outputs['terms'].items()
+                if not row['approved'] and row['value'] is not None
+            ]
+            summary = f"\n[yellow]Pending approvals: {', '.join(pending_terms)}[/]" if pending_terms else ""
+        cells[('summary', None)] = summary
+        return cells
+
+    def build(self, texts):
+        table = Table(title="[bold cyan]Current Terms (Team 2 View)")
+        table.add_column("Term", style="magenta")
+        table.add_column("Team 1 Value", style="green")
+        table.add_column("Your Approval", justify="right")
+
+        for kind, term in texts:
+            if kind == 'term':
+                table.add_row(texts[('term', term)], texts[('value', term)], texts[('approval', term)])
+
+        return Group(table, texts[('summary', None)])
+
+
+terms_layout = TermsLayout()
+
 
 def display_game1_terms(terms):
     """Display current terms with approval status"""
-    table = Table(title="[bold cyan]Current Terms (Team 2 View)")
-    table.add_column("Term", style="magenta")
-    table.add_column("Team 1 Value", style="green")
-    table.add_column("Your Approval", justify="right")
-
-    for term in terms:
-        approval_status = (
-            "[green]✓" if term[3] else
-            "[yellow]PENDING" if term[2] else
-            "[red]NOT SET"
-        )
-        table.add_row(
-            f"{term[1]} ({term[4]})",
-            str(term[2]) if term[2] is not None else "-",
-            approval_status
-        )
-
-    console.print(table)
+    console.print(terms_layout.render(team2_outputs(terms)))
 
 
 def calculate_valuation(terms):
     """Calculate final valuation if all terms are approved"""
     if all(term[3] for term in terms):
-        term_values = {term[1]: term[2] for term in terms}
-        valuation = (
-                term_values['EBITDA'] *
-                term_values['Multiple'] *
-                term_values['Factor Score']
-        )
-        console.print(f"\n[bold green]VALUATION: ${valuation:,.2f}[/]")
-        return valuation
-    else:
-        pending_terms = [term[1] for term in terms if not term[3] and term[2] is not None]
-        if pending_terms:
-            console.print(f"\n[yellow]Pending approvals: {', '.join(pending_terms)}[/]")
-        return None
-
-
-def main():
+        return compute_valuation({term[1]: term[2] for term in terms})
+    return None
+
+
+def main(session_id=None):
+    # Prompt toolkit is slow to import and only needed once a game is played
+    import questionary
+
+    session_id = session_id or current_session()
     console.print("[bold blue]\n=== Simulation Game 1 - Team 2 (Approvals) ===")
     console.print("[italic]You will approve/reject valuation terms from Team 1\n")
 
     with db.get_conn() as conn:
-        while True:
-            # Clear screen for fresh display
-            os.system('cls' if os.name == 'nt' else 'clear')
-
-            # Get current terms
-            terms = get_game1_terms(conn)
-
-            # Display current state
-            display_game1_terms(terms)
-            valuation = calculate_valuation(terms)
-
-            # Exit if all terms are approved
-            if valuation is not None:
-                console.print("\n[bold green]All terms approved! Simulation complete.")
-                break
-
-            # Get user action
-            action = questionary.select(
-                "What would you like to do?",
-                choices=[
-                    {"name": "Review term for approval", "value": "approve"},
-                    {"name": "Refresh view", "value": "refresh"},
-                    {"name": "Exit", "value": "exit"}
-                ]
-            ).ask()
-
-            if action == "exit":
-                break
-            elif action == "refresh":
-                continue
-
-            # Select term to review
-            term_to_review = questionary.select(
-                "Select term to approve/reject:",
-                choices=[
-                    {
-                        "name": f"{term[1]} (Value: {term[2] or 'Not set'})",
-                        "value": term[1]
-                    }
-                    for term in terms
-                    if term[2] is not None and not term[3]
-                ]
-            ).ask()
-
-            # Get approval decision
-            decision = questionary.select(
-                f"Approve {term_to_review} = {next(t[2] for t in terms if t[1] == term_to_review)}?",
-                choices=[
-                    {"name": "Approve", "value": True},
-                    {"name": "Reject (send back to Team 1)", "value": False}
-                ]
-            ).ask()
-
-            # Update database
-            update_game1_term(conn, term_to_review, 2, decision)
-
-            if decision:
-                console.print(f"[green]✓ Approved {term_to_review}!")
-            else:
-                console.print(f"[yellow]↑ Sent {term_to_review} back to Team 1 for revision")
-
-            sleep(1)  # Brief pause for user to see feedback
-
+        with change_feed().subscribe(GAME1_CHANNEL, session_id=session_id) as changes, \
+                create_view(terms_layout, console) as view:
+            while True:
+                # The cache refetches only when Team 1 (or we) changed something
+                changes.drain()
+                terms = cached_game1_terms(conn, session_id)
+
+                # Display current state, redrawing only what changed
+                outputs = team2_outputs(terms)
+                view.show(outputs)
+
+                # Exit if all terms are approved
+                if outputs['valuation'] is not None:
+                    console.print("\n[bold green]All terms approved! Simulation complete.")
+                    break
+
+                # Get user action; the screen is cleared for the next frame
+                with view.paused(clear=True):
+                    action = questionary.select(
+                        "What would you like to do?",
+                        choices=[
+                            {"name": "Review term for approval", "value": "approve"},
+                            {"name": "Wait for Team 1 changes", "value": "wait"},
+                            {"name": "Exit", "value": "exit"}
+                        ]
+                    ).ask()
+
+                if action == "exit":
+                    break
+                elif action == "wait":
+                    console.print("[italic]Waiting for Team 1...")
+                    version = get_terms_version(conn, 'game1_terms', session_id)
+                    while not changes.wait(WAIT_TIMEOUT):
+                        if get_terms_version(conn, 'game1_terms', session_id) != version:
+                            break
+                    continue
+
+                with view.paused(clear=True):
+                    # Select term to review
+                    term_to_review = questionary.select(
+                        "Select term to approve/reject:",
+                        choices=[
+                            {
+                                "name": f"{term[1]} (Value: {term[2] or 'Not set'})",
+                                "value": term[1]
+                            }
+                            for term in terms
+                            if term[2] is not None and not term[3]
+                        ]
+                    ).ask()
+
+                    # Get approval decision
+                    reviewed = next(t for t in terms if t[1] == term_to_review)
+                    decision = questionary.select(
+                        f"Approve {term_to_review} = {reviewed[2]}?",
+                        choices=[
+                            {"name": "Approve", "value": True},
+                            {"name": "Reject (send back to Team 1)", "value": False}
+                        ]
+                    ).ask()
+
+                # Update database, only if the term is still the one reviewed
+                result = update_game1_term(conn, term_to_review, 2, decision, session_id,
+                                           expected_version=reviewed[GAME1_VERSION])
+
+                if result.row is None:
+                    console.print(f"[red]! {term_to_review} no longer exists; session {session_id} was removed")
+                    break
+                if not result.applied:
+                    console.print(f"[yellow]! {term_to_review} changed to {result.row[2]} while you were "
+                                  f"reviewing it; review it again")
+                elif decision:
+                    console.print(f"[green]✓ Approved {term_to_review}!")
+                else:
+                    console.print(f"[yellow]↑ Sent {term_to_review} back to Team 1 for revision")
+
+                sleep(1)  # Brief pause for user to see feedback
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Share purchases for each investor budget, solved as a linear program.
+
+In one session with prices p, available shares S and the investment
+premium k, an investor with budget B buys x_j shares of company j to
+
+    maximize    sum_j x_j * p_j * (g_j - k - aversion * vol_j)   risk-adjusted profit
+    subject to  sum_j x_j * p_j * (1 + k) <= B                   budget, premium paid
+                x_j * p_j * (1 + k) <= max_weight * B            concentration
+                x_j <= S_j * B / (the session's total budget)    share of the supply
+                x_j >= 0
+
+Only the budget couples companies, so the LP is a fractional knapsack:
+its optimum buys companies in order of risk-adjusted profit per dollar,
+each up to its bound, until the budget runs out. allocate() evaluates
+that closed form with a sort and cumulative sums over (sessions,
+investors, companies) arrays, then rounds purchases down to whole
+shares. Splitting the supply pro rata to budget loses nothing: every
+investor's optimum is the pooled budget's optimum scaled down, so
+together they never buy more shares than exist.
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from database.backends.base import GAME2_BUDGET_TERMS
+from database.numeric import round_money
+from game2.engine import PREMIUM
+from game2.montecarlo import ScenarioModel
+
+# growth and volatility: expected growth of each company's price and its
+# standard deviation, scalars or one per company (defaults follow the
+# Monte Carlo ScenarioModel); aversion: profit given up per unit of
+# volatility; max_weight: largest fraction of a budget for one company
+RiskModel = namedtuple('RiskModel', ['growth', 'volatility', 'aversion', 'max_weight'], defaults=[
+    ScenarioModel().growth_mean, ScenarioModel().growth_vol, 0.25, 0.5
+])
+
+
+def risk_model():
+    """RiskModel with SIMULATION_RISK_AVERSION and SIMULATION_MAX_WEIGHT applied"""
+    model = RiskModel()
+    return model._replace(
+        aversion=float(os.getenv('SIMULATION_RISK_AVERSION', model.aversion)),
+        max_weight=float(os.getenv('SIMULATION_MAX_WEIGHT', model.max_weight)),
+    )
+
+
+# Arrays shaped (..., investors, companies), except cash: (..., investors)
+Allocation = namedtuple('Allocation', ['shares', 'cost', 'expected_profit', 'risk_adjusted_profit', 'cash'])
+
+
+def allocate(prices, shares, budgets, model=None, premium=PREMIUM):
+    """
+    Optimal whole-share purchases for every investor budget
+
+    prices and shares are (N,) for one session or (sessions, N); budgets
+    are (M,) or (sessions, M), with NaN for a budget not yet entered,
+    which buys nothing. model defaults to risk_model(). Ties between
+    equally good companies go to the lower-numbered one.
+    """
+    model = model or risk_model()
+    prices = np.asarray(prices, dtype=np.float64)
+    shares = np.asarray(shares, dtype=np.float64)
+    budgets = np.nan_to_num(np.asarray(budgets, dtype=np.float64), nan=0.0).clip(min=0.0)
+    if prices.shape != shares.shape:
+        raise ValueError(f"prices {prices.shape} and shares {shares.shape} must have the same shape")
+
+    cost = prices * (1 + premium)
+    growth = np.broadcast_to(model.growth, prices.shape)
+    value = prices * (growth - premium - model.aversion * np.broadcast_to(model.volatility, prices.shape))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_dollar = np.where(cost > 0, value / cost, -np.inf)
+        supply_share = np.nan_to_num(budgets / budgets.sum(axis=-1, keepdims=True))
+
+    # Most any investor can spend on each company: its concentration limit
+    # or the cost of its share of the supply, and nothing at a loss
+    bound = np.minimum(
+        shares[..., np.newaxis, :] * supply_share[..., :, np.newaxis] * cost[..., np.newaxis, :],
+        model.max_weight * budgets[..., :, np.newaxis]
+    )
+    bound = np.where((per_dollar > 0)[..., np.newaxis, :], np.nan_to_num(bound).clip(min=0.0), 0.0)
+
+    # Fill the best companies first: each gets what the budget has left
+    # after the better ones, up to its bound
+    order = np.broadcast_to(np.argsort(-per_dollar, axis=-1, kind='stable')[..., np.newaxis, :], bound.shape)
+    ranked = np.take_along_axis(bound, order, axis=-1)
+    before = np.cumsum(ranked, axis=-1) - ranked
+    spend = np.empty_like(bound)
+    np.put_along_axis(spend, order, np.clip(budgets[..., np.newaxis] - before, 0.0, ranked), axis=-1)
+
+    # Whole shares only; the tolerance keeps an exact bound from flooring
+    # one share short through rounding in the division
+    unit_cost = np.broadcast_to(cost[..., np.newaxis, :], spend.shape)
+    bought = np.floor(np.divide(spend, unit_cost, out=np.zeros_like(spend), where=unit_cost > 0) + 1e-9)
+    spent = bought * unit_cost
+    return Allocation(
+        shares=bought,
+        cost=spent,
+        expected_profit=bought * (prices * (growth - premium))[..., np.newaxis, :],
+        risk_adjusted_profit=bought * value[..., np.newaxis, :],
+        cash=budgets - spent.sum(axis=-1)
+    )
+
+
+def allocate_batch(prices, shares, budgets, model=None, premium=PREMIUM, workers=1, chunk_size=50_000):
+    """
+    allocate() for (sessions, ...) arrays, chunk_size sessions at a time
+
+    With workers > 1 the chunks are spread over a process pool. Each chunk
+    is pickled both ways, so the pool only pays off on multi-core machines
+    for batches of many chunks; benchmarks.allocation measures it.
+    """
+    model = model or risk_model()
+    prices, shares, budgets = (np.asarray(array, dtype=np.float64) for array in (prices, shares, budgets))
+    jobs = [
+        (prices[i:i + chunk_size], shares[i:i + chunk_size], budgets[i:i + chunk_size], model, premium)
+        for i in range(0, len(prices), chunk_size)
+    ]
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(allocate, *zip(*jobs)))
+    else:
+        parts = [allocate(*job) for job in jobs]
+    return Allocation(*(np.concatenate(field) for field in zip(*parts)))
+
+
+def session_allocation(allocation, index):
+    """One session's Allocation out of a batch"""
+    return Allocation(*(field[index] for field in allocation))
+
+
+def budgets_from_terms(terms):
+    """Investor budgets from game2_terms rows; None where not entered"""
+    # Budgets are Team 2 inputs, kept in the team2_company1 column
+    values = {row[1]: row[5] for row in terms}
+    return [values.get(term) for term in GAME2_BUDGET_TERMS]
+
+
+def allocation_outputs(budgets, allocation):
+    """Outputs dict for one session's budgets and Allocation; only investors with a budget"""
+    n = allocation.shares.shape[-1]
+    companies = [f"company{i}" for i in range(1, n + 1)]
+    outputs = {}
+    for i, budget in enumerate(budgets):
+        if budget is None:
+            continue
+        outputs[f"investor{i + 1}"] = {
+            'budget': float(budget),
+            'shares': dict(zip(companies, allocation.shares[i].astype(np.int64).tolist())),
+            'cost': float(round_money(allocation.cost[i].sum())),
+            'expected_profit': float(round_money(allocation.expected_profit[i].sum())),
+            'cash': float(round_money(allocation.cash[i])),
+        }
+    return outputs
@@ -0,0 +1,106 @@
+from collections import namedtuple
+
+import numpy as np
+
+from database.numeric import checked_multiply, div_round, ratio
+
+PREMIUM = 0.10  # investment price premium over the share price
+GROWTH = 0.15   # growth assumed for profit potential
+
+# Arrays shaped like the inputs: (..., N companies); total_market_value
+# drops the company axis
+MarketMetrics = namedtuple('MarketMetrics', [
+    'market_caps', 'total_market_value', 'weights',
+    'investment_per_share', 'profit_potential'
+])
+
+
+# Per-company formulas on plain floats or arrays alike; the formula graph
+# in game2.formulas declares its nodes with them
+
+
+def market_cap(price, shares):
+    return price * shares
+
+
+def weight(cap, total):
+    """Share of the total market value; a zero total gives NaN (or inf), not an error"""
+    if isinstance(total, float) and total:
+        return cap / total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = np.divide(cap, total)
+    return float(value) if np.ndim(value) == 0 else value
+
+
+def investment_per_share(price, premium=PREMIUM):
+    return price * (1 + premium)
+
+
+def profit_potential(price, shares, growth=GROWTH):
+    return (price * (1 + growth) - price) * shares
+
+
+def compute_market_metrics(prices, shares, premium=PREMIUM, growth=GROWTH):
+    """
+    Vectorized Game 2 metrics for any number of companies
+
+    prices and shares are (N,) for one session or (sessions, N) for a
+    batch; every metric is computed in one pass over the whole array.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    shares = np.asarray(shares, dtype=np.float64)
+    if prices.shape != shares.shape:
+        raise ValueError(f"prices {prices.shape} and shares {shares.shape} must have the same shape")
+
+    market_caps = market_cap(prices, shares)
+    total = market_caps.sum(axis=-1)
+    return MarketMetrics(
+        market_caps=market_caps,
+        total_market_value=total,
+        weights=weight(market_caps, total[..., np.newaxis]),
+        investment_per_share=investment_per_share(prices, premium),
+        profit_potential=profit_potential(prices, shares, growth)
+    )
+
+
+def split_company_row(row):
+    """(price1..priceN, shares1..sharesN) -> (prices, shares) arrays"""
+    values = np.asarray(row, dtype=np.float64)
+    n = values.shape[-1] // 2
+    return values[..., :n], values[..., n:]
+
+
+def compute_market_metrics_fixed(prices, shares, scale, places=None, premium=PREMIUM, growth=GROWTH):
+    """
+    compute_market_metrics on int64 fixed-point inputs (units of 10**-scale)
+
+    Money metrics are rounded once, half away from zero, from the exact
+    integer result to units of 10**-places (default: scale); weights are
+    plain float64 ratios.
+    """
+    places = scale if places is None else places
+    if places > scale:
+        raise ValueError(f"places ({places}) cannot exceed scale ({scale})")
+    prices = np.asarray(prices, dtype=np.int64)
+    shares = np.asarray(shares, dtype=np.int64)
+    if prices.shape != shares.shape:
+        raise ValueError(f"prices {prices.shape} and shares {shares.shape} must have the same shape")
+
+    # price * shares carries 2 * scale decimals until it is rounded
+    exact_caps = checked_multiply(prices, shares)
+    exact_total = exact_caps.sum(axis=-1)
+    cap_unit = 10 ** (2 * scale - places)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = exact_caps / exact_total[..., np.newaxis]
+
+    premium_num, premium_den = ratio(1 + premium)
+    growth_num, growth_den = ratio(growth)
+    return MarketMetrics(
+        market_caps=div_round(exact_caps, cap_unit),
+        total_market_value=div_round(exact_total, cap_unit),
+        weights=weights,
+        investment_per_share=div_round(
+            checked_multiply(prices, premium_num), premium_den * 10 ** (scale - places)
+        ),
+        profit_potential=div_round(checked_multiply(exact_caps, growth_num), growth_den * cap_unit)
+    )
@@ -0,0 +1,91 @@
+"""
+Game 2's metrics as a formula graph.
+
+Each company's price and share count are inputs; market cap, weight,
+investment per share and profit potential are derived per company, and
+the total market value across them, each with the formula function
+game2.engine's compute_market_metrics is built from. Nodes whose names
+start with an underscore are intermediate results kept out of the
+outputs, and the PER_COMPANY metrics are grouped as
+{metric: {company: value}}. The formulas use plain operators and numpy,
+so one graph evaluates a single session or arrays of many.
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from database.numeric import MONEY_PLACES, round_money
+from formulas.graph import FormulaGraph
+from game2.engine import GROWTH, PREMIUM, investment_per_share, market_cap, profit_potential, weight
+
+PER_COMPANY = ('investment_per_share', 'profit_potential')
+
+
+def companies(n):
+    return [f"company{i}" for i in range(1, n + 1)]
+
+
+def row_inputs(n):
+    """Input names in company-row order: price1..priceN, shares1..sharesN"""
+    return [f"{kind}_{company}" for kind in ('price', 'shares') for company in companies(n)]
+
+
+def _scalar(value):
+    """A plain float for a single session's 0-d result, arrays unchanged"""
+    return float(value) if np.ndim(value) == 0 else value
+
+
+def money(value):
+    """Amount rounded to cents, half away from zero, exactly as round_money"""
+    if isinstance(value, float) and math.isfinite(value) and value:
+        # round_money's arithmetic on a plain float, minus numpy's overhead
+        cents = abs(value) * 10 ** MONEY_PLACES
+        return math.copysign(math.floor(cents + 0.5 + cents * 1e-12), value) / 10 ** MONEY_PLACES
+    return _scalar(round_money(value))
+
+
+def _total(*values):
+    return sum(values[1:], values[0])
+
+
+@lru_cache(maxsize=None)
+def game2_graph(n=3, premium=PREMIUM, growth=GROWTH):
+    """The compiled Game 2 graph for n companies"""
+    graph = FormulaGraph()
+    names = companies(n)
+    # Declared in the order the outputs list them
+    for company in names:
+        graph.input(f"price_{company}", f"shares_{company}")
+        graph.formula(f"_cap_{company}", market_cap, f"price_{company}", f"shares_{company}")
+        graph.formula(f"market_cap_{company}", money, f"_cap_{company}")
+        graph.formula(f"weight_{company}", weight, f"_cap_{company}", "_total")
+    graph.formula("_total", _total, *(f"_cap_{company}" for company in names))
+    graph.formula("total_market_value", money, "_total")
+    for company in names:
+        graph.formula(f"investment_per_share_{company}",
+                      lambda price: money(investment_per_share(price, premium)), f"price_{company}")
+    for company in names:
+        graph.formula(f"profit_potential_{company}",
+                      lambda price, shares: money(profit_potential(price, shares, growth)),
+                      f"price_{company}", f"shares_{company}")
+    return graph.compile()
+
+
+def company_inputs(row):
+    """Graph inputs from a (price1..priceN, shares1..sharesN) row; NULL becomes NaN"""
+    return dict(zip(row_inputs(len(row) // 2), (math.nan if value is None else float(value) for value in row)))
+
+
+def game2_outputs(values):
+    """Outputs dict from {node name: value} of one session"""
+    results = {}
+    for name, value in values.items():
+        if name.startswith('_'):
+            continue
+        metric, _, company = name.rpartition('_')
+        if metric in PER_COMPANY:
+            results.setdefault(metric, {})[company] = value
+        else:
+            results[name] = value
+    return results
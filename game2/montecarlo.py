@@ -0,0 +1,147 @@
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from game2.engine import GROWTH, PREMIUM
+
+# Per-company growth and premium are drawn independently from normals
+# centred on the deterministic assumptions
+ScenarioModel = namedtuple('ScenarioModel', [
+    'growth_mean', 'growth_vol', 'premium_mean', 'premium_vol'
+], defaults=[GROWTH, 0.10, PREMIUM, 0.02])
+
+# Histogram range in standard deviations either side of the mean; mass
+# beyond it (~1e-15) is clamped into the edge bins
+SPAN = 8.0
+
+
+def _metric_bounds(prices, shares, model):
+    """(lo, hi) per histogram column: profit per company, investment per company, portfolio profit"""
+    caps = prices * shares
+    profit_mean, profit_sd = caps * model.growth_mean, np.abs(caps) * model.growth_vol
+    invest_mean = prices * (1 + model.premium_mean)
+    invest_sd = np.abs(prices) * model.premium_vol
+    portfolio_mean = profit_mean.sum()
+    portfolio_sd = np.sqrt((profit_sd ** 2).sum())
+
+    means = np.concatenate([profit_mean, invest_mean, [portfolio_mean]])
+    sds = np.concatenate([profit_sd, invest_sd, [portfolio_sd]])
+    # Degenerate (zero-volatility) columns still need a non-empty range
+    sds = np.where(sds > 0, sds, np.maximum(np.abs(means), 1.0) * 1e-9)
+    return means - SPAN * sds, means + SPAN * sds
+
+
+def _simulate_worker(prices, shares, model, n_paths, chunk_size, seed, lo, hi, bins):
+    """Histogram counts and sums for n_paths paths from one seed; runs in a worker process"""
+    rng = np.random.default_rng(seed)
+    n_companies = prices.shape[0]
+    n_columns = lo.shape[0]
+    width = (hi - lo) / bins
+    offsets = np.arange(n_columns) * bins
+    counts = np.zeros(n_columns * bins, dtype=np.int64)
+    sums = np.zeros(n_columns)
+    caps = prices * shares
+
+    remaining = n_paths
+    while remaining:
+        n = min(chunk_size, remaining)
+        remaining -= n
+        growth = rng.normal(model.growth_mean, model.growth_vol, size=(n, n_companies))
+        premium = rng.normal(model.premium_mean, model.premium_vol, size=(n, n_companies))
+
+        profit = caps * growth
+        values = np.concatenate([
+            profit,
+            prices * (1 + premium),
+            profit.sum(axis=1, keepdims=True)
+        ], axis=1)
+
+        sums += values.sum(axis=0)
+        index = np.clip(((values - lo) / width).astype(np.int64), 0, bins - 1)
+        counts += np.bincount((index + offsets).ravel(), minlength=n_columns * bins)
+
+    return counts.reshape(n_columns, bins), sums
+
+
+def _quantiles(counts, lo, hi, qs):
+    """Linearly interpolated quantiles of one histogram"""
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1]
+    edges = np.linspace(lo, hi, counts.shape[0] + 1)
+    results = []
+    for q in qs:
+        target = q * total
+        i = int(np.searchsorted(cumulative, target, side='left'))
+        i = min(i, counts.shape[0] - 1)
+        below = cumulative[i - 1] if i else 0
+        fraction = (target - below) / counts[i] if counts[i] else 0.0
+        results.append(edges[i] + fraction * (edges[i + 1] - edges[i]))
+    return results
+
+
+def _tail_mean(counts, lo, hi, cutoff):
+    """Mean of the histogram mass at or below cutoff (expected shortfall)"""
+    edges = np.linspace(lo, hi, counts.shape[0] + 1)
+    centres = (edges[:-1] + edges[1:]) / 2
+    tail = centres <= cutoff
+    mass = counts[tail].sum()
+    return float((counts[tail] * centres[tail]).sum() / mass) if mass else float(cutoff)
+
+
+def simulate_game2(prices, shares, n_paths=1_000_000, model=ScenarioModel(), chunk_size=100_000,
+                   workers=1, seed=None, percentiles=(5, 50, 95), confidence=0.95, bins=8192):
+    """
+    Monte Carlo distribution of Game 2 profit potential and investment price
+
+    Paths are generated and binned chunk by chunk, so memory is bounded by
+    chunk_size and bins, not n_paths. With workers > 1 the paths are split
+    across a process pool; each worker gets its own child of
+    SeedSequence(seed), so a given (seed, workers) pair is reproducible.
+    Returns expected values, percentiles and, for profit, value at risk
+    and expected shortfall at the given confidence.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    shares = np.asarray(shares, dtype=np.float64)
+    n_companies = prices.shape[0]
+    lo, hi = _metric_bounds(prices, shares, model)
+
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    split = [n_paths // workers + (i < n_paths % workers) for i in range(workers)]
+    jobs = [
+        (prices, shares, model, n, chunk_size, s, lo, hi, bins)
+        for n, s in zip(split, seeds) if n
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_simulate_worker, *zip(*jobs)))
+    else:
+        parts = [_simulate_worker(*job) for job in jobs]
+
+    counts = sum(part[0] for part in parts)
+    sums = sum(part[1] for part in parts)
+    tail = 1 - confidence
+
+    def summarise(column, risk):
+        qs = [p / 100 for p in percentiles] + ([tail] if risk else [])
+        values = _quantiles(counts[column], lo[column], hi[column], qs)
+        summary = {'expected': float(sums[column] / n_paths)}
+        summary.update({f"p{p:g}": float(v) for p, v in zip(percentiles, values)})
+        if risk:
+            cutoff = values[-1]
+            summary['var'] = float(-cutoff)
+            summary['expected_shortfall'] = -_tail_mean(counts[column], lo[column], hi[column], cutoff)
+        return summary
+
+    companies = [f"company{i}" for i in range(1, n_companies + 1)]
+    return {
+        'paths': n_paths,
+        'confidence': confidence,
+        'profit_potential': {
+            company: summarise(i, risk=True) for i, company in enumerate(companies)
+        },
+        'investment_per_share': {
+            company: summarise(n_companies + i, risk=False) for i, company in enumerate(companies)
+        },
+        'portfolio_profit': summarise(2 * n_companies, risk=True)
+    }
@@ -1,140 +1,312 @@
-from rich.console import Console
+import numpy as np
+from rich.console import Console, Group
 from rich.table import Table
+from rich.text import Text
+from database.cache import cached_game2_company_data, cached_game2_terms
+from database.database import DEFAULT_SESSION
+from database.history import record_game2_results
+from database.metrics import instrument
+from database.numeric import (
+    FIXED, MONEY_PLACES, from_fixed, precision_policy, round_money, to_fixed_array, to_float_array
+)
+from game2.allocation import allocate, allocation_outputs, budgets_from_terms, session_allocation
+from game2.engine import compute_market_metrics, compute_market_metrics_fixed, split_company_row
+from game2.formulas import company_inputs, game2_graph, game2_outputs
+from game2.montecarlo import simulate_game2
+from ui.live import Layout
 
 console = Console()
 
+# MarketMetrics fields rounded to cents before they reach the outputs
+MONEY_FIELDS = ('market_caps', 'total_market_value', 'investment_per_share', 'profit_potential')
 
-def calculate_game2_outputs(conn):
+
+@instrument('calculate')
+def calculate_game2_outputs(conn, session_id=DEFAULT_SESSION, simulate=None):
     """
     Calculate all investor metrics based on company data
     Returns dictionary with all calculated values
+
+    simulate: optional simulate_game2 keyword arguments ({} for defaults)
+    to add a Monte Carlo distribution under 'monte_carlo'. Once Team 2
+    has entered investor budgets, their optimal share purchases are added
+    under 'allocation'.
+    """
+    # Get all company prices and shares
+    prices = cached_game2_company_data(conn, session_id)
+    results = compute_game2_metrics(prices)
+    record_game2_results(session_id, results)
+    add_allocation(results, prices, cached_game2_terms(conn, session_id))
+    if simulate is not None:
+        results["monte_carlo"] = simulate_game2(*split_company_row(prices), **simulate)
+    return results
+
+
+@instrument('calculate')
+def calculate_game2_outputs_batch(conn, session_ids):
+    """
+    Game 2 outputs for many sessions, computed as one (sessions x N)
+    batch, with one allocation pass for every session's budgets
+    """
+    rows = [cached_game2_company_data(conn, session_id) for session_id in session_ids]
+    budgets = [budgets_from_terms(cached_game2_terms(conn, session_id)) for session_id in session_ids]
+    results = compute_game2_metrics_batch(rows)
+    allocation = allocate(*split_company_row(to_float_array(rows).reshape(len(rows), -1)),
+                          [_nan(row) for row in budgets])
+    for i, (session_id, result) in enumerate(zip(session_ids, results)):
+        record_game2_results(session_id, result)
+        if any(budget is not None for budget in budgets[i]):
+            result["allocation"] = allocation_outputs(budgets[i], session_allocation(allocation, i))
+    return results
+
+
+def add_allocation(results, prices, terms):
+    """Add 'allocation' to a session's results once Team 2 has entered an investor budget"""
+    budgets = budgets_from_terms(terms)
+    if any(budget is not None for budget in budgets):
+        allocation = allocate(*split_company_row(to_float_array(prices)), _nan(budgets))
+        results["allocation"] = allocation_outputs(budgets, allocation)
+    return results
+
+
+def _nan(values):
+    return [np.nan if value is None else value for value in values]
+
+
+def compute_game2_metrics(prices, policy=None):
+    """
+    Calculate all investor metrics from a (price1, price2, price3,
+    shares1, shares2, shares3) row
+    """
+    policy = policy or precision_policy()
+    if policy.kind == FIXED:
+        return compute_game2_metrics_batch([prices], policy)[0]
+    _check_company_data(prices)
+    return game2_outputs(game2_graph(len(prices) // 2).evaluate(company_inputs(prices)))
+
+
+def _check_company_data(row):
+    if not any(row):
+        raise ValueError("No company data found in database")
+
+
+def compute_game2_metrics_batch(rows, policy=None):
     """
-    with conn.cursor() as cur:
-        # Get all company prices and shares
-        cur.execute("""
-            SELECT 
-                MAX(CASE WHEN term = 'price_company1' THEN team1_company1 END) as price1,
-                MAX(CASE WHEN term = 'price_company2' THEN team1_company2 END) as price2,
-                MAX(CASE WHEN term = 'price_company3' THEN team1_company3 END) as price3,
-                MAX(CASE WHEN term = 'shares_company1' THEN team1_company1 END) as shares1,
-                MAX(CASE WHEN term = 'shares_company2' THEN team1_company2 END) as shares2,
-                MAX(CASE WHEN term = 'shares_company3' THEN team1_company3 END) as shares3
-            FROM game2_terms
-        """)
-
-        prices = cur.fetchone()
-        if not any(prices):
-            raise ValueError("No company data found in database")
-
-        price1, price2, price3, shares1, shares2, shares3 = prices
-
-        # Calculate metrics
-        results = {
-            # Market Capitalization (Price * Shares)
-            "market_cap_company1": price1 * shares1,
-            "market_cap_company2": price2 * shares2,
-            "market_cap_company3": price3 * shares3,
-
-            # Total Market Value
-            "total_market_value": (price1 * shares1) + (price2 * shares2) + (price3 * shares3),
-
-            # Company Weightings
-            "weight_company1": (price1 * shares1) / (price1 * shares1 + price2 * shares2 + price3 * shares3),
-            "weight_company2": (price2 * shares2) / (price1 * shares1 + price2 * shares2 + price3 * shares3),
-            "weight_company3": (price3 * shares3) / (price1 * shares1 + price2 * shares2 + price3 * shares3),
-
-            # Investor Metrics
-            "investment_per_share": {
-                "company1": price1 * 1.10,  # 10% premium
-                "company2": price2 * 1.10,
-                "company3": price3 * 1.10
-            },
-
-            "profit_potential": {
-                "company1": (price1 * 1.15 - price1) * shares1,  # 15% growth assumption
-                "company2": (price2 * 1.15 - price2) * shares2,
-                "company3": (price3 * 1.15 - price3) * shares3
-            }
-        }
-
-        return results
+    Dict outputs for many company rows, adapting one vectorized engine pass
+
+    policy (default: precision_policy()) picks float64 or fixed-point
+    arithmetic; either way money metrics are rounded to cents, half away
+    from zero. The float64 engine is built from the same formula functions
+    as the game2_graph() nodes single sessions are evaluated with.
+    """
+    for row in rows:
+        _check_company_data(row)
+
+    policy = policy or precision_policy()
+    if policy.kind == FIXED:
+        prices, shares = split_company_row(to_fixed_array(rows, policy.scale))
+        metrics = compute_market_metrics_fixed(prices, shares, policy.scale, MONEY_PLACES)
+        metrics = metrics._replace(**{
+            field: from_fixed(getattr(metrics, field), MONEY_PLACES) for field in MONEY_FIELDS
+        })
+        rows = from_fixed(np.concatenate([prices, shares], axis=-1), policy.scale).tolist()
+    else:
+        prices, shares = split_company_row(to_float_array(rows).reshape(len(rows), -1))
+        metrics = compute_market_metrics(prices, shares)
+        metrics = metrics._replace(**{
+            field: round_money(getattr(metrics, field)) for field in MONEY_FIELDS
+        })
+        rows = np.concatenate([prices, shares], axis=-1).tolist()
+
+    return [
+        _metrics_dict(row, *(np.asarray(metric)[i].tolist() for metric in metrics))
+        for i, row in enumerate(rows)
+    ]
+
+
+def update_game2_metrics(evaluation, prices, policy=None):
+    """
+    compute_game2_metrics for a session tracked by an Evaluation of
+    game2_graph(), recomputing only the metrics downstream of the prices
+    and shares that changed since its last update
+    """
+    policy = policy or precision_policy()
+    if policy.kind == FIXED:
+        return compute_game2_metrics(prices, policy)
+    _check_company_data(prices)
+    evaluation.update(company_inputs(prices))
+    return game2_outputs(evaluation.values())
+
+
+def _metrics_dict(row, market_caps, total, weights, investment_per_share, profit_potential):
+    n = len(row) // 2
+    companies = [f"company{i}" for i in range(1, n + 1)]
+    results = {}
+    for company, price, share_count, market_cap, weight in zip(
+            companies, row[:n], row[n:], market_caps, weights):
+        results[f"price_{company}"] = price
+        results[f"shares_{company}"] = share_count
+        # Market Capitalization (Price * Shares)
+        results[f"market_cap_{company}"] = market_cap
+        # Company Weightings
+        results[f"weight_{company}"] = weight
+
+    # Total Market Value
+    results["total_market_value"] = total
 
+    # Investor Metrics: 10% premium, 15% growth assumption
+    results["investment_per_share"] = dict(zip(companies, investment_per_share))
+    results["profit_potential"] = dict(zip(companies, profit_potential))
+    return results
 
+
+def _format_shares(shares):
+    """Whole share counts without the trailing .0 a float NUMERIC carries"""
+    return f"{shares:,.0f}" if float(shares).is_integer() else f"{shares:,}"
+
+
+COMPANIES = ('company1', 'company2', 'company3')
+
+# (label, cell key) rows of the two Game 2 tables
+MARKET_ROWS = (
+    ("Share Price ($)", 'price'),
+    ("Shares Available", 'shares'),
+    ("Market Cap ($)", 'market_cap'),
+    ("Market Weight", 'weight'),
+)
+INVESTMENT_ROWS = (
+    ("Investment/Share ($)", 'investment_per_share'),
+    ("Profit Potential ($)", 'profit_potential'),
+)
+
+NOTE = "[yellow]Note:[/yellow] Investment prices include 10% premium, profit potential assumes 15% growth"
+
+
+class Game2Layout(Layout):
+    """Market overview and investment tables, the total and any Monte Carlo table"""
+
+    def cells(self, data):
+        cells = {}
+        for company in COMPANIES:
+            cells[('price', company)] = f"${data[f'price_{company}']:,.2f}"
+            cells[('shares', company)] = _format_shares(data[f'shares_{company}'])
+            cells[('market_cap', company)] = f"${data[f'market_cap_{company}']:,.2f}"
+            cells[('weight', company)] = f"{data[f'weight_{company}']:.2%}"
+            cells[('investment_per_share', company)] = f"${data['investment_per_share'][company]:,.2f}"
+            cells[('profit_potential', company)] = f"${data['profit_potential'][company]:,.2f}"
+        cells[('total', None)] = f"\n[bold]Total Market Value:[/bold] ${data['total_market_value']:,.2f}"
+        for investor, allocation in data.get("allocation", {}).items():
+            cells[('allocation', investor, 'budget')] = f"${allocation['budget']:,.2f}"
+            for company, count in allocation['shares'].items():
+                cells[('allocation', investor, company)] = f"{count:,}"
+            cells[('allocation', investor, 'cost')] = f"${allocation['cost']:,.2f}"
+            cells[('allocation', investor, 'expected_profit')] = f"${allocation['expected_profit']:,.2f}"
+            cells[('allocation', investor, 'cash')] = f"${allocation['cash']:,.2f}"
+        if "monte_carlo" in data:
+            cells.update(monte_carlo_cells(data["monte_carlo"]))
+        return cells
+
+    def build(self, texts):
+        # Main Metrics Table
+        main_table = _company_table("Game 2 - Market Overview", "bold magenta", MARKET_ROWS, texts)
+
+        # Investment Recommendations Table
+        invest_table = _company_table("Investment Recommendations", "bold green", INVESTMENT_ROWS, texts)
+
+        # Summary Statistics
+        parts = [main_table, invest_table, texts[('total', None)], Text.from_markup(NOTE)]
+        if any(key[0] == 'allocation' for key in texts):
+            parts.append(allocation_table(texts))
+        if ('monte_carlo', 'title') in texts:
+            parts.append(monte_carlo_table(texts))
+        return Group(*parts)
+
+
+def _company_table(title, header_style, rows, texts):
+    table = Table(title=title, show_header=True, header_style=header_style)
+    table.add_column("Metric", style="cyan")
+    for i in range(1, len(COMPANIES) + 1):
+        table.add_column(f"Company {i}", justify="right")
+    for label, key in rows:
+        table.add_row(label, *(texts[(key, company)] for company in COMPANIES))
+    return table
+
+
+# (label, cell key) rows of the allocation table, company rows between them
+ALLOCATION_ROWS = (("Budget ($)", 'budget'),)
+ALLOCATION_TOTALS = (("Cost ($)", 'cost'), ("Expected Profit ($)", 'expected_profit'), ("Cash Left ($)", 'cash'))
+
+
+def allocation_table(texts):
+    """Optimal share purchases, one column per investor with a budget"""
+    investors = list(dict.fromkeys(key[1] for key in texts if key[0] == 'allocation'))
+    table = Table(title="Investor Allocations", show_header=True, header_style="bold blue")
+    table.add_column("Metric", style="cyan")
+    for investor in investors:
+        table.add_column(investor.replace("investor", "Investor "), justify="right")
+
+    rows = ALLOCATION_ROWS + tuple(
+        (f"Company {i} Shares", company) for i, company in enumerate(COMPANIES, 1)
+    ) + ALLOCATION_TOTALS
+    for label, key in rows:
+        table.add_row(label, *(texts[('allocation', investor, key)] for investor in investors))
+    return table
+
+
+game2_layout = Game2Layout()
+
+
+@instrument('render')
 def display_game2_outputs(data):
     """Display all calculated metrics in rich tables"""
+    console.print(game2_layout.render(data))
+
+
+def monte_carlo_cells(simulation):
+    """Cells of the simulated profit distribution table, keyed ('monte_carlo', ...)"""
+    profit = simulation["profit_potential"]
+    stats = [key for key in next(iter(profit.values())) if key not in ("var", "expected_shortfall")]
+    confidence = f"{simulation['confidence']:.0%}"
+    columns = list(profit.values()) + [simulation["portfolio_profit"]]
+
+    cells = {('monte_carlo', 'title'): f"[table.title]Profit Potential - Monte Carlo ({simulation['paths']:,} paths)"}
+    for j, company in enumerate(profit):
+        cells[('monte_carlo', 'header', j)] = company.replace("company", "Company ")
+    rows = [(stat.capitalize() if stat == "expected" else stat.upper(), stat) for stat in stats]
+    rows += [(f"VaR {confidence}", 'var'), (f"ES {confidence}", 'expected_shortfall')]
+    for i, (label, stat) in enumerate(rows):
+        cells[('monte_carlo', i, 'label')] = label
+        for j, column in enumerate(columns):
+            cells[('monte_carlo', i, j)] = f"${column[stat]:,.2f}"
+    return cells
+
+
+def monte_carlo_table(texts):
+    table = Table(title=texts[('monte_carlo', 'title')], show_header=True, header_style="bold yellow")
+    table.add_column("Metric", style="cyan")
+    for key, text in texts.items():
+        if key[:2] == ('monte_carlo', 'header'):
+            table.add_column(text, justify="right")
+    table.add_column("Portfolio", justify="right", style="bold")
+
+    columns = len(table.columns) - 1
+    i = 0
+    while ('monte_carlo', i, 'label') in texts:
+        table.add_row(texts[('monte_carlo', i, 'label')], *(texts[('monte_carlo', i, j)] for j in range(columns)))
+        i += 1
+    return table
+
 
-    # Main Metrics Table
-    main_table = Table(title="Game 2 - Market Overview", show_header=True, header_style="bold magenta")
-    main_table.add_column("Metric", style="cyan")
-    main_table.add_column("Company 1", justify="right")
-    main_table.add_column("Company 2", justify="right")
-    main_table.add_column("Company 3", justify="right")
-
-    main_table.add_row(
-        "Share Price ($)",
-        f"${data['price_company1']:,.2f}",
-        f"${data['price_company2']:,.2f}",
-        f"${data['price_company3']:,.2f}"
-    )
-    main_table.add_row(
-        "Shares Available",
-        f"{data['shares_company1']:,}",
-        f"{data['shares_company2']:,}",
-        f"{data['shares_company3']:,}"
-    )
-    main_table.add_row(
-        "Market Cap ($)",
-        f"${data['market_cap_company1']:,.2f}",
-        f"${data['market_cap_company2']:,.2f}",
-        f"${data['market_cap_company3']:,.2f}"
-    )
-    main_table.add_row(
-        "Market Weight",
-        f"{data['weight_company1']:.2%}",
-        f"{data['weight_company2']:.2%}",
-        f"{data['weight_company3']:.2%}"
-    )
-
-    console.print(main_table)
-
-    # Investment Recommendations Table
-    invest_table = Table(title="Investment Recommendations", show_header=True, header_style="bold green")
-    invest_table.add_column("Metric", style="cyan")
-    invest_table.add_column("Company 1", justify="right")
-    invest_table.add_column("Company 2", justify="right")
-    invest_table.add_column("Company 3", justify="right")
-
-    invest_table.add_row(
-        "Investment/Share ($)",
-        f"${data['investment_per_share']['company1']:,.2f}",
-        f"${data['investment_per_share']['company2']:,.2f}",
-        f"${data['investment_per_share']['company3']:,.2f}"
-    )
-    invest_table.add_row(
-        "Profit Potential ($)",
-        f"${data['profit_potential']['company1']:,.2f}",
-        f"${data['profit_potential']['company2']:,.2f}",
-        f"${data['profit_potential']['company3']:,.2f}"
-    )
-
-    console.print(invest_table)
-
-    # Summary Statistics
-    console.print(f"\n[bold]Total Market Value:[/bold] ${data['total_market_value']:,.2f}")
-    console.print("[yellow]Note:[/yellow] Investment prices include 10% premium, profit potential assumes 15% growth")
-
-
-def get_game2_terms(conn):
-    """Utility function to fetch all game2 terms"""
-    with conn.cursor() as cur:
-        cur.execute("SELECT * FROM game2_terms")
-        return cur.fetchall()
+def display_monte_carlo(simulation):
+    """Display the simulated profit distribution per company"""
+    texts = {key: Text.from_markup(markup) for key, markup in monte_carlo_cells(simulation).items()}
+    console.print(monte_carlo_table(texts))
 
 
 if __name__ == "__main__":
-    from database.database import Database
+    from database.database import Database, current_session
 
     db = Database()
     with db.get_conn() as conn:
-        data = calculate_game2_outputs(conn)
+        data = calculate_game2_outputs(conn, current_session())
         display_game2_outputs(data)
\ No newline at end of file
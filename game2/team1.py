@@ -1,6 +1,6 @@
 import sys
 from rich.console import Console
-from database.database import Database, update_game2_term
+from database.database import Database, TermBatch, current_session
 
 console = Console()
 db = Database()
@@ -32,24 +32,19 @@ def collect_company_data():
     return companies
 
 
-def save_to_database(companies):
-    """Save company data to database using your Database class"""
-    with db.get_conn() as conn:
-        # Save prices (Team 1 = team1)
-        update_game2_term(conn, f"price_company1", 1, 1, companies["Company1"]["price"])
-        update_game2_term(conn, f"price_company2", 1, 2, companies["Company2"]["price"])
-        update_game2_term(conn, f"price_company3", 1, 3, companies["Company3"]["price"])
+def save_to_database(companies, session_id=None):
+    """Save company data to database in a single transaction"""
+    with db.get_conn() as conn, TermBatch(conn, session_id or current_session()) as batch:
+        for i in range(1, 4):
+            # Save prices and shares (Team 1 = team1)
+            batch.update_game2_term(f"price_company{i}", 1, i, companies[f"Company{i}"]["price"])
+            batch.update_game2_term(f"shares_company{i}", 1, i, companies[f"Company{i}"]["shares"])
 
-        # Save shares (Team 1 = team1)
-        update_game2_term(conn, f"shares_company1", 1, 1, companies["Company1"]["shares"])
-        update_game2_term(conn, f"shares_company2", 1, 2, companies["Company2"]["shares"])
-        update_game2_term(conn, f"shares_company3", 1, 3, companies["Company3"]["shares"])
 
-
-def main():
+def main(session_id=None):
     console.print("[bold blue]=== Game 2 - Team 1 (Companies) ===")
     companies = collect_company_data()
-    save_to_database(companies)
+    save_to_database(companies, session_id)
     console.print("[green bold]✓ All company data saved successfully!")
 
 
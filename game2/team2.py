@@ -1,48 +1,73 @@
 import sys
-from rich.console import Console
-from database.database import Database
-from game2.shared import calculate_game2_outputs, display_game2_outputs
+from database.backends.base import GAME2_BUDGET_TERMS
+from database.database import (
+    DEFAULT_SESSION, Database, current_session, get_missing_game2_inputs, update_game2_terms
+)
+from game2.shared import calculate_game2_outputs, game2_layout
+from ui.live import create_view, status_console
 
-console = Console()
+console = status_console()
 db = Database()
 
 
-def verify_team1_completion(conn):
+def verify_team1_completion(conn, session_id=DEFAULT_SESSION):
     """Check if Team 1 completed all required inputs"""
-    required_terms = [
-        "price_company1", "price_company2", "price_company3",
-        "shares_company1", "shares_company2", "shares_company3"
-    ]
-
-    with conn.cursor() as cur:
-        cur.execute("""
-            SELECT term FROM game2_terms
-            WHERE term = ANY(%s) AND (team1_company1 IS NULL OR 
-                                     team1_company2 IS NULL OR 
-                                     team1_company3 IS NULL)
-        """, (required_terms,))
-
-        missing = cur.fetchall()
-        if missing:
-            console.print("[red]Error: Missing Team 1 inputs for:")
-            for term in missing:
-                console.print(f"  - {term[0]}")
-            return False
-        return True
-
-
-def main():
+    missing = get_missing_game2_inputs(conn, session_id)
+    if missing:
+        console.print("[red]Error: Missing Team 1 inputs for:")
+        for term in missing:
+            console.print(f"  - {term}")
+        return False
+    return True
+
+
+def collect_budgets():
+    """Collect each investor's budget; a blank answer leaves that investor out"""
+    budgets = {}
+
+    for i, term in enumerate(GAME2_BUDGET_TERMS, 1):
+        while True:
+            answer = console.input(f"? Enter budget ($) for Investor {i} (blank to skip): ").strip()
+            if not answer:
+                break
+            try:
+                budget = float(answer)
+            except ValueError:
+                console.print("[red]Error: Please enter a valid number")
+                continue
+            if budget <= 0:
+                console.print("[red]Error: Budget must be positive")
+                continue
+            budgets[term] = budget
+            break
+
+    return budgets
+
+
+def save_budgets(conn, budgets, session_id=DEFAULT_SESSION):
+    """Save investor budgets in one statement; they sit in the team2_company1 column"""
+    if budgets:
+        update_game2_terms(conn, 2, [(term, 1, budget) for term, budget in budgets.items()], session_id)
+
+
+def main(session_id=None):
+    session_id = session_id or current_session()
     console.print("[bold blue]=== Game 2 - Team 2 (Investors) ===")
 
     with db.get_conn() as conn:
         # Step 1: Verify Team 1 completed their inputs
-        if not verify_team1_completion(conn):
+        if not verify_team1_completion(conn, session_id):
             sys.exit(1)
 
-        # Step 2: Perform calculations
+        # Step 2: Enter investor budgets
+        console.print("[bold]\nInvestor Budgets[/bold]")
+        save_budgets(conn, collect_budgets(), session_id)
+
+        # Step 3: Perform calculations
         try:
-            data = calculate_game2_outputs(conn)
-            display_game2_outputs(data)
+            data = calculate_game2_outputs(conn, session_id)
+            with create_view(game2_layout, console) as view:
+                view.show(data)
         except Exception as e:
             console.print(f"[red]Calculation error: {e}")
             sys.exit(1)
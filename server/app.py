@@ -0,0 +1,333 @@
+"""
+JSON API over the game terms and outputs.
+
+    python -m server.app --port 8080
+
+Reads carry an ETag built from the session's term version, so a poll with
+If-None-Match costs one version lookup and returns 304 until a write lands.
+"""
+import argparse
+import asyncio
+import json
+from collections import OrderedDict
+
+from aiohttp import web
+
+from database.backends.base import (
+    GAME1_COLUMNS, GAME1_DEFAULT_TERMS, GAME2_COLUMNS, GAME2_DEFAULT_TERMS
+)
+from database.history import record_game2_results
+from database.metrics import CONTENT_TYPE, render_prometheus
+from game1.shared import game1_outputs, record_agreed_valuation
+from game2.shared import add_allocation, compute_game2_metrics
+from server.responses import dumps, error
+from server.store import create_store
+from server.stream import StreamHub, sse_stream, ws_stream
+
+GAME1_TERMS = {term for term, _ in GAME1_DEFAULT_TERMS}
+GAME2_TERMS = set(GAME2_DEFAULT_TERMS)
+
+# resource -> table whose version it follows
+RESOURCES = {
+    'game1/terms': 'game1_terms',
+    'game1/outputs': 'game1_terms',
+    'game2/terms': 'game2_terms',
+    'game2/outputs': 'game2_terms',
+}
+
+
+def _columns(columns):
+    return [column.strip() for column in columns.split(',')]
+
+
+def rows_to_dicts(columns, rows):
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class ResponseCache:
+    """Serialized bodies keyed on (resource, session), valid for one term version"""
+
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+
+    def get(self, key, version):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, version, body):
+        self._entries[key] = (version, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+async def build_resource(store, resource, session_id):
+    """JSON-ready payload for one resource of an existing session"""
+    if resource == 'game1/terms':
+        return rows_to_dicts(_columns(GAME1_COLUMNS), await store.game1_terms(session_id))
+    if resource == 'game1/outputs':
+        terms = await store.game1_terms(session_id)
+        outputs = game1_outputs(terms)
+        record_agreed_valuation(session_id, terms, outputs)
+        return outputs
+    if resource == 'game2/terms':
+        return rows_to_dicts(_columns(GAME2_COLUMNS), await store.game2_terms(session_id))
+    if resource == 'game2/outputs':
+        row = await store.game2_company_data(session_id)
+        if None in row:
+            raise error(web.HTTPConflict, "Team 1 has not entered all company data")
+        results = compute_game2_metrics(row)
+        record_game2_results(session_id, results)
+        return add_allocation(results, row, await store.game2_terms(session_id))
+    raise KeyError(resource)
+
+
+async def read_resource(app, resource, session_id):
+    """(etag, body bytes) for a resource, served from cache while its version holds"""
+    # Read the version before the rows, as TermCache does: a write landing
+    # in between only costs a refetch, never a stale body under a new tag
+    version = await app['store'].terms_version(RESOURCES[resource], session_id)
+    if not version:
+        # Seeding a session bumps its versions, so 0 means it was never created
+        raise error(web.HTTPNotFound, f"Unknown session {session_id!r}")
+    etag = f'"{version}"'
+    body = app['cache'].get((resource, session_id), version)
+    if body is None:
+        body = dumps(await build_resource(app['store'], resource, session_id))
+        app['cache'].put((resource, session_id), version, body)
+    return etag, body
+
+
+def _not_modified(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return '*' in tags or etag in tags
+
+
+async def get_resource(request):
+    resource = f"{request.match_info['game']}/{request.match_info['resource']}"
+    if resource not in RESOURCES:
+        raise error(web.HTTPNotFound, f"Unknown resource {resource!r}")
+    etag, body = await read_resource(request.app, resource, request.match_info['session_id'])
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    if _not_modified(request, etag):
+        return web.Response(status=304, headers=headers)
+    return web.Response(body=body, content_type='application/json', headers=headers)
+
+
+async def batch_read(request):
+    """POST {"sessions": [...], "resources": [...]} -> {session: {resource: payload}}"""
+    body = await _json_body(request)
+    sessions = body.get('sessions') or []
+    resources = body.get('resources') or list(RESOURCES)
+    if not isinstance(sessions, list) or not all(isinstance(s, str) and s for s in sessions):
+        raise error(web.HTTPBadRequest, "sessions must be a list of non-empty strings")
+    if not isinstance(resources, list) or not all(isinstance(r, str) for r in resources):
+        raise error(web.HTTPBadRequest, "resources must be a list of strings")
+    unknown = [resource for resource in resources if resource not in RESOURCES]
+    if unknown:
+        raise error(web.HTTPBadRequest, f"Unknown resources {unknown}")
+
+    async def read(session_id, resource):
+        try:
+            etag, body = await read_resource(request.app, resource, session_id)
+        except web.HTTPException as exc:
+            return dumps({'status': exc.status, **json.loads(exc.text)})
+        # Splice the cached body in rather than decoding and re-encoding it
+        return b'{"etag":' + dumps(etag) + b',"data":' + body + b'}'
+
+    results = await asyncio.gather(
+        *(read(session_id, resource) for session_id in sessions for resource in resources)
+    )
+    parts = iter(results)
+    body = b'{' + b','.join(
+        dumps(session_id) + b':{' + b','.join(
+            dumps(resource) + b':' + next(parts) for resource in resources
+        ) + b'}'
+        for session_id in sessions
+    ) + b'}'
+    return web.Response(body=body, content_type='application/json')
+
+
+async def _json_body(request):
+    try:
+        body = await request.json()
+    except ValueError:
+        raise error(web.HTTPBadRequest, "Request body must be JSON")
+    if not isinstance(body, dict):
+        raise error(web.HTTPBadRequest, "Request body must be a JSON object")
+    return body
+
+
+def _team(body):
+    team = body.get('team')
+    if team not in (1, 2):
+        raise error(web.HTTPBadRequest, "team must be 1 or 2")
+    return team
+
+
+def _check_terms(terms, known):
+    unknown = sorted(set(terms) - known)
+    if unknown:
+        raise error(web.HTTPBadRequest, f"Unknown terms {unknown}")
+
+
+def _game1_value(team, term, value):
+    if team == 1 and (isinstance(value, bool) or not isinstance(value, (int, float))):
+        raise error(web.HTTPBadRequest, f"{term}: Team 1 values must be numbers")
+    if team == 2 and not isinstance(value, bool):
+        raise error(web.HTTPBadRequest, f"{term}: Team 2 approvals must be true or false")
+    return value
+
+
+def _versions(body):
+    """Optional {term: expected version} for compare-and-swap writes"""
+    versions = body.get('versions')
+    if versions is None:
+        return None
+    if not isinstance(versions, dict) or not all(
+            isinstance(version, int) and not isinstance(version, bool) for version in versions.values()):
+        raise error(web.HTTPBadRequest, "versions must map terms to integer versions")
+    return versions
+
+
+async def write_game1_terms(request, team, values, versions):
+    """Write through the store; 409 with the current rows of any term whose version moved on"""
+    session_id = request.match_info['session_id']
+    results = await request.app['store'].update_game1_terms(team, values, session_id, versions)
+    if any(result.row is None for result in results.values()):
+        raise error(web.HTTPNotFound, f"Unknown session {session_id!r}")
+    conflicts = {term: result.row for term, result in results.items() if not result.applied}
+    if conflicts:
+        columns = _columns(GAME1_COLUMNS)
+        raise web.HTTPConflict(body=dumps({
+            'error': f"Terms changed since they were read: {sorted(conflicts)}",
+            'current': {term: dict(zip(columns, row)) for term, row in conflicts.items()},
+        }), content_type='application/json')
+    return web.Response(status=204)
+
+
+async def create_session(request):
+    await request.app['store'].create_session(request.match_info['session_id'])
+    return web.Response(status=201)
+
+
+async def update_game1_terms(request):
+    """
+    PATCH {"team": 1, "values": {term: value}}; Team 2 sends approvals as
+    booleans. An optional "versions": {term: version} makes each write a
+    compare-and-swap, answered with 409 once the term has moved on.
+    """
+    body = await _json_body(request)
+    team = _team(body)
+    values = body.get('values')
+    if not isinstance(values, dict) or not values:
+        raise error(web.HTTPBadRequest, "values must be a non-empty object")
+    _check_terms(values, GAME1_TERMS)
+    values = {term: _game1_value(team, term, value) for term, value in values.items()}
+    return await write_game1_terms(request, team, values, _versions(body))
+
+
+async def update_game1_term(request):
+    """PUT {"team": 1, "value": ..., "version": n} to a single term; version is optional"""
+    body = await _json_body(request)
+    team = _team(body)
+    term = request.match_info['term']
+    _check_terms([term], GAME1_TERMS)
+    value = _game1_value(team, term, body.get('value'))
+    versions = _versions({'versions': {term: body['version']}} if 'version' in body else {})
+    return await write_game1_terms(request, team, {term: value}, versions)
+
+
+async def approve_game1_terms(request):
+    """POST {term: true|false} as Team 2, with optional "versions" as for PATCH"""
+    values = await _json_body(request)
+    versions = _versions(values)
+    values.pop('versions', None)
+    _check_terms(values, GAME1_TERMS)
+    values = {term: _game1_value(2, term, value) for term, value in values.items()}
+    if not values:
+        return web.Response(status=204)
+    return await write_game1_terms(request, 2, values, versions)
+
+
+async def update_game2_terms(request):
+    """PATCH {"team": 1, "updates": [{"term": ..., "company": 1-3, "value": ...}]}"""
+    body = await _json_body(request)
+    team = _team(body)
+    updates = body.get('updates')
+    if not isinstance(updates, list) or not updates:
+        raise error(web.HTTPBadRequest, "updates must be a non-empty list")
+    try:
+        updates = [(update['term'], update['company'], update['value']) for update in updates]
+    except (KeyError, TypeError):
+        raise error(web.HTTPBadRequest, "Each update needs term, company and value")
+    _check_terms([term for term, _, _ in updates], GAME2_TERMS)
+    for term, company, value in updates:
+        if company not in (1, 2, 3):
+            raise error(web.HTTPBadRequest, f"{term}: company must be 1, 2 or 3")
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise error(web.HTTPBadRequest, f"{term}: values must be numbers")
+    await request.app['store'].update_game2_terms(team, updates, request.match_info['session_id'])
+    return web.Response(status=204)
+
+
+async def health(request):
+    return web.json_response({'status': 'ok'})
+
+
+async def metrics(request):
+    """Prometheus scrape of query, calculation and pool metrics"""
+    response = web.Response(text=render_prometheus())
+    response.headers['Content-Type'] = CONTENT_TYPE
+    return response
+
+
+async def _close_store(app):
+    app['hub'].close()
+    await app['store'].close()
+
+
+def create_app(store=None):
+    app = web.Application()
+    app['store'] = store or create_store()
+    app['cache'] = ResponseCache()
+    app['hub'] = StreamHub(app['store'])
+    app.on_cleanup.append(_close_store)
+    app.router.add_get('/health', health)
+    app.router.add_get('/metrics', metrics)
+    app.router.add_post('/batch', batch_read)
+    app.router.add_post('/sessions/{session_id}', create_session)
+    app.router.add_get('/sessions/{session_id}/{game:game[12]}/{resource}', get_resource)
+    app.router.add_patch('/sessions/{session_id}/game1/terms', update_game1_terms)
+    app.router.add_put('/sessions/{session_id}/game1/terms/{term}', update_game1_term)
+    app.router.add_post('/sessions/{session_id}/game1/approvals', approve_game1_terms)
+    app.router.add_patch('/sessions/{session_id}/game2/terms', update_game2_terms)
+    app.router.add_get('/sessions/{session_id}/stream', sse_stream)
+    app.router.add_get('/sessions/{session_id}/ws', ws_stream)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--keepalive", type=float, default=75.0,
+                        help="seconds an idle keep-alive connection stays open")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    web.run_app(
+        create_app(), host=args.host, port=args.port, keepalive_timeout=args.keepalive,
+        access_log=web.access_logger if args.access_log else None
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import json
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return float(value)
+
+
+def dumps(payload):
+    """Compact JSON bytes; datetimes as ISO 8601, Decimals as numbers"""
+    return json.dumps(payload, separators=(',', ':'), default=_json_default).encode()
+
+
+def error(status, message):
+    """aiohttp HTTP exception carrying a JSON error body"""
+    return status(body=dumps({'error': message}), content_type='application/json')
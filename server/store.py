@@ -0,0 +1,94 @@
+import asyncio
+
+from database import async_database
+from database import database
+from database.database import Database
+
+
+class BackendStore:
+    """
+    Async facade over the configured StorageBackend
+
+    Blocking backends (SQLite) run in the loop's thread pool; the memory
+    backend never blocks, so it is called inline.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or Database()
+        self.blocking = self.db.backend.blocking
+
+    async def _call(self, fn, *args):
+        if not self.blocking:
+            return self._run(fn, args)
+        return await asyncio.get_running_loop().run_in_executor(None, self._run, fn, args)
+
+    def _run(self, fn, args):
+        with self.db.get_conn(caller=f"server.{fn.__name__}") as conn:
+            return fn(conn, *args)
+
+    async def create_session(self, session_id):
+        await self._call(database.create_session, session_id)
+
+    async def terms_version(self, table, session_id):
+        return await self._call(database.get_terms_version, table, session_id)
+
+    async def game1_terms(self, session_id):
+        return await self._call(database.get_game1_terms, session_id)
+
+    async def update_game1_terms(self, team, values, session_id, expected_versions=None):
+        return await self._call(database.update_game1_terms, team, values, session_id, expected_versions)
+
+    async def game2_terms(self, session_id):
+        return await self._call(database.get_game2_terms, session_id)
+
+    async def update_game2_terms(self, team, updates, session_id):
+        await self._call(database.update_game2_terms, team, updates, session_id)
+
+    async def game2_company_data(self, session_id):
+        return await self._call(database.get_game2_company_data, session_id)
+
+    async def close(self):
+        self.db.close_all()
+
+
+class AsyncpgStore:
+    """Store over the asyncpg pool, so Postgres calls never leave the loop"""
+
+    def __init__(self, db=None):
+        self.db = db or async_database.AsyncDatabase()
+
+    async def _call(self, fn, *args):
+        async with self.db.get_conn() as conn:
+            return await fn(conn, *args)
+
+    async def create_session(self, session_id):
+        await self._call(async_database.create_session, session_id)
+
+    async def terms_version(self, table, session_id):
+        return await self._call(async_database.get_terms_version, table, session_id)
+
+    async def game1_terms(self, session_id):
+        return await self._call(async_database.get_game1_terms, session_id)
+
+    async def update_game1_terms(self, team, values, session_id, expected_versions=None):
+        return await self._call(async_database.update_game1_terms, team, values, session_id, expected_versions)
+
+    async def game2_terms(self, session_id):
+        return await self._call(async_database.get_game2_terms, session_id)
+
+    async def update_game2_terms(self, team, updates, session_id):
+        await self._call(async_database.update_game2_terms, team, updates, session_id)
+
+    async def game2_company_data(self, session_id):
+        return await self._call(async_database.get_game2_company_data, session_id)
+
+    async def close(self):
+        await self.db.close_all()
+
+
+def create_store():
+    """asyncpg for Postgres, the configured backend otherwise"""
+    db = Database()
+    if db.backend.name == 'postgres':
+        return AsyncpgStore()
+    return BackendStore(db)
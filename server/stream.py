@@ -0,0 +1,288 @@
+"""
+Live deltas for a session over server-sent events or a WebSocket.
+
+One change-feed subscription per process feeds every stream. Changes are
+merged per session for a short coalescing window, diffed against the
+session's last known terms and outputs, encoded once and fanned out to
+each subscriber's bounded queue. A consumer that falls behind has its
+backlog dropped and gets a fresh snapshot instead.
+"""
+import asyncio
+import threading
+
+from aiohttp import WSMsgType, web
+
+from database.backends.base import GAME1_COLUMNS, GAME2_COLUMNS
+from database.notifications import GAME1_CHANNEL, GAME2_CHANNEL, change_feed
+from game1.shared import game1_outputs
+from game2.formulas import game2_graph
+from game2.shared import update_game2_metrics
+from server.responses import dumps, error
+
+HEARTBEAT = 15.0
+
+# Row columns a change can touch; id, term and description never change
+FIELDS = {
+    GAME1_CHANNEL: [c.strip() for c in GAME1_COLUMNS.split(',') if c.strip() not in ('id', 'term', 'description')],
+    GAME2_CHANNEL: [c.strip() for c in GAME2_COLUMNS.split(',') if c.strip() not in ('id', 'term')],
+}
+
+# Queued in place of a subscriber's dropped backlog
+RESYNC = object()
+
+
+class Subscriber:
+    """One client's bounded queue of encoded messages"""
+
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Once a delta is missed the rest of the backlog is useless, so
+            # drop it and let the writer send a snapshot instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(RESYNC)
+
+
+class SessionState:
+    """Latest terms and outputs of one session, shared by its subscribers"""
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.subscribers = set()
+        self.terms = {GAME1_CHANNEL: {}, GAME2_CHANNEL: {}}
+        self.outputs = {'game1': None, 'game2': None}
+        # Game 2 metrics kept current incrementally as prices and shares change
+        self.game2 = game2_graph().evaluation()
+        self.pending = {GAME1_CHANNEL: {}, GAME2_CHANNEL: {}}
+        self.flush_handle = None
+        self.seq = 0
+        self.ready = asyncio.Event()
+
+
+def compute_outputs(game, terms, evaluation=None):
+    """
+    Game outputs from a session's term state; None while inputs are missing
+
+    Given the session's Evaluation of the Game 2 graph, only the metrics
+    downstream of changed inputs are recomputed.
+    """
+    try:
+        if game == 'game1':
+            return game1_outputs([
+                (None, term, row.get('team1_value'), row.get('team2_approval'))
+                for term, row in terms.items()
+            ])
+        row = tuple(
+            terms.get(f"{kind}_company{i}", {}).get(f"team1_company{i}")
+            for kind in ('price', 'shares')
+            for i in range(1, 4)
+        )
+        if None in row:
+            return None
+        return update_game2_metrics(evaluation or game2_graph().evaluation(), row)
+    except (TypeError, ValueError):
+        return None
+
+
+def diff_outputs(old, new):
+    """Top-level output keys whose value changed"""
+    if old is None or new is None:
+        return new
+    return {key: value for key, value in new.items() if old.get(key) != value}
+
+
+class StreamHub:
+    """Per-session fan-out of coalesced term and output deltas"""
+
+    def __init__(self, store, feed=None, coalesce=0.05, queue_size=64):
+        self.store = store
+        self.feed = feed
+        self.coalesce = coalesce
+        self.queue_size = queue_size
+        self.sessions = {}
+        self._loop = None
+        self._subscription = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def _start(self):
+        self._loop = asyncio.get_running_loop()
+        self._subscription = (self.feed or change_feed()).subscribe(GAME1_CHANNEL, GAME2_CHANNEL)
+        self._thread = threading.Thread(target=self._forward, name='stream-hub', daemon=True)
+        self._thread.start()
+
+    def _forward(self):
+        """Move change-feed events onto the loop, a drained batch at a time"""
+        while not self._stopped.is_set():
+            if self._subscription.wait(0.5):
+                events = self._subscription.drain()
+                if events:
+                    self._loop.call_soon_threadsafe(self._on_events, events)
+
+    def close(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._subscription.close()
+            self._thread = None
+
+    async def subscribe(self, session_id):
+        """Register a subscriber, loading the session's state on first use"""
+        if self._thread is None:
+            self._start()
+        state = self.sessions.get(session_id)
+        if state is None:
+            state = self.sessions[session_id] = SessionState(session_id)
+            try:
+                await self._load(state)
+            except BaseException:
+                del self.sessions[session_id]
+                state.ready.set()
+                raise
+        else:
+            await state.ready.wait()
+            if self.sessions.get(session_id) is not state:
+                return await self.subscribe(session_id)
+        subscriber = Subscriber(self.queue_size)
+        state.subscribers.add(subscriber)
+        return subscriber, state
+
+    async def _load(self, state):
+        # Events arriving while this runs wait in state.pending; they are
+        # whole-row values, so replaying them afterwards converges
+        game1, game2 = await asyncio.gather(
+            self.store.game1_terms(state.session_id), self.store.game2_terms(state.session_id)
+        )
+        if not game1:
+            raise error(web.HTTPNotFound, f"Unknown session {state.session_id!r}")
+        for channel, rows in ((GAME1_CHANNEL, game1), (GAME2_CHANNEL, game2)):
+            state.terms[channel] = {row[1]: dict(zip(FIELDS[channel], _values(channel, row))) for row in rows}
+        state.outputs = {
+            'game1': compute_outputs('game1', state.terms[GAME1_CHANNEL]),
+            'game2': compute_outputs('game2', state.terms[GAME2_CHANNEL], state.game2),
+        }
+        state.ready.set()
+        if any(state.pending.values()):
+            self._flush(state)
+
+    def unsubscribe(self, subscriber, state):
+        state.subscribers.discard(subscriber)
+        if not state.subscribers and self.sessions.get(state.session_id) is state:
+            if state.flush_handle is not None:
+                state.flush_handle.cancel()
+            del self.sessions[state.session_id]
+
+    def _on_events(self, events):
+        for event in events:
+            state = self.sessions.get(event.session_id)
+            if state is None:
+                continue
+            state.pending[event.channel].setdefault(event.term, {}).update(event.values)
+            if state.flush_handle is None and state.ready.is_set():
+                state.flush_handle = self._loop.call_later(self.coalesce, self._flush, state)
+
+    def _flush(self, state):
+        """Apply merged changes, diff them and send one delta to every subscriber"""
+        state.flush_handle = None
+        pending, state.pending = state.pending, {GAME1_CHANNEL: {}, GAME2_CHANNEL: {}}
+
+        terms = {}
+        for channel, changes in pending.items():
+            for term, values in changes.items():
+                row = state.terms[channel].setdefault(term, {})
+                changed = {key: value for key, value in values.items()
+                           if key in FIELDS[channel] and row.get(key) != value}
+                if changed:
+                    row.update(changed)
+                    terms.setdefault(channel, {})[term] = changed
+
+        outputs = {}
+        for game, channel in (('game1', GAME1_CHANNEL), ('game2', GAME2_CHANNEL)):
+            if channel in terms:
+                new = compute_outputs(game, state.terms[channel], state.game2)
+                changed = diff_outputs(state.outputs[game], new)
+                state.outputs[game] = new
+                if changed != {}:
+                    outputs[game] = changed
+
+        if not terms:
+            return
+        state.seq += 1
+        message = ('delta', dumps({'seq': state.seq, 'terms': terms, 'outputs': outputs}))
+        for subscriber in state.subscribers:
+            subscriber.offer(message)
+
+    def snapshot(self, state):
+        return 'snapshot', dumps({'seq': state.seq, 'terms': state.terms, 'outputs': state.outputs})
+
+    async def messages(self, subscriber, state):
+        """(event, body) pairs for one subscriber: a snapshot, then deltas; (None, None) on idle"""
+        yield self.snapshot(state)
+        while True:
+            try:
+                message = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT)
+            except asyncio.TimeoutError:
+                yield None, None
+                continue
+            yield self.snapshot(state) if message is RESYNC else message
+
+
+def _values(channel, row):
+    if channel == GAME1_CHANNEL:
+        return row[2], row[3], row[5], row[6]
+    return row[2:]
+
+
+async def sse_stream(request):
+    """GET text/event-stream of snapshot and delta events"""
+    hub = request.app['hub']
+    subscriber, state = await hub.subscribe(request.match_info['session_id'])
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    try:
+        await response.prepare(request)
+        async for event, body in hub.messages(subscriber, state):
+            if event is None:
+                await response.write(b': keep-alive\n\n')
+            else:
+                await response.write(b'event: ' + event.encode() + b'\ndata: ' + body + b'\n\n')
+    except ConnectionResetError:
+        pass
+    finally:
+        hub.unsubscribe(subscriber, state)
+    return response
+
+
+async def ws_stream(request):
+    """WebSocket of {"event": ..., "data": ...} messages; client messages are ignored"""
+    hub = request.app['hub']
+    subscriber, state = await hub.subscribe(request.match_info['session_id'])
+    ws = web.WebSocketResponse(heartbeat=HEARTBEAT)
+    try:
+        await ws.prepare(request)
+
+        async def send():
+            async for event, body in hub.messages(subscriber, state):
+                if event is not None:
+                    await ws.send_str(f'{{"event":"{event}","data":{body.decode()}}}')
+
+        sender = asyncio.create_task(send())
+        try:
+            async for message in ws:
+                if message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            sender.cancel()
+    finally:
+        hub.unsubscribe(subscriber, state)
+    return ws
@@ -0,0 +1,318 @@
+"""
+Headless players for each team role.
+
+The bots drive the same database functions as the questionary CLIs, with
+no TTY, so a game can be scripted, played by a bot against a person at
+the other team's CLI, or run many times over by simulation.loadgen:
+
+    python -m simulation bot game1 team2 --session demo --reject-rate 0.3
+
+Before each move a bot sleeps an exponentially distributed think time.
+It waits for the other team on the change feed and re-reads at least
+every poll seconds, for writers the feed does not see (another process
+on SQLite).
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from database.cache import cached_game1_terms
+from database.database import (
+    Database, TermBatch, create_session, current_session, get_missing_game2_inputs,
+    iter_game1_events, update_game1_term, update_game1_terms, update_game2_terms
+)
+from database.backends.base import APPROVE, GAME2_BUDGET_TERMS, REJECT
+from database.metrics import LatencyStats
+from database.notifications import GAME1_CHANNEL, GAME2_CHANNEL, change_feed
+from game1.shared import calculate_game1_outputs
+from game1.team2 import calculate_valuation
+from game2.shared import calculate_game2_outputs
+
+db = Database()
+
+# think_time: mean seconds before each move; reject_rate: chance Team 2
+# rejects a term; poll: longest wait between reads; timeout: seconds before
+# a bot gives up on its game
+Behaviour = namedtuple('Behaviour', ['think_time', 'reject_rate', 'poll', 'timeout'])
+DEFAULT_BEHAVIOUR = Behaviour(think_time=0.5, reject_rate=0.2, poll=0.25, timeout=300.0)
+
+# Ranges Team 1 bots draw their proposals from
+GAME1_RANGES = {'EBITDA': (50.0, 500.0), 'Multiple': (4.0, 15.0), 'Factor Score': (0.5, 1.5)}
+PRICE_RANGE = (5.0, 200.0)
+SHARES_RANGE = (1_000, 100_000)
+BUDGET_RANGE = (10_000.0, 1_000_000.0)
+
+
+class BotStats:
+    """
+    Counters shared by every bot of a run
+
+    Transaction latency covers the connection checkout, so pool waits
+    show up in it; cycle latency runs from a Team 1 edit to Team 1 seeing
+    Team 2's decision on it. Conflicts count compare-and-swap writes that
+    lost to a concurrent one.
+    """
+
+    def __init__(self):
+        self.transactions = 0
+        self.conflicts = 0
+        self.errors = {}
+        self.decisions = {APPROVE: 0, REJECT: 0}
+        self.transaction_latency = LatencyStats(window=8192)
+        self.cycle_latency = LatencyStats(window=8192)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def transaction(self, caller):
+        """db.get_conn() for one bot move, timed and counted"""
+        start = time.perf_counter()
+        try:
+            with db.get_conn(caller=caller) as conn:
+                yield conn
+        except Exception as exc:
+            self.error(exc)
+            raise
+        finally:
+            with self._lock:
+                self.transactions += 1
+                self.transaction_latency.record(time.perf_counter() - start)
+
+    def error(self, exc):
+        with self._lock:
+            name = type(exc).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def conflict(self):
+        with self._lock:
+            self.conflicts += 1
+
+    def decision(self, kind, seconds):
+        with self._lock:
+            self.decisions[kind] += 1
+            self.cycle_latency.record(seconds)
+
+
+def think(behaviour, rng):
+    if behaviour.think_time > 0:
+        time.sleep(rng.expovariate(1 / behaviour.think_time))
+
+
+def _check_deadline(deadline, role):
+    if time.monotonic() > deadline:
+        raise TimeoutError(f"{role} gave up waiting for the other team")
+
+
+def _propose(term, rng, current=None):
+    """A Team 1 value for term, different from current"""
+    low, high = GAME1_RANGES.get(term, (1.0, 100.0))
+    while True:
+        value = round(rng.uniform(low, high), 2)
+        if value != current:
+            return value
+
+
+def game1_team1(session_id, behaviour=DEFAULT_BEHAVIOUR, stats=None, rng=None):
+    """
+    Enter every unset term, then revise each rejected one until Team 2
+    has approved them all; returns the final outputs
+
+    Team 2's decisions are read from the event log, the only place a
+    rejection of an unchanged value is visible.
+    """
+    stats = stats or BotStats()
+    rng = rng or random.Random()
+    deadline = time.monotonic() + behaviour.timeout
+    caller = 'bots.game1_team1'
+
+    with change_feed().subscribe(GAME1_CHANNEL, session_id=session_id) as changes:
+        with stats.transaction(caller) as conn:
+            terms = cached_game1_terms(conn, session_id)
+            after_id = _last_event_id(conn, session_id)
+
+        think(behaviour, rng)
+        values = {term[1]: _propose(term[1], rng) for term in terms if term[2] is None}
+        if values:
+            with stats.transaction(caller) as conn:
+                update_game1_terms(conn, 1, values, session_id)
+        # Terms someone else entered count as submitted now
+        submitted = {term[1]: time.perf_counter() for term in terms if not term[3]}
+        current = {term[1]: term[2] for term in terms}
+        current.update(values)
+
+        while True:
+            with stats.transaction(caller) as conn:
+                outputs = calculate_game1_outputs(conn, session_id)
+                decisions = [
+                    event for rows in iter_game1_events(conn, session_id, after_id) for event in rows
+                ]
+
+            for event_id, _, term, kind, _, _ in decisions:
+                after_id = event_id
+                if kind not in (APPROVE, REJECT) or term not in submitted:
+                    continue
+                stats.decision(kind, time.perf_counter() - submitted.pop(term))
+                if kind == REJECT:
+                    think(behaviour, rng)
+                    current[term] = _propose(term, rng, current[term])
+                    with stats.transaction(caller) as conn:
+                        update_game1_term(conn, term, 1, current[term], session_id)
+                    submitted[term] = time.perf_counter()
+
+            if outputs['all_approved']:
+                return outputs
+            if not decisions:
+                _check_deadline(deadline, "Game 1 Team 1")
+                changes.wait(behaviour.poll)
+                changes.drain()
+
+
+def _last_event_id(conn, session_id):
+    last = 0
+    for rows in iter_game1_events(conn, session_id):
+        last = rows[-1][0]
+    return last
+
+
+def game1_team2(session_id, behaviour=DEFAULT_BEHAVIOUR, stats=None, rng=None):
+    """Approve or reject each submitted term until all are approved; returns the valuation"""
+    stats = stats or BotStats()
+    rng = rng or random.Random()
+    deadline = time.monotonic() + behaviour.timeout
+    caller = 'bots.game1_team2'
+    # (term, value) pairs already rejected, so a rejection is not repeated
+    rejected = set()
+
+    with change_feed().subscribe(GAME1_CHANNEL, session_id=session_id) as changes:
+        while True:
+            with stats.transaction(caller) as conn:
+                terms = cached_game1_terms(conn, session_id)
+            valuation = calculate_valuation(terms)
+            if valuation is not None:
+                return valuation
+
+            pending = [
+                term for term in terms
+                if term[2] is not None and not term[3] and (term[1], term[2]) not in rejected
+            ]
+            if not pending:
+                _check_deadline(deadline, "Game 1 Team 2")
+                changes.wait(behaviour.poll)
+                changes.drain()
+                continue
+
+            term = rng.choice(pending)
+            think(behaviour, rng)
+            approve = rng.random() >= behaviour.reject_rate
+            if not approve:
+                rejected.add((term[1], term[2]))
+            with stats.transaction(caller) as conn:
+                result = update_game1_term(conn, term[1], 2, approve, session_id, expected_version=term[6])
+            if not result.applied:
+                # Team 1 revised the term meanwhile: review the new value instead
+                stats.conflict()
+
+
+def game2_team1(session_id, behaviour=DEFAULT_BEHAVIOUR, stats=None, rng=None):
+    """Enter random prices and share counts for the three companies in one batch"""
+    stats = stats or BotStats()
+    rng = rng or random.Random()
+    think(behaviour, rng)
+    with stats.transaction('bots.game2_team1') as conn, TermBatch(conn, session_id) as batch:
+        for i in range(1, 4):
+            batch.update_game2_term(f"price_company{i}", 1, i, round(rng.uniform(*PRICE_RANGE), 2))
+            batch.update_game2_term(f"shares_company{i}", 1, i, rng.randint(*SHARES_RANGE))
+
+
+def game2_team2(session_id, behaviour=DEFAULT_BEHAVIOUR, stats=None, rng=None):
+    """
+    Wait for Team 1's inputs, enter random investor budgets, then
+    calculate the Game 2 outputs, allocation included, and return them
+    """
+    stats = stats or BotStats()
+    rng = rng or random.Random()
+    deadline = time.monotonic() + behaviour.timeout
+    caller = 'bots.game2_team2'
+
+    with change_feed().subscribe(GAME2_CHANNEL, session_id=session_id) as changes:
+        while True:
+            with stats.transaction(caller) as conn:
+                missing = get_missing_game2_inputs(conn, session_id)
+            if not missing:
+                break
+            _check_deadline(deadline, "Game 2 Team 2")
+            changes.wait(behaviour.poll)
+            changes.drain()
+
+    think(behaviour, rng)
+    budgets = [(term, 1, round(rng.uniform(*BUDGET_RANGE), 2)) for term in GAME2_BUDGET_TERMS]
+    with stats.transaction(caller) as conn:
+        update_game2_terms(conn, 2, budgets, session_id)
+        return calculate_game2_outputs(conn, session_id)
+
+
+# game -> team -> bot(session_id, behaviour, stats, rng)
+BOTS = {
+    'game1': {'team1': game1_team1, 'team2': game1_team2},
+    'game2': {'team1': game2_team1, 'team2': game2_team2},
+}
+
+
+def behaviour_arguments(parser):
+    """Add the Behaviour options to an argument parser"""
+    parser.add_argument("--think", type=float, default=DEFAULT_BEHAVIOUR.think_time,
+                        help="mean think time before each move, in seconds")
+    parser.add_argument("--reject-rate", type=float, default=DEFAULT_BEHAVIOUR.reject_rate,
+                        help="chance a Game 1 Team 2 bot rejects a term")
+    parser.add_argument("--poll", type=float, default=DEFAULT_BEHAVIOUR.poll,
+                        help="longest wait between reads, in seconds")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_BEHAVIOUR.timeout,
+                        help="seconds before a bot gives up on its game")
+    parser.add_argument("--backend", choices=('postgres', 'sqlite', 'memory'),
+                        help="storage backend (SIMULATION_BACKEND)")
+
+
+def behaviour_from(args):
+    if not 0 <= args.reject_rate < 1:
+        raise ValueError("--reject-rate must be at least 0 and below 1")
+    if args.backend:
+        os.environ['SIMULATION_BACKEND'] = args.backend
+    return Behaviour(think_time=args.think, reject_rate=args.reject_rate, poll=args.poll, timeout=args.timeout)
+
+
+def main(argv=None):
+    from rich.console import Console
+
+    console = Console()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("game", choices=BOTS)
+    parser.add_argument("team", choices=('team1', 'team2'))
+    parser.add_argument("--session", help="game session (SIMULATION_SESSION)")
+    parser.add_argument("--seed", type=int, help="seed for reproducible moves")
+    behaviour_arguments(parser)
+    args = parser.parse_args(argv)
+    behaviour = behaviour_from(args)
+    session_id = args.session or current_session()
+
+    stats = BotStats()
+    with stats.transaction('bots.main') as conn:
+        create_session(conn, session_id)
+    console.print(f"[bold blue]{args.game} {args.team} bot playing session {session_id!r}")
+    try:
+        result = BOTS[args.game][args.team](session_id, behaviour, stats, random.Random(args.seed))
+    except TimeoutError as exc:
+        console.print(f"[red]✗ {exc}")
+        return 1
+
+    if result is not None:
+        console.print(result)
+    console.print(f"[green]✓ Done after {stats.transactions} transactions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Single entry point for the games and the tools around them.
+
+    python -m simulation game1 team1 --session demo
+    python -m simulation game2 team2 --output json
+    python -m simulation setup-db
+    python -m simulation serve --port 8080
+    python -m simulation load --sessions 10,50 --think 0.1
+
+Only argparse is loaded up front. A command's module is imported when
+that command runs, so --help never reaches rich, questionary or the
+database.
+"""
+import argparse
+import os
+import sys
+from importlib import import_module
+
+# game -> team -> (module with main(session_id), help)
+GAMES = {
+    'game1': {
+        'team1': ('game1.team1', "enter and revise the valuation terms"),
+        'team2': ('game1.team2', "approve or reject Team 1's terms"),
+    },
+    'game2': {
+        'team1': ('game2.team1', "enter company share prices and counts"),
+        'team2': ('game2.team2', "show market metrics and investment recommendations"),
+    },
+}
+
+# command -> (module with main(), help); remaining arguments are passed on
+TOOLS = {
+    'setup-db': ('database.setup_db', "migrate the database schema and seed sessions"),
+    'serve': ('server.app', "run the JSON API server"),
+    'replay': ('database.replay', "rebuild Game 1 state from the event log"),
+    'bench': ('benchmarks.suite', "run the benchmark suite"),
+    'bot': ('simulation.bots', "play one team role headlessly"),
+    'load': ('simulation.loadgen', "play many concurrent games with bots"),
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='simulation', description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    for game, teams in GAMES.items():
+        game_parser = commands.add_parser(game, help=f"play {game.replace('game', 'Game ')} as one team")
+        team_parsers = game_parser.add_subparsers(dest='team', required=True, metavar='team')
+        for team, (_, help_text) in teams.items():
+            team_parser = team_parsers.add_parser(team, help=help_text)
+            team_parser.add_argument("--session", help="game session (SIMULATION_SESSION)")
+            team_parser.add_argument("--backend", choices=('postgres', 'sqlite', 'memory'),
+                                     help="storage backend (SIMULATION_BACKEND)")
+            team_parser.add_argument("--output", choices=('live', 'plain', 'json'),
+                                     help="how outputs are shown (SIMULATION_OUTPUT)")
+
+    for tool, (_, help_text) in TOOLS.items():
+        # The tool parses its own options, --help included
+        commands.add_parser(tool, help=help_text, add_help=False)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+
+    if args.command in TOOLS:
+        # The tools read their arguments from sys.argv
+        sys.argv = [f"simulation {args.command}", *rest]
+        return import_module(TOOLS[args.command][0]).main()
+    if rest:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+
+    # Settings go into the environment before the game is imported: its
+    # modules read them at import time
+    for option, variable in (('session', 'SIMULATION_SESSION'), ('backend', 'SIMULATION_BACKEND'),
+                             ('output', 'SIMULATION_OUTPUT')):
+        if getattr(args, option):
+            os.environ[variable] = getattr(args, option)
+    module = GAMES[args.command][args.team][0]
+    return import_module(module).main(args.session)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
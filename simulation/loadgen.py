@@ -0,0 +1,232 @@
+"""
+Play many games at once with bots to find where the backend saturates.
+
+Each of --sessions workers plays --games rounds back to back, every round
+in a fresh session with one bot thread per team. A comma-separated
+--sessions runs one level after another, so a single run shows where
+throughput stops growing and latency starts to climb:
+
+    python -m simulation load --sessions 10,50,200 --think 0.1 --reject-rate 0.3
+    python -m simulation load --backend memory --game game1 --think 0 --json
+
+Transaction latency includes the wait for a pooled connection; the
+contention column reports compare-and-swap conflicts, errors and the
+pool's waits, exhaustions and timeouts during each level.
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+
+from rich.console import Console
+from rich.table import Table
+
+from database.database import Database, create_session
+from database.metrics import LatencyStats
+from simulation.bots import BOTS, BotStats, behaviour_arguments, behaviour_from
+
+console = Console()
+
+GAMES = ('game1', 'game2')
+
+
+def _sessions(text):
+    try:
+        levels = [int(level) for level in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected a count or comma-separated counts")
+    if not levels or min(levels) < 1:
+        raise argparse.ArgumentTypeError("session counts must be positive")
+    return levels
+
+
+def play(game, session_id, behaviour, stats, rng):
+    """Play one game with both team bots; returns the error that stopped it, if any"""
+    errors = []
+
+    def run(bot, seed):
+        try:
+            bot(session_id, behaviour, stats, random.Random(seed))
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [
+        threading.Thread(target=run, args=(bot, rng.random()), name=f"{session_id}-{team}", daemon=True)
+        for team, bot in BOTS[game].items()
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors[0] if errors else None
+
+
+class Level:
+    """Outcome of one concurrency level"""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.stats = BotStats()
+        self.game_latency = {game: LatencyStats(window=8192) for game in GAMES}
+        self.completed = {game: 0 for game in GAMES}
+        self.failed = {game: 0 for game in GAMES}
+        self.elapsed = 0.0
+        self.pool = {}
+        self._lock = threading.Lock()
+
+    def record(self, game, seconds, error):
+        with self._lock:
+            if error is None:
+                self.completed[game] += 1
+                self.game_latency[game].record(seconds)
+            else:
+                self.failed[game] += 1
+                self.stats.error(error)
+
+
+def run_level(sessions, games, rounds, behaviour, seed, prefix):
+    """Run sessions workers to completion and collect their Level"""
+    db = Database()
+    level = Level(sessions)
+    before = db.pool_metrics()
+
+    def worker(index):
+        rng = random.Random(f"{seed}-{sessions}-{index}")
+        for round_ in range(rounds):
+            for game in games:
+                session_id = f"{prefix}-{sessions}-{index}-{round_}-{game}"
+                start = time.perf_counter()
+                try:
+                    with level.stats.transaction('loadgen.create_session') as conn:
+                        create_session(conn, session_id)
+                    error = play(game, session_id, behaviour, level.stats, rng)
+                except Exception as exc:
+                    error = exc
+                level.record(game, time.perf_counter() - start, error)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(sessions)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    level.elapsed = time.perf_counter() - start
+    level.pool = _pool_delta(before, db.pool_metrics())
+    return level
+
+
+def _pool_delta(before, after):
+    """Pool counters accrued during a level, with the wait time summary so far"""
+    if not after:
+        return {}
+    counters = ('exhaustions', 'timeouts')
+    return {
+        **{counter: after[counter] - before.get(counter, 0) for counter in counters},
+        'maxconn': after['maxconn'],
+        'wait_p99': after['wait_time']['p99'],
+        'wait_max': after['wait_time']['max'],
+    }
+
+
+def summary(level):
+    """JSON-ready figures for one level"""
+    stats = level.stats
+    return {
+        'sessions': level.sessions,
+        'seconds': level.elapsed,
+        'transactions': stats.transactions,
+        'transactions_per_sec': stats.transactions / level.elapsed if level.elapsed else 0.0,
+        'transaction_latency': stats.transaction_latency.summary(),
+        'conflicts': stats.conflicts,
+        'approval_cycle_latency': stats.cycle_latency.summary(),
+        'decisions': dict(stats.decisions),
+        'games': {
+            game: {
+                'completed': level.completed[game],
+                'failed': level.failed[game],
+                'latency': level.game_latency[game].summary(),
+            }
+            for game in GAMES if level.completed[game] or level.failed[game]
+        },
+        'errors': dict(stats.errors),
+        'pool': level.pool,
+    }
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:,.1f}"
+
+
+def report(results):
+    table = Table(title="Load test (latencies in ms)")
+    table.add_column("Sessions", justify="right", style="cyan")
+    table.add_column("Tx/s", justify="right")
+    table.add_column("Tx p50", justify="right")
+    table.add_column("Tx p99", justify="right")
+    table.add_column("Cycle p50", justify="right")
+    table.add_column("Cycle p99", justify="right")
+    table.add_column("Games ok/failed")
+    table.add_column("Game p50", justify="right")
+    table.add_column("Contention")
+
+    for result in results:
+        games = result['games'].values()
+        completed = sum(game['completed'] for game in games)
+        failed = sum(game['failed'] for game in games)
+        game_p50 = max((game['latency']['p50'] for game in games), default=0.0)
+        contention = [f"{name} {count}" for name, count in result['errors'].items()]
+        if result['conflicts']:
+            contention.insert(0, f"{result['conflicts']} version conflicts")
+        pool = result['pool']
+        if pool:
+            contention.insert(0, f"pool {pool['maxconn']}: wait p99 {_ms(pool['wait_p99'])}, "
+                                 f"{pool['exhaustions']} exhausted, {pool['timeouts']} timed out")
+        table.add_row(
+            str(result['sessions']),
+            f"{result['transactions_per_sec']:,.0f}",
+            _ms(result['transaction_latency']['p50']),
+            _ms(result['transaction_latency']['p99']),
+            _ms(result['approval_cycle_latency']['p50']),
+            _ms(result['approval_cycle_latency']['p99']),
+            f"{completed}/[red]{failed}" if failed else f"{completed}/0",
+            _ms(game_p50),
+            "; ".join(contention) or "-",
+        )
+    console.print(table)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=_sessions, default=[10],
+                        help="concurrent sessions, or comma-separated levels to step through")
+    parser.add_argument("--games", type=int, default=1, help="rounds each session plays")
+    parser.add_argument("--game", action="append", choices=GAMES, help="game to play (default: both)")
+    parser.add_argument("--seed", default="load", help="seed for reproducible bot moves")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    behaviour_arguments(parser)
+    args = parser.parse_args(argv)
+    try:
+        behaviour = behaviour_from(args)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    games = args.game or list(GAMES)
+    prefix = f"load-{uuid.uuid4().hex[:8]}"
+    results = []
+    for sessions in args.sessions:
+        if not args.json:
+            console.print(f"[italic]Running {sessions} sessions...")
+        results.append(summary(run_level(sessions, games, args.games, behaviour, args.seed, prefix)))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
+    return 1 if any(game['failed'] for result in results for game in result['games'].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip('aiohttp')
+os.environ.setdefault('SIMULATION_BACKEND', 'memory')
+
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+
+from server.app import create_app  # noqa: E402
+
+
+def post_batch(body):
+    async def post():
+        async with TestClient(TestServer(create_app())) as client:
+            response = await client.post('/batch', json=body)
+            return response.status, await response.json()
+    return asyncio.run(post())
+
+
+@pytest.mark.parametrize('sessions', [[1], [''], [None], 'default'])
+def test_batch_read_rejects_invalid_session_ids(sessions):
+    status, body = post_batch({'sessions': sessions})
+
+    assert status == 400
+    assert body == {'error': "sessions must be a list of non-empty strings"}
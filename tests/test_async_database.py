@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('asyncpg')
+
+from database import async_database  # noqa: E402
+from database.prepared import STATEMENTS  # noqa: E402
+
+
+class FakeConnection:
+    """Answers the Game 1 write statements as if another writer got in first"""
+
+    def __init__(self, snapshot_rows, committed_rows):
+        self.snapshot_rows = snapshot_rows
+        self.committed_rows = committed_rows
+        self.queries = []
+
+    async def fetch(self, sql, *args):
+        self.queries.append(sql)
+        if sql == STATEMENTS['game1_current'][1]:
+            return [row for row in self.committed_rows if row[1] in args[1]]
+        return self.snapshot_rows
+
+    async def fetchrow(self, sql, *args):
+        rows = await self.fetch(sql, *args)
+        return rows[0] if rows else None
+
+
+# id, term, team1_value, team2_approval, description, last_updated, version
+STALE = (1, 'EBITDA', 100.0, False, 'd', None, 3)
+COMMITTED = (1, 'EBITDA', 120.0, False, 'd', None, 4)
+
+
+def test_lost_compare_and_swap_returns_the_committed_row():
+    conn = FakeConnection([(False, *STALE)], [COMMITTED])
+    result = asyncio.run(async_database.update_game1_term(conn, 'EBITDA', 2, True, 's', expected_version=3))
+    assert not result.applied
+    assert result.row == COMMITTED
+    assert result.version == 4
+
+
+def test_lost_terms_in_a_batch_are_reread():
+    multiple = (2, 'Multiple', 5.0, False, 'd', None, 1)
+    conn = FakeConnection([(True, *multiple), (False, *STALE)], [COMMITTED])
+    results = asyncio.run(async_database.update_game1_terms(
+        conn, 1, {'EBITDA': 110.0, 'Multiple': 5.0, 'Unknown': 1.0}, 's', {'EBITDA': 3}
+    ))
+    assert results['Multiple'].applied and results['Multiple'].row == multiple
+    assert results['EBITDA'] == (False, 4, COMMITTED)
+    assert results['Unknown'] == (False, None, None)
+
+
+def test_applied_write_skips_the_reread():
+    conn = FakeConnection([(True, *COMMITTED)], [])
+    assert asyncio.run(async_database.update_game1_term(conn, 'EBITDA', 1, 120.0, 's')).applied
+    assert STATEMENTS['game1_current'][1] not in conn.queries
@@ -0,0 +1,15 @@
+import io
+import json
+
+import numpy as np
+
+from ui.live import JsonView
+
+
+def test_json_view_writes_non_finite_values_as_null():
+    stream = io.StringIO()
+    view = JsonView(stream=stream)
+
+    view.show({'valuation': float('nan'), 'terms': (1.5, float('inf')), 'shares': np.array([1.0, -np.inf])})
+
+    assert json.loads(stream.getvalue()) == {'valuation': None, 'terms': [1.5, None], 'shares': [1.0, None]}
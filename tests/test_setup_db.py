@@ -0,0 +1,31 @@
+import uuid
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from database import setup_db  # noqa: E402
+from database.replay import replay, verify  # noqa: E402
+
+
+@pytest.fixture
+def conn():
+    try:
+        conn = setup_db.connect()
+    except psycopg2.Error as e:
+        pytest.skip(f"Postgres is not available: {e}")
+    try:
+        setup_db.initialize(conn)
+        yield conn
+    finally:
+        conn.close()
+
+
+def test_seeded_sessions_replay_to_their_terms(conn):
+    prefix = f"test-seed-{uuid.uuid4().hex[:8]}"
+    assert setup_db.seed_sessions(conn, 3, prefix, seed=1) > 0
+
+    for n in range(3):
+        states, _, events = replay(conn, f"{prefix}-{n}")
+        assert events == 3
+        assert verify(conn, states) == []
@@ -0,0 +1,210 @@
+"""
+Views that keep a game's output layout on screen between updates.
+
+SIMULATION_OUTPUT picks the view the CLIs use:
+
+    live   rich.Live layout redrawn in place, rewriting only changed cells (default)
+    plain  fresh tables printed on every update
+    json   one JSON line per changed outputs dict on stdout, nothing rendered;
+           NaN and infinite values are written as null
+"""
+import json
+import math
+import os
+import sys
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+
+from rich.console import Console
+from rich.live import Live
+from rich.text import Text
+
+LIVE = 'live'
+PLAIN = 'plain'
+JSON = 'json'
+OUTPUT_MODES = (LIVE, PLAIN, JSON)
+
+
+def output_mode():
+    mode = os.getenv('SIMULATION_OUTPUT', LIVE)
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"SIMULATION_OUTPUT must be one of {', '.join(OUTPUT_MODES)}, got {mode!r}")
+    return mode
+
+
+class Layout(ABC):
+    """
+    A view split into cells: cells() formats an outputs dict as
+    {key: markup}, build() arranges one Text per key into a renderable
+    """
+
+    @abstractmethod
+    def cells(self, outputs):
+        pass
+
+    @abstractmethod
+    def build(self, texts):
+        pass
+
+    def render(self, outputs):
+        """Renderable for printing outputs once"""
+        return self.build({key: Text.from_markup(markup) for key, markup in self.cells(outputs).items()})
+
+
+def changed_cells(old, new):
+    """Keys whose markup differs; None when the cell set itself changed"""
+    if old.keys() != new.keys():
+        return None
+    return [key for key, markup in new.items() if old[key] != markup]
+
+
+class LiveView:
+    """
+    Persistent rich.Live rendering of a Layout
+
+    The first show() builds the layout. Later ones diff the new cells
+    against the shown ones and rewrite only the changed Text objects in
+    place, so the tables are never rebuilt; an unchanged update does not
+    redraw at all. The layout is only rebuilt when its set of cells
+    changes.
+    """
+
+    def __init__(self, layout, console):
+        self.layout = layout
+        self.console = console
+        self.outputs = None
+        self.markup = {}
+        self.texts = {}
+        self.live = Live(console=console, auto_refresh=False)
+        self._clear = False
+
+    def show(self, outputs):
+        """Bring the screen up to date with outputs; True if anything was redrawn"""
+        if outputs != self.outputs:
+            self.outputs = outputs
+            markup = self.layout.cells(outputs)
+            changed = changed_cells(self.markup, markup)
+            if changed is None:
+                self.texts = {key: Text.from_markup(value) for key, value in markup.items()}
+                self.live.update(self.layout.build(self.texts))
+            else:
+                for key in changed:
+                    _replace(self.texts[key], Text.from_markup(markup[key]))
+            self.markup = markup
+            if changed == [] and self.live.is_started:
+                return False
+        elif self.live.is_started:
+            return False
+
+        if not self.live.is_started:
+            if self._clear:
+                # An escape sequence, where the CLIs used to spawn `clear`
+                self.console.clear()
+                self._clear = False
+            self.live.start()
+        self.live.refresh()
+        return True
+
+    @contextmanager
+    def paused(self, clear=False):
+        """
+        Hand the terminal to a prompt, leaving the last frame above it
+
+        The next show() draws a fresh frame below, or at the top of a
+        cleared screen with clear.
+        """
+        if self.live.is_started:
+            self.live.stop()
+        yield
+        self._clear = self._clear or clear
+
+    def close(self):
+        if self.live.is_started:
+            self.live.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class PlainView:
+    """Prints the whole layout on every changed update"""
+
+    def __init__(self, layout, console):
+        self.layout = layout
+        self.console = console
+        self.outputs = None
+
+    def show(self, outputs):
+        if outputs == self.outputs:
+            return False
+        self.outputs = outputs
+        self.console.print(self.layout.render(outputs))
+        return True
+
+    def paused(self, clear=False):
+        return nullcontext()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class JsonView(PlainView):
+    """Writes each changed outputs dict as one JSON line, without rendering"""
+
+    def __init__(self, layout=None, console=None, stream=None):
+        super().__init__(layout, console)
+        self.stream = stream or sys.stdout
+
+    def show(self, outputs):
+        if outputs == self.outputs:
+            return False
+        self.outputs = outputs
+        self.stream.write(json.dumps(_json_safe(outputs), separators=(',', ':'), allow_nan=False) + '\n')
+        self.stream.flush()
+        return True
+
+
+VIEWS = {LIVE: LiveView, PLAIN: PlainView, JSON: JsonView}
+
+
+def create_view(layout, console, mode=None):
+    """View for SIMULATION_OUTPUT, or mode; live falls back to plain off a terminal"""
+    mode = mode or output_mode()
+    if mode == LIVE and not console.is_terminal:
+        mode = PLAIN
+    return VIEWS[mode](layout, console)
+
+
+def status_console():
+    """Console for a CLI's messages; on stderr in JSON mode so stdout stays parseable"""
+    return Console(stderr=output_mode() == JSON)
+
+
+def _replace(text, new):
+    text.plain = new.plain
+    text.spans[:] = new.spans
+    text.style = new.style
+
+
+def _json_safe(value):
+    """value with arrays as lists and NaN or infinite floats as None, ready for strict JSON"""
+    if isinstance(value, dict):
+        return {str(key): _json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_json_safe(item) for item in value]
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, (str, int, bool)) or value is None:
+        return value
+    if hasattr(value, 'tolist'):
+        return _json_safe(value.tolist())
+    return str(value)